@@ -0,0 +1,289 @@
+# ============================================================
+# PALUTO POS — SALES ANALYTICS ROLLUPS
+# ============================================================
+# complete_payment rolls each PAID transaction into small aggregate tables
+# (migration 8) inside the same write transaction:
+#
+#   sales_daily            day → revenue, discount, orders, covers, items
+#   sales_hourly           (day, hour) → revenue, orders
+#   sales_daily_discounts  (day, discount_type) → amount, orders
+#   sales_daily_products   (day, product_id) → category, luto, qty, kg, revenue
+#   sales_daily_payments   (day, method) → amount, count
+#
+# /api/sales_analytics then answers any date range from these rollups, so
+# its cost depends on the number of days asked for, not on how many years
+# of sales are kept. analytics_rollup_log makes rolling up idempotent.
+#
+# Days and hours are local time (the restaurant's clock), taken from when
+# the transaction was paid. "covers" counts table turns (one per order).
+#
+#   python analytics.py --backfill            → roll up existing PAID history
+#   python analytics.py --backfill --rebuild  → drop and recompute everything
+#                                               (live sales + monthly archives)
+# ============================================================
+
+import argparse, os, sqlite3, sys
+from datetime import date, timedelta
+
+ROLLUP_TABLES = ("sales_daily", "sales_hourly", "sales_daily_discounts",
+                 "sales_daily_products", "sales_daily_payments", "analytics_rollup_log")
+
+
+# ============================================================
+# 🔹 ROLLING UP ONE TRANSACTION
+# ============================================================
+def rollup_transaction(cur, txn_id, paid_at=None, sales="sales", payments="payments"):
+    """Adds a PAID transaction to the rollups; returns False if it was already counted.
+
+    Must run inside the caller's write transaction. paid_at is a UTC SQLite
+    datetime string (default: now). sales/payments name the tables to read
+    the transaction from (an attached archive's when backfilling).
+    """
+    cur.execute("""
+        SELECT date(COALESCE(?, datetime('now')), 'localtime'),
+               CAST(strftime('%H', COALESCE(?, datetime('now')), 'localtime') AS INTEGER)
+    """, (paid_at, paid_at))
+    day, hour = cur.fetchone()
+
+    cur.execute("INSERT OR IGNORE INTO analytics_rollup_log (transaction_id, day, hour) VALUES (?, ?, ?)",
+                (txn_id, day, hour))
+    if cur.rowcount == 0:
+        return False
+
+    cur.execute("""
+        SELECT s.product_id, s.quantity, s.weight_in_kg, s.subtotal, s.discount, s.discount_type,
+               p.category, p.luto, p.uom
+        FROM {sales} s LEFT JOIN products p ON p.id = s.product_id
+        WHERE s.transaction_id = ? AND s.status = 'PAID'
+    """.format(sales=sales), (txn_id,))
+    lines = cur.fetchall()
+    if not lines:
+        return True
+
+    revenue = sum(l["subtotal"] or 0 for l in lines)
+    discount = sum(l["discount"] or 0 for l in lines)
+    discount_type = next((l["discount_type"] for l in lines if l["discount_type"]), None)
+
+    cur.execute("""
+        INSERT INTO sales_daily (day, revenue, discount, orders, covers, items)
+        VALUES (?, ?, ?, 1, 1, ?)
+        ON CONFLICT(day) DO UPDATE SET
+            revenue = revenue + excluded.revenue, discount = discount + excluded.discount,
+            orders = orders + 1, covers = covers + 1, items = items + excluded.items
+    """, (day, revenue, discount, len(lines)))
+
+    cur.execute("""
+        INSERT INTO sales_hourly (day, hour, revenue, orders) VALUES (?, ?, ?, 1)
+        ON CONFLICT(day, hour) DO UPDATE SET revenue = revenue + excluded.revenue, orders = orders + 1
+    """, (day, hour, revenue - discount))
+
+    if discount_type and discount:
+        cur.execute("""
+            INSERT INTO sales_daily_discounts (day, discount_type, amount, orders) VALUES (?, ?, ?, 1)
+            ON CONFLICT(day, discount_type) DO UPDATE SET amount = amount + excluded.amount, orders = orders + 1
+        """, (day, discount_type, discount))
+
+    def is_serve(line):
+        return (line["uom"] or "").upper() == "SERVE"
+
+    cur.executemany("""
+        INSERT INTO sales_daily_products (day, product_id, category, luto, quantity, weight_kg, revenue)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(day, product_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity, weight_kg = weight_kg + excluded.weight_kg,
+            revenue = revenue + excluded.revenue
+    """, [
+        (day, l["product_id"], l["category"], l["luto"],
+         (l["quantity"] or 0) if is_serve(l) else 0,
+         0 if is_serve(l) else (l["weight_in_kg"] or 0),
+         (l["subtotal"] or 0) - (l["discount"] or 0))
+        for l in lines
+    ])
+
+    cur.execute("""
+        INSERT INTO sales_daily_payments (day, method, amount, count)
+        SELECT ?, COALESCE(method, 'CASH'), SUM(amount), COUNT(*) FROM {payments}
+        WHERE transaction_id = ? GROUP BY COALESCE(method, 'CASH')
+        ON CONFLICT(day, method) DO UPDATE SET
+            amount = amount + excluded.amount, count = count + excluded.count
+    """.format(payments=payments), (day, txn_id))
+    return True
+
+
+# ============================================================
+# 🔹 QUERIES (/api/sales_analytics)
+# ============================================================
+def _days(start, end):
+    d0, d1 = date.fromisoformat(start), date.fromisoformat(end)
+    return [(d0 + timedelta(days=i)).isoformat() for i in range((d1 - d0).days + 1)]
+
+
+def sales_analytics(cur, start, end, today):
+    """Dashboard payload for [start, end] (ISO dates), answered from the rollup tables."""
+    cur.execute("""
+        SELECT COALESCE(SUM(revenue), 0), COALESCE(SUM(discount), 0), COALESCE(SUM(orders), 0),
+               COALESCE(SUM(covers), 0), COALESCE(SUM(items), 0)
+        FROM sales_daily WHERE day BETWEEN ? AND ?
+    """, (start, end))
+    revenue, discount, orders, covers, items = cur.fetchone()
+
+    cur.execute("SELECT revenue - discount, orders FROM sales_daily WHERE day = ?", (today,))
+    row = cur.fetchone()
+    today_sales, today_orders = (row[0], row[1]) if row else (0.0, 0)
+
+    cur.execute("""
+        SELECT luto FROM sales_daily_products WHERE day = ?
+        GROUP BY luto ORDER BY SUM(revenue) DESC LIMIT 1
+    """, (today,))
+    row = cur.fetchone()
+    top_dish = row[0] if row and row[0] else "--"
+
+    trend_days = _days(max(start, (date.fromisoformat(end) - timedelta(days=6)).isoformat()), end)
+    cur.execute("SELECT day, revenue - discount FROM sales_daily WHERE day BETWEEN ? AND ?",
+                (trend_days[0], trend_days[-1]))
+    by_day = dict(cur.fetchall())
+
+    cur.execute("SELECT hour, revenue FROM sales_hourly WHERE day = ? ORDER BY hour", (end,))
+    by_hour = dict(cur.fetchall())
+    hours = sorted(by_hour)
+
+    cur.execute("""
+        SELECT COALESCE(category, 'OTHERS'), SUM(revenue) FROM sales_daily_products
+        WHERE day BETWEEN ? AND ? GROUP BY 1 ORDER BY 2 DESC
+    """, (start, end))
+    categories = cur.fetchall()
+
+    cur.execute("""
+        SELECT COALESCE(category, 'OTHERS') AS category, luto, SUM(quantity) AS quantity,
+               SUM(weight_kg) AS weight_kg, SUM(revenue) AS revenue
+        FROM sales_daily_products WHERE day BETWEEN ? AND ?
+        GROUP BY 1, 2 ORDER BY revenue DESC LIMIT 10
+    """, (start, end))
+    top_products = [dict(r) for r in cur.fetchall()]
+
+    cur.execute("""
+        SELECT discount_type, SUM(amount) AS amount, SUM(orders) AS orders
+        FROM sales_daily_discounts WHERE day BETWEEN ? AND ? GROUP BY 1 ORDER BY 2 DESC
+    """, (start, end))
+    discounts = [dict(r) for r in cur.fetchall()]
+
+    cur.execute("""
+        SELECT method, SUM(amount) AS amount, SUM(count) AS count
+        FROM sales_daily_payments WHERE day BETWEEN ? AND ? GROUP BY 1 ORDER BY 2 DESC
+    """, (start, end))
+    payments = [dict(r) for r in cur.fetchall()]
+
+    # Most recent PAID lines: walks idx_sales_status_datetime backwards, LIMIT keeps it constant
+    cur.execute("""
+        SELECT s.transaction_id, s.subtotal, s.datetime AS created_at,
+               p.type, p.variety_1, p.variety_2, p.state_1, p.state_2, p.luto
+        FROM sales s LEFT JOIN products p ON p.id = s.product_id
+        WHERE s.status = 'PAID'
+        ORDER BY s.datetime DESC LIMIT 20
+    """)
+    detailed = [dict(r) for r in cur.fetchall()]
+
+    return {
+        "range": {"start": start, "end": end},
+        "dashboard_cards": {
+            "total_sales_today": round(today_sales, 2),
+            "top_selling_dish": top_dish,
+            "total_orders_today": today_orders,
+        },
+        "totals": {
+            "revenue": round(revenue, 2), "discount": round(discount, 2),
+            "net": round(revenue - discount, 2), "orders": orders, "covers": covers, "items": items,
+        },
+        "trendline": {"labels": trend_days, "data": [round(by_day.get(d, 0), 2) for d in trend_days]},
+        "hourly": {"labels": [f"{h:02d}:00" for h in hours], "data": [round(by_hour[h], 2) for h in hours]},
+        "summary": {"labels": [c[0] for c in categories], "data": [round(c[1], 2) for c in categories]},
+        "top_products": top_products,
+        "discounts": discounts,
+        "payment_methods": payments,
+        "detailed": detailed,
+    }
+
+
+# ============================================================
+# 🔹 BACKFILL
+# ============================================================
+def _backfill_from(conn, sales, payments, batch_size, verbose):
+    cur = conn.cursor()
+    pending = cur.execute(f"""
+        SELECT s.transaction_id,
+               COALESCE((SELECT MAX(timestamp) FROM {payments} p WHERE p.transaction_id = s.transaction_id),
+                        MAX(s.datetime)) AS paid_at
+        FROM {sales} s
+        WHERE s.status = 'PAID'
+          AND s.transaction_id NOT IN (SELECT transaction_id FROM analytics_rollup_log)
+        GROUP BY s.transaction_id
+        ORDER BY paid_at
+    """).fetchall()
+
+    done = 0
+    for i in range(0, len(pending), batch_size):
+        conn.execute("BEGIN IMMEDIATE")
+        for txn_id, paid_at in pending[i:i + batch_size]:
+            done += rollup_transaction(cur, txn_id, paid_at, sales, payments)
+        conn.commit()
+        if verbose:
+            print(f"… {min(i + batch_size, len(pending))}/{len(pending)} transactions")
+    return done
+
+
+def backfill(conn, rebuild=False, batch_size=200, verbose=False, archive_dir=None):
+    """Rolls up every PAID transaction that is not in the rollups yet; returns how many.
+
+    With archive_dir, the monthly archives (see archive.py) are read too,
+    one attached file at a time.
+    """
+    from archive import archive_months, attach_month, ARCHIVED_TABLES
+
+    if rebuild:
+        conn.execute("BEGIN IMMEDIATE")
+        for table in ROLLUP_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+        conn.commit()
+
+    done = 0
+    for month in archive_months(archive_dir) if archive_dir else []:
+        schema = attach_month(conn, archive_dir, month)
+        try:
+            if verbose:
+                print(f"📦 {month}")
+            done += _backfill_from(conn, *(f"{schema}.{t}" for t in ARCHIVED_TABLES), batch_size, verbose)
+        finally:
+            conn.execute("DETACH DATABASE " + schema)
+    return done + _backfill_from(conn, "sales", "payments", batch_size, verbose)
+
+
+def main(argv=None):
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Paluto POS sales analytics rollups")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "paluto.db"))
+    parser.add_argument("--backfill", action="store_true", help="roll up PAID history not yet counted")
+    parser.add_argument("--rebuild", action="store_true", help="with --backfill: recompute from scratch")
+    parser.add_argument("--archive-dir", help="monthly archives to include (default: archive/ next to the db)")
+    args = parser.parse_args(argv)
+
+    if not args.backfill:
+        parser.print_help()
+        return 1
+
+    from archive import default_archive_dir
+
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    try:
+        migrate(conn)
+        count = backfill(conn, rebuild=args.rebuild, verbose=True,
+                         archive_dir=args.archive_dir or default_archive_dir(args.db))
+        print(f"✅ Rolled up {count} transactions")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
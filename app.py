@@ -3,7 +3,7 @@
 # ============================================================
 
 from flask import Flask, make_response, render_template, request, redirect, url_for, jsonify, Response, session
-import sqlite3, random, string, io, csv
+import sqlite3, threading, json, math, hmac
 
 app = Flask(__name__)
 app.secret_key = "super_secret_paluto_key"  # any random string
@@ -12,7 +12,7 @@ DB = "paluto.db"
 # ============================================================
 # 🔹 RECEIPT (PDF GENERATION) MODULES
 # ============================================================
-from datetime import datetime
+from datetime import datetime, date, timedelta
 from flask import send_file
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
@@ -39,11 +39,55 @@ DB = os.path.join(ROOT_DIR, "paluto.db")
 # ============================================================
 # 🔹 DATABASE CONNECTION UTILITY
 # ============================================================
+from db import ConnectionPool
+from migrations import migrate
+from kitchen_stream import kitchen_feed, sse, parse_event_id, RETRY_MS
+from catalog import product_catalog, product_key
+from totals import get_totals
+from print_queue import PrintQueue
+from printers import backend_from_env
+from analytics import rollup_transaction, sales_analytics
+from exports import EXPORT_FORMATS, export_filters, export_stream, release_export
+from table_state import load_tables, table_state_version, table_state_etag
+from metrics import Metrics
+from write_queue import AddItemWriter
+from credentials import AuthCache, check_login
+from archive import Archiver, default_archive_dir
+from backup import BackupScheduler
+from txn_ids import reserve_transaction_id, lookup_prefix, lookup_range
+from zreport import Z_REPORT_JOB_PREFIX, DayClosed, close_day, parse_day, record_cash_count, z_report
+from queries import (RECEIPT_LINES_SQL, PRINT_LINES_SQL, PAYMENT_LINES_SQL, PAYMENTS_SQL, KITCHEN_ORDERS_SQL,
+                     KITCHEN_TICKET_SQL, UPDATE_ORDER_STATUS_SQL)
+from money import to_centavos, to_pesos, line_amount, vat_breakdown, senior_pwd_deduction, percent_of, allocate
+
+def metrics_authorized():
+    """/metrics shows SQL text: admins only, or a scraper sending Bearer $PALUTO_METRICS_TOKEN."""
+    if session.get("role") == "admin":
+        return True
+    token = os.environ.get("PALUTO_METRICS_TOKEN")
+    sent = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(sent.encode(), f"Bearer {token}".encode())
+
+metrics = Metrics()          # 📊 /metrics: route timings, SQL timings, lock waits
+metrics.install(app, authorized=metrics_authorized)
+db_pool = ConnectionPool(DB, observer=metrics.observe_sql)
+auth_cache = AuthCache()     # 🔐 user records + today's opening cash, cleared on auth_version change
+
+def opening_cash_day():
+    """Today as daily_opening_cash.date_opened stores it (SQLite date('now'), UTC)."""
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
 def get_db():
-    """Establishes and returns an SQLite database connection."""
-    conn = sqlite3.connect(DB, timeout=5, check_same_thread=False)
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-    return conn
+    """Borrows a pooled WAL-mode SQLite connection; conn.close() returns it to the pool."""
+    return db_pool.connect()
+
+def init_db():
+    """Brings paluto.db up to the latest schema version (see migrations.py)."""
+    conn = get_db()
+    try:
+        return migrate(conn, verbose=True)
+    finally:
+        conn.close()
 
 # ============================================================
 # 🔹 UNIVERSAL LOGIN (Admin + Cashier)
@@ -56,10 +100,10 @@ def login():
         password = request.form.get("password")
 
         conn = get_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM user_credentials WHERE username=? AND password=?", (username, password))
-        user = cur.fetchone()
-        conn.close()
+        try:
+            user = check_login(conn, auth_cache, username, password)
+        finally:
+            conn.close()
 
         if user:
             # ✅ Save user info in session
@@ -107,54 +151,40 @@ def tables():
     # ✅ Ensure opening cash is set for today before accessing tables
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("""
-        SELECT * FROM daily_opening_cash
-        WHERE username = ? AND date_opened = date('now')
-    """, (session["username"],))
-    opening_cash = cur.fetchone()
+    opening_cash = auth_cache.opening_cash(conn, session["username"], opening_cash_day())
     if not opening_cash:
         conn.close()
         return redirect(url_for("opening_cash"))
 
-    # 🔍 Debug (optional): Check if the session name is being stored
-    print("Session name:", session.get("name"))
-
-    # 🪑 Get all active or served tables from sales
-    cur.execute("""
-        SELECT DISTINCT table_id, transaction_id, status, order_mode
-        FROM sales
-        WHERE status IN ('ACTIVE', 'READY', 'SERVED')
-    """)
-    sales = cur.fetchall()
-
-    all_tables = []
-
-    # 🍽️ Regular tables (1–50)
-    for i in range(1, 51):
-        match = next((s for s in sales if s["table_id"] == i), None)
-        all_tables.append({
-            "table_id": i,
-            "status": "ACTIVE" if match else "AVAILABLE",
-            "transaction_id": match["transaction_id"] if match else None,
-            "order_mode": match["order_mode"] if match else None
-        })
-
-    # 🛖 Kubo huts (101–107)
-    for i in range(101, 108):  # fixed upper bound (include 107)
-        match = next((s for s in sales if s["table_id"] == i), None)
-        all_tables.append({
-            "table_id": i,
-            "status": "ACTIVE" if match else "AVAILABLE",
-            "transaction_id": match["transaction_id"] if match else None,
-            "order_mode": match["order_mode"] if match else None
-        })
-
+    # 🪑 Floor map from the trigger-maintained table_state; the version is read
+    # first so a change in between only makes the first poll fetch it again
+    etag = table_state_etag(table_state_version(cur))
+    all_tables = load_tables(cur)
     conn.close()
 
     # ✅ Pass opening cash to template (optional display in tables.html)
-    return render_template("tables.html", tables=all_tables, opening_cash=opening_cash)
+    return render_template("tables.html", tables=all_tables, opening_cash=opening_cash, tables_etag=etag)
+
 
 
+@app.route("/api/tables")
+def tables_api():
+    """Floor map as JSON; clients poll with If-None-Match and get 304 until a table changes."""
+    if "role" not in session:
+        return jsonify({"error": "Login required"}), 401
+
+    conn = get_db()
+    cur = conn.cursor()
+    etag = table_state_etag(table_state_version(cur))
+    if etag in request.headers.get("If-None-Match", ""):
+        conn.close()
+        return Response(status=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    body = json.dumps({"tables": load_tables(cur)})
+    conn.close()
+    return Response(body, mimetype="application/json",
+                    headers={"ETag": etag, "Cache-Control": "no-cache"})
+
 
 # ============================================================
 # 🔹 OPENING CASH SETUP
@@ -168,11 +198,7 @@ def opening_cash():
     cur = conn.cursor()
 
     # Check if already set today for this user
-    cur.execute("""
-        SELECT * FROM daily_opening_cash
-        WHERE username = ? AND date_opened = date('now')
-    """, (session["username"],))
-    existing = cur.fetchone()
+    existing = auth_cache.opening_cash(conn, session["username"], opening_cash_day())
 
     if request.method == "POST":
         print("🧾 FORM SUBMITTED:", request.form)  # debug
@@ -240,12 +266,25 @@ def opening_cash():
 # ============================================================
 # 🔹 START NEW ORDER
 # ============================================================
+def new_transaction_id(table_id, order_type):
+    """Reserves a time-ordered transaction id (see txn_ids.py)."""
+    try:
+        table_id = int(table_id)
+    except (TypeError, ValueError):
+        table_id = None
+    conn = get_db()
+    try:
+        return reserve_transaction_id(conn, table_id, order_type, session.get("name"))
+    finally:
+        conn.close()
+
+
 @app.route("/start_order", methods=["POST"])
 def start_order():
     """Creates a new transaction and redirects to POS screen."""
     table_id = request.form.get("table_id")
     order_type = request.form.get("order_type", "regular")
-    txn_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+    txn_id = new_transaction_id(table_id, order_type)
     return redirect(url_for("pos", table_id=table_id, txn_id=txn_id, order_type=order_type))
 
 
@@ -265,7 +304,7 @@ def pos():
 
     # Generate new txn_id if missing
     if not txn_id or txn_id == 'None':
-        new_txn_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+        new_txn_id = new_transaction_id(table_id, order_type)
         return redirect(url_for('pos', table_id=table_id, txn_id=new_txn_id, order_type=order_type))
 
     # Render page with no caching
@@ -279,56 +318,97 @@ def pos():
     return response
 
 
+# ============================================================
+# 🔹 TRANSACTION LOOKUP
+# ============================================================
+@app.route("/api/transactions/lookup")
+def transaction_lookup():
+    """Resolves ?q=<partial id> or ?start=&end= (local dates) by a range scan on the id.
+
+    Returns up to 50 transactions with their table, cashier and totals.
+    """
+    if "role" not in session:
+        return jsonify({"error": "Login required"}), 401
+    conn = get_db()
+    try:
+        if request.args.get("q"):
+            found = lookup_prefix(conn, request.args["q"], archive_dir=ARCHIVE_DIR)
+        elif request.args.get("start") or request.args.get("end"):
+            today = date.today().isoformat()
+            found = lookup_range(conn, request.args.get("start") or today, request.args.get("end") or today,
+                                 archive_dir=ARCHIVE_DIR)
+        else:
+            return jsonify({"error": "Give ?q= (part of the id) or ?start=&end= (YYYY-MM-DD)."}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        conn.close()
+    return jsonify({"transactions": found})
+
+
 # ============================================================
 # 🔹 ADD ITEM TO ORDER
 # ============================================================
+def add_item_tap(data):
+    """Validates one /add_item tap before it is queued; raises ValueError.
+
+    A bad tap must be refused here: the writer commits taps in shared batches.
+    """
+    try:
+        tap = {
+            "transaction_id": str(data["transaction_id"]),
+            "table_id": data["table_id"],
+            "product_id": product_key(data["product_id"]),
+            "uom": str(data["uom"]).upper(),
+            "price": float(data["price"]),
+            "qty": int(data.get("qty") or 0),
+            "grams": float(data.get("grams") or 0),
+            "order_type": data.get("order_type", "regular"),
+        }
+    except (KeyError, TypeError, ValueError, AttributeError):
+        raise ValueError("Invalid item.")
+    if (not tap["transaction_id"] or tap["uom"] not in ("KG", "SERVE") or not math.isfinite(tap["price"])
+            or not math.isfinite(tap["grams"]) or tap["price"] < 0 or tap["qty"] < 0 or tap["grams"] < 0):
+        raise ValueError("Invalid item.")
+    return tap
+
+
 @app.route("/add_item", methods=["POST"])
 def add_item():
-    """Adds or updates an item in the active sales list."""
-    data = request.get_json()
-    txn_id = data["transaction_id"]
-    table_id = data["table_id"]
-    product_id = data["product_id"]
-    uom = data["uom"]
-    price = float(data["price"])
-    qty = int(data["qty"])
-    grams = float(data.get("grams") or 0)
-    order_type = data.get("order_type", "regular")
-
-    subtotal = price * qty if uom.upper() == "SERVE" else price * (grams / 1000)
-    conn = get_db()
-    cur = conn.cursor()
+    """Adds or updates an item in the active sales list.
 
-    # Check if item already exists in ACTIVE order
-    cur.execute("""
-        SELECT id, quantity, weight_in_kg, subtotal 
-        FROM sales 
-        WHERE transaction_id = ? AND product_id = ? AND status = 'ACTIVE'
-    """, (txn_id, product_id))
-    existing = cur.fetchone()
-
-    if existing:
-        # Update existing item
-        new_qty = existing["quantity"] + qty
-        new_weight = (existing["weight_in_kg"] or 0) + (grams / 1000)
-        new_subtotal = price * new_qty if uom.upper() == "SERVE" else price * new_weight
-        cur.execute("""
-            UPDATE sales
-            SET quantity = ?, weight_in_kg = ?, subtotal = ?, total = ?
-            WHERE id = ?
-        """, (new_qty, new_weight, new_subtotal, new_subtotal, existing["id"]))
-    else:
-        # Insert new item
-        cur.execute("""
-            INSERT INTO sales (
-                transaction_id, table_id, product_id, weight_in_kg, quantity, subtotal, discount, total, datetime, status, order_mode
-            )
-            VALUES (?, ?, ?, ?, ?, ?, 0, ?, datetime('now'), 'ACTIVE', ?)
-        """, (txn_id, table_id, product_id, grams / 1000, qty, subtotal, subtotal, order_type))
+    An Idempotency-Key header (or "idempotency_key" field) makes a retried tap
+    return the first seq instead of adding the item twice; taps without one
+    are not recorded and cost no extra lookup. If the write is not confirmed
+    in time the tap stays queued: the reply is 202, and only a keyed tap can
+    be retried safely.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        tap = add_item_tap(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    tap["idempotency_key"] = request.headers.get("Idempotency-Key") or data.get("idempotency_key") or None
+
+    # ✍️ Queue the tap; the single writer coalesces taps and commits them in one batch
+    ticket = add_item_writer.submit(tap)
+    try:
+        seq = ticket.wait(timeout=ADD_ITEM_TIMEOUT_SECONDS)
+    except TimeoutError:
+        return jsonify({"queued": True, "idempotency_key": tap["idempotency_key"]}), 202
+    except Exception as e:
+        return jsonify({"error": f"Item not saved: {e}"}), 500
+    return jsonify({"success": True, "seq": seq, "idempotency_key": tap["idempotency_key"]})
+
+
+def publish_flushed(changes):
+    """Kitchen events for the transactions an add_item batch touched."""
+    for txn_id, kind in changes:
+        publish_ticket(txn_id, kind)
 
-    conn.commit()
-    conn.close()
-    return jsonify({"success": True})
+
+ADD_ITEM_TIMEOUT_SECONDS = 15
+add_item_writer = AddItemWriter(get_db, on_flushed=publish_flushed)
 
 
 # ============================================================
@@ -353,12 +433,12 @@ def get_receipt(txn_id):
     """Returns all items in a transaction for the POS live receipt."""
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("""
-        SELECT s.*, p.type, p.variety_1, p.variety_2, p.state_1, p.state_2, p.luto, p.uom, p.price
-        FROM sales s JOIN products p ON s.product_id = p.id
-        WHERE s.transaction_id = ? AND s.status IN ('PENDING', 'ACTIVE', 'READY', 'SERVED')
-    """, (txn_id,))
-    items = [dict(row) for row in cur.fetchall()]
+    catalog = product_catalog.current(conn)
+    cur.execute(RECEIPT_LINES_SQL, (txn_id,))
+    items = [
+        catalog.with_product(row, ("type", "variety_1", "variety_2", "state_1", "state_2", "luto", "uom", "price"))
+        for row in cur.fetchall() if catalog.product(row["product_id"])
+    ]
     conn.close()
     return jsonify(items)
 
@@ -366,46 +446,94 @@ def get_receipt(txn_id):
 # ============================================================
 # 🔹 CHECKOUT — SAVE ORDER
 # ============================================================
+def checkout_lines(orders):
+    """Validates the checkout payload once and computes every line total in one pass.
+
+    Returns a list of (product_id, qty, weight_in_kg, subtotal); raises ValueError.
+    """
+    lines = []
+    for n, item in enumerate(orders, start=1):
+        try:
+            product_id = product_key(item["product_id"])
+            uom = str(item["uom"]).upper()
+            price = float(item["price"])
+            qty = int(item.get("qty") or 0)
+            weight = float(item.get("grams") or 0) / 1000.0
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError(f"Invalid item #{n} in order.")
+        if uom not in ("KG", "SERVE") or price < 0 or qty < 0 or weight < 0:
+            raise ValueError(f"Invalid item #{n} in order.")
+
+        subtotal = to_pesos(line_amount(price, weight_kg=weight) if uom == "KG" else line_amount(price, qty))
+        lines.append((product_id, qty, weight, subtotal))
+    return lines
+
+
 @app.route("/checkout/<txn_id>", methods=["POST"])
 def checkout(txn_id):
-    """Save all items for the transaction and mark it ACTIVE."""
+    """Save all items for the transaction in one write transaction and mark it ACTIVE.
+
+    An Idempotency-Key header (or "idempotency_key" field) makes retries and
+    double taps of "Save Order" return the first result instead of writing twice.
+    """
+    data = request.get_json(silent=True) or {}
+    orders = data.get("orders", [])
+    table_id = data.get("table_id")
+    order_type = data.get("order_type")
+    idem_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+
+    if not orders:
+        return jsonify({"error": "No orders received"}), 400
     try:
-        data = request.get_json()
-        orders = data.get("orders", [])
-        table_id = data.get("table_id")
-        order_type = data.get("order_type")
+        lines = checkout_lines(orders)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        if not orders:
-            return jsonify({"error": "No orders received"}), 400
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
 
-        conn = get_db()
-        cur = conn.cursor()
+        if idem_key:
+            cur.execute("SELECT transaction_id, line_ids FROM checkout_requests WHERE idempotency_key = ?", (idem_key,))
+            done = cur.fetchone()
+            if done:
+                conn.rollback()
+                return jsonify({"message": "Order already saved.", "line_ids": json.loads(done["line_ids"]),
+                                "replayed": True})
+
+        on_board = has_kitchen_ticket(cur, txn_id)
+
+        cur.executemany("""
+            INSERT INTO sales (transaction_id, table_id, product_id, quantity, weight_in_kg, subtotal, total, status, order_mode)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'ACTIVE', ?)
+        """, [(txn_id, table_id, pid, qty, weight, subtotal, subtotal, order_type)
+              for pid, qty, weight, subtotal in lines])
 
-        for item in orders:
-            cur.execute("""
-                INSERT INTO sales (transaction_id, table_id, product_id, quantity, weight_in_kg, subtotal, total, status, order_mode)
-                VALUES (?, ?, ?, ?, ?, ?, ?, 'PENDING', ?)
-            """, (
-                txn_id,
-                table_id,
-                item.get("product_id"),
-                item.get("qty"),
-                (item.get("grams", 0) / 1000.0),
-                (item.get("price") * (item.get("grams", 0) / 1000.0) if item.get("uom").upper() == "KG" else item.get("qty") * item.get("price")),
-                (item.get("price") * (item.get("grams", 0) / 1000.0) if item.get("uom").upper() == "KG" else item.get("qty") * item.get("price")),
-                order_type
-            ))
-
-        # Mark transaction ACTIVE
-        cur.execute("UPDATE sales SET status='ACTIVE' WHERE transaction_id=?", (txn_id,))
+        # AUTOINCREMENT ids are consecutive while we hold the write lock
+        last_id = cur.execute("SELECT last_insert_rowid()").fetchone()[0]
+        line_ids = list(range(last_id - len(lines) + 1, last_id + 1))
+
+        # New items go back to the kitchen: reopen lines already READY/SERVED
+        cur.execute("""
+            UPDATE sales SET status = 'ACTIVE'
+            WHERE transaction_id = ? AND status IN ('PENDING', 'READY', 'SERVED')
+        """, (txn_id,))
+
+        if idem_key:
+            cur.execute("INSERT INTO checkout_requests (idempotency_key, transaction_id, line_ids) VALUES (?, ?, ?)",
+                        (idem_key, txn_id, json.dumps(line_ids)))
         conn.commit()
-        conn.close()
 
-        return jsonify({"message": "Order saved successfully!"})
-    
-    except Exception as e:
+    except sqlite3.Error as e:
+        conn.rollback()
         print("❌ Checkout error:", str(e))
-        return jsonify({"error": str(e)})
+        return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
+
+    publish_ticket(txn_id, "items_added" if on_board else "new")
+    return jsonify({"message": "Order saved successfully!", "line_ids": line_ids})
 
 
 
@@ -414,13 +542,23 @@ def checkout(txn_id):
 # ============================================================
 @app.route("/fetch_products")
 def fetch_products():
-    """Provides all products for the POS product grid."""
+    """Provides all products for the POS product grid (cached, gzip, ETag → 304)."""
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM products")
-    data = [dict(row) for row in cur.fetchall()]
+    catalog = product_catalog.current(conn)
     conn.close()
-    return jsonify(data)
+
+    use_gzip = "gzip" in request.accept_encodings
+    etag = catalog.gzip_etag if use_gzip else catalog.etag
+    if request.if_none_match.contains(catalog.etag) or request.if_none_match.contains(catalog.gzip_etag):
+        response = Response(status=304)
+    else:
+        response = Response(catalog.gzip_body if use_gzip else catalog.json_body, mimetype="application/json")
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
 
 # ============================================================
 # 🔹 PAYMENT FUNCTIONS
@@ -430,30 +568,30 @@ def record_payment(txn_id):
     """Records a payment but only applies up to the remaining balance; computes change."""
     try:
         data = request.get_json()
-        amount_given = float(data.get("amount", 0))
+        given = to_centavos(data.get("amount", 0))
         method = data.get("method", "CASH")
 
         conn = get_db()
-        cur = conn.cursor()
-
-        # 🧮 Compute totals safely
-        cur.execute("SELECT SUM(subtotal - COALESCE(discount, 0)) FROM sales WHERE transaction_id = ?", (txn_id,))
-        total_bill = cur.fetchone()[0] or 0
+        try:
+            cur = conn.cursor()
 
-        cur.execute("SELECT SUM(amount) FROM payments WHERE transaction_id = ?", (txn_id,))
-        already_paid = cur.fetchone()[0] or 0
+            # 🔒 Take the write lock first so concurrent partial payments see each other
+            cur.execute("BEGIN IMMEDIATE")
 
-        remaining = total_bill - already_paid
-        applied_amount = min(amount_given, remaining)
-        change = max(amount_given - remaining, 0)
+            # 🧮 Compute totals safely (O(1) read of the running totals, exact centavos)
+            remaining = get_totals(cur, txn_id)["remaining_centavos"]
+            applied = max(min(given, remaining), 0)
+            amount_given, applied_amount = to_pesos(given), to_pesos(applied)
+            change = to_pesos(max(given - remaining, 0))
 
-        # 💾 Save only the applied amount
-        cur.execute(
-            "INSERT INTO payments (transaction_id, amount, method) VALUES (?, ?, ?)",
-            (txn_id, applied_amount, method)
-        )
-        conn.commit()
-        conn.close()
+            # 💾 Save only the applied amount
+            cur.execute(
+                "INSERT INTO payments (transaction_id, amount, method) VALUES (?, ?, ?)",
+                (txn_id, applied_amount, method)
+            )
+            conn.commit()
+        finally:
+            conn.close()  # back to the pool; an unfinished transaction is rolled back there
 
         print(f"✅ Payment recorded: txn={txn_id}, given={amount_given}, applied={applied_amount}, change={change}")
         return jsonify({
@@ -472,179 +610,117 @@ def record_payment(txn_id):
 # ==========================
 @app.route("/complete_payment/<txn_id>", methods=["POST"])
 def complete_payment(txn_id):
-    """Marks order as PAID when fully settled and prints receipt."""
+    """Marks order as PAID when fully settled and queues the receipt."""
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("UPDATE sales SET status='PAID' WHERE transaction_id=?", (txn_id,))
-    conn.commit()
-    conn.close()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("UPDATE sales SET status='PAID', cashier=? WHERE transaction_id=?", (session.get("name"), txn_id))
+        cur.execute("SELECT table_id FROM sales WHERE transaction_id=? LIMIT 1", (txn_id,))
+        row = cur.fetchone()
+        rollup_transaction(cur, txn_id)  # 📈 dashboard aggregates, same write transaction
+        conn.commit()
+    finally:
+        conn.close()  # back to the pool; an unfinished transaction is rolled back there
+    publish_ticket(txn_id, "PAID")
 
-    # 🖨️ Print receipt and capture result message
-    result_message = print_receipt(txn_id)
+    # 🖨️ Hand the receipt to the print worker; the cashier doesn't wait for it
+    job_id = print_queue.enqueue(txn_id, row["table_id"] if row else None, session.get("name"))
 
-    return jsonify({"message": f"Payment successful! {result_message}"})
+    return jsonify({"message": f"Payment successful! 🖨️ Receipt queued (job #{job_id}).",
+                    "print_job_id": job_id})
 
 
 # ============================================================
 # 🔹 PRINT RECEIPT FUNCTION (PERFECT CENTERED HEADER)
 # ============================================================
-import platform, os, textwrap
 from datetime import datetime
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
+from receipts import get_template, get_z_template, invoice_body, invoice_closing, z_report_body
 
-def generate_receipt_pdf(lines, pdf_path, char_width=38, font_name="Courier", font_size=7.0, margin_mm=10.5):
+def print_receipt(txn_id, table_id=None, cashier=None):
     """
-    Improved version: Centers entire receipt content evenly on paper.
-    - <C> still explicitly centers header text
-    - Non-<C> lines (items/totals) are horizontally centered as a block
-    - Works perfectly for 58mm & 80mm printers
+    Generates PALUTO-style TEMPORARY INVOICE receipt and sends it to the printer.
+    Runs on the print queue worker: raises on failure so the job is retried.
     """
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import mm
-    import textwrap
-
-    width_mm = 75  # near full printable width for 58mm roll
-    width_pt = width_mm * mm
-    line_height = font_size * 1.22
-    total_lines = sum(len(textwrap.wrap(line.replace("<C>", ""), char_width)) for line in lines) + 12
-    height_pt = (margin_mm * mm * 2) + (total_lines * line_height)
-
-    c = canvas.Canvas(pdf_path, pagesize=(width_pt, height_pt))
-    c.setFont(font_name, font_size)
-
-    y = height_pt - (margin_mm * mm)
-
-    for line in lines:
-        wrapped = textwrap.wrap(line, char_width)
-        for wrapped_line in wrapped:
-            # Header or centered line (manual <C> tag)
-            if wrapped_line.startswith("<C>"):
-                text = wrapped_line.replace("<C>", "").strip()
-                text_width = c.stringWidth(text, font_name, font_size)
-                c.drawString((width_pt - text_width) / 2, y, text)
-            else:
-                # NEW: auto-center non-<C> lines (body/totals)
-                text_width = c.stringWidth(wrapped_line, font_name, font_size)
-                c.drawString((width_pt - text_width) / 2, y, wrapped_line)
-            y -= line_height
+    conn = get_db()
+    cur = conn.cursor()
+    catalog = product_catalog.current(conn)
 
-    c.showPage()
-    c.save()
-    return pdf_path
+    # === Fetch Data ===
+    cur.execute(PRINT_LINES_SQL, (txn_id,))
+    items = [catalog.with_product(row, ("variety_1", "variety_2", "luto", "uom", "price")) for row in cur.fetchall()]
 
+    totals = get_totals(cur, txn_id)
+    conn.close()
 
+    # === Layout (cached 58mm/80mm template) → PDF or ESC/POS backend ===
+    template = get_template()
+    body = invoice_body(template, items, totals, table_id, cashier)
+    closing = invoice_closing(datetime.now().strftime("%m/%d/%Y %I:%M:%S %p"))
 
-def print_receipt(txn_id):
-    """
-    Generates PALUTO-style TEMPORARY INVOICE receipt.
-    """
-    try:
-        conn = get_db()
-        cur = conn.cursor()
+    return get_receipt_backend().print_receipt(template, body, closing, f"receipt_{txn_id}")
 
-        # === Fetch Data ===
-        cur.execute("""
-            SELECT s.quantity, s.weight_in_kg, s.subtotal, s.discount, s.total,
-                   p.variety_1, p.variety_2, p.luto, p.uom, p.price
-            FROM sales s
-            LEFT JOIN products p ON s.product_id = p.id
-            WHERE s.transaction_id = ?
-        """, (txn_id,))
-        items = cur.fetchall()
 
-        cur.execute("SELECT SUM(amount) FROM payments WHERE transaction_id = ?", (txn_id,))
-        paid = cur.fetchone()[0] or 0.0
+SPOOL_DIR = os.path.join(ROOT_DIR, "print_spool")
+receipt_backend = None
+
+def get_receipt_backend():
+    """PDF (default) or raw ESC/POS backend, chosen by PALUTO_PRINTER_BACKEND (see printers.py)."""
+    global receipt_backend
+    if receipt_backend is None:
+        receipt_backend = backend_from_env(ROOT_DIR, SPOOL_DIR)
+    return receipt_backend
 
-        cur.execute("SELECT SUM(subtotal - COALESCE(discount,0)) FROM sales WHERE transaction_id = ?", (txn_id,))
-        total = cur.fetchone()[0] or 0.0
+
+def print_z_report(day):
+    """Prints a day's Z-reading through the same queue and backend as the receipts."""
+    conn = get_db()
+    try:
+        report = z_report(conn, day, ARCHIVE_DIR)
+    finally:
         conn.close()
+    template = get_z_template()
+    closing = [f"<C>{datetime.now().strftime('%m/%d/%Y %I:%M:%S %p')}", ""]
+    return get_receipt_backend().print_receipt(template, z_report_body(template, report), closing, f"zreport_{day}")
+
+
+def run_print_job(job):
+    """Print queue handler: one print_jobs row → one printed receipt (or Z-reading)."""
+    if job["transaction_id"].startswith(Z_REPORT_JOB_PREFIX):
+        return print_z_report(job["transaction_id"][len(Z_REPORT_JOB_PREFIX):])
+    return print_receipt(job["transaction_id"], job["table_id"], job["cashier"])
+
+
+print_queue = PrintQueue(get_db, run_print_job)
+
+ARCHIVE_DIR = default_archive_dir(DB)   # monthly archives of closed transactions (archive.py)
+archiver = Archiver(DB, ARCHIVE_DIR)
+backup_scheduler = BackupScheduler(DB, archive_dir=ARCHIVE_DIR)   # verified snapshots in backups/
 
-        change = max(paid - total, 0.0)
-        vatable = total / 1.12 if total > 0 else 0.0
-        vat_amt = total - vatable
-        now = datetime.now().strftime("%m/%d/%Y %I:%M:%S %p")
-
-        # === Header (Centered) ===
-        lines = [
-            "<C>PALUTO SEAFOOD GRILL",
-            "<C>& RESTAURANT",
-            "<C>- Passi Branch -",
-            "<C>PIGGLY FOODS CORP.",
-            "<C>TIN #: 010-748-236-00004",
-            "<C>Sablogon, Passi City,",
-            "<C>Iloilo",
-            "",
-            "<C>TEMPORARY INVOICE",
-            "-" * 38,
-            f"{'QTY':<5}{'DESC':<23}{'AMT':>10}",
-            "-" * 38
-        ]
-
-        # === Items ===
-        for r in items:
-            name = " ".join(filter(None, [r["variety_1"], r["variety_2"], r["luto"]]))
-            qty = f"{int(r['quantity'])}" if (r["uom"] or "").upper() == "SERVE" else f"{r['weight_in_kg']*1000:.0f}g"
-            subtotal = r["subtotal"]
-
-            wrapped = textwrap.wrap(name, 23)
-            lines.append(f"{qty:<5}{wrapped[0]:<23}{format(subtotal, '.2f'):>10}")
-            for w in wrapped[1:]:
-                lines.append(f"{'':<5}{w:<23}{'':>10}")
-
-        # === Footer ===
-        lines += [
-            "-" * 38,
-            f"{'TOTAL:':<27}{format(total, '.2f'):>11}",
-            "-" * 38,
-            f"{'TOTAL:':<27}{format(total, '.2f'):>11}",
-            f"{'AMT. TENDERED:':<27}{format(paid, '.2f'):>11}",
-            f"{'CHANGE:':<27}{format(change, '.2f'):>11}",
-            "-" * 38,
-            f"{'CUSTOMER:':<27}",
-            f"{'ADDRESS:':<27}",
-            f"{'TIN:':<27}",
-            f"{'B. STYLE:':<27}",
-            "-" * 38,
-            f"{'VATABLE SALES:':<27}{format(vatable, '.2f'):>11}",
-            f"{'VAT AMOUNT:':<27}{format(vat_amt, '.2f'):>11}",
-            f"{'VAT EXEMPT SALES:':<27}{'0.00':>11}",
-            "-" * 38,
-            f"{'NO. OF ITEM(S):':<27}{len(items):>11}",
-            f"TABLE #: {session.get('table_id', '')}",
-            f"CASHIER: {session.get('name', '')}",
-            "-" * 38,
-            "",
-            "<C>THIS SERVES AS TEMPORARY",
-            "<C>INVOICE",
-            f"<C>{now}",
-            ""
-        ]
-
-        # === Generate PDF ===
-        pdf_filename = os.path.join(ROOT_DIR, f"receipt_{txn_id}.pdf")
-        generate_receipt_pdf(lines, pdf_filename, char_width=38, font_size=7.0)
-
-        # === Print / Save ===
-        current_os = platform.system().lower()
-        if "windows" in current_os:
-            import win32print, win32api
-            printer_name = win32print.GetDefaultPrinter() or ""
-            if "microsoft print to pdf" in printer_name.lower():
-                print(f"⚠️ No physical printer detected. PDF saved: {pdf_filename}")
-                return f"⚠️ No printer detected. PDF saved as {pdf_filename}"
-            else:
-                try:
-                    win32api.ShellExecute(0, "print", pdf_filename, f'"{printer_name}"', ".", 0)
-                    return f"✅ Receipt printed on: {printer_name}"
-                except Exception as e:
-                    return f"❌ Print failed: {e}"
-        else:
-            return f"⚠️ PDF saved: {pdf_filename} (printing not implemented on this OS)."
 
-    except Exception as ex:
-        print("PRINT ERROR:", ex)
-        return f"❌ Error printing: {ex}"
+@app.route("/api/print_jobs/<int:job_id>")
+def print_job_status(job_id):
+    """Status of one print job (QUEUED / PRINTING / DONE / FAILED)."""
+    job = print_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Print job not found"}), 404
+    return jsonify(job)
+
+
+@app.route("/api/print_jobs/txn/<txn_id>")
+def print_jobs_for_txn(txn_id):
+    """Every print job recorded for a transaction, oldest first."""
+    return jsonify(print_queue.jobs_for(txn_id))
+
+
+@app.route("/api/reprint/<txn_id>", methods=["POST"])
+def reprint_receipt(txn_id):
+    """Queues another copy of a transaction's receipt."""
+    jobs = print_queue.jobs_for(txn_id)
+    if not jobs:
+        return jsonify({"error": "No receipt was printed for this transaction."}), 404
+    job_id = print_queue.enqueue(txn_id, jobs[-1]["table_id"], jobs[-1]["cashier"])
+    return jsonify({"success": True, "print_job_id": job_id})
 
 
 
@@ -663,32 +739,141 @@ def view_page():
     return render_template('view.html')
 
 
+def parse_stations(value):
+    """?station=FISH,SHELLFISH → ["FISH", "SHELLFISH"] (product categories)."""
+    return [part.strip().upper() for part in (value or "").split(",") if part.strip()]
+
+
+def load_kitchen_orders(cur, txn_id=None, stations=None, txn_ids=None):
+    """ACTIVE/READY tickets, oldest first, grouped in SQL.
+
+    Optionally limited to one transaction (txn_id), a set of them (txn_ids)
+    and/or to the lines of some stations (product categories).
+    """
+    where, params = ["s.status IN ('ACTIVE', 'READY')"], []
+    if txn_id is not None:
+        txn_ids = [txn_id]
+    if txn_ids is not None:
+        if not txn_ids:
+            return {}
+        where.append(f"s.transaction_id IN ({', '.join('?' * len(txn_ids))})")
+        params += list(txn_ids)
+    if stations:
+        where.append(f"UPPER(p.category) IN ({', '.join('?' * len(stations))})")
+        params += list(stations)
+
+    cur.execute(KITCHEN_ORDERS_SQL.format(where=" AND ".join(where)), params)
+    return {
+        row["transaction_id"]: {"table_id": row["table_id"], "status": row["status"],
+                                "items": json.loads(row["items"])}
+        for row in cur.fetchall()
+    }
+
+
+def has_kitchen_ticket(cur, txn_id):
+    """True if the transaction is already on the kitchen board."""
+    cur.execute(KITCHEN_TICKET_SQL, (txn_id,))
+    return cur.fetchone() is not None
+
+
+_publish_lock = threading.Lock()
+
+def publish_ticket(txn_id, kind):
+    """Pushes the current ticket of txn_id to every /api/kitchen_stream client."""
+    with _publish_lock:
+        conn = get_db()
+        try:
+            order = load_kitchen_orders(conn.cursor(), txn_id).get(txn_id)
+        finally:
+            conn.close()
+        kitchen_feed.publish(kind, txn_id, order)
+
+
 @app.route('/api/kitchen_orders')
 def get_kitchen_orders():
-    """Fetches all ACTIVE and READY orders for the kitchen display."""
+    """Fetches ACTIVE and READY orders for the kitchen display.
+
+    ?station=FISH,SHELLFISH  only lines of those product categories
+    ?since=<cursor>          only tickets changed after the cursor:
+                             {"cursor", "full", "orders", "removed"}
+    Without ?since the body is the plain {txn_id: order} map and the cursor
+    to continue from is in the X-Kitchen-Cursor header.
+    """
+    stations = parse_stations(request.args.get("station"))
+    since = parse_event_id(request.args.get("since"))
+    cursor = kitchen_feed.last_id  # taken before reading, so nothing slips between
+    events = kitchen_feed.events_after(since) if since is not None else None
+
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("""
-        SELECT s.transaction_id, s.table_id, s.status, p.luto, p.type,
-               p.variety_1, p.variety_2, p.state_1, p.state_2, s.datetime
-        FROM sales s JOIN products p ON s.product_id = p.id
-        WHERE s.status IN ('ACTIVE', 'READY')
-        ORDER BY s.datetime ASC
-    """)
-    rows = cur.fetchall()
+    if events is None:
+        orders = load_kitchen_orders(cur, stations=stations)
+        changed = None
+    else:
+        changed = list(dict.fromkeys(data["txn_id"] for _, data in events))
+        orders = load_kitchen_orders(cur, stations=stations, txn_ids=changed)
+        cursor = max([cursor] + [event_id for event_id, _ in events])
     conn.close()
 
-    # Group by transaction
-    orders = {}
-    for row in rows:
-        txn_id = row['transaction_id']
-        if txn_id not in orders:
-            orders[txn_id] = {'table_id': row['table_id'], 'status': row['status'], 'items': []}
-        state = row['state_1'] or row['state_2']
-        prefix = state[0].upper() + '. ' if state and (state.upper() in ['DEAD', 'ALIVE']) else ''
-        item_name = ' '.join(filter(None, [prefix, row['variety_1'], row['variety_2'], row['luto']]))
-        orders[txn_id]['items'].append(item_name)
-    return jsonify(orders)
+    if since is None:
+        response = jsonify(orders)
+        response.headers["X-Kitchen-Cursor"] = str(cursor)
+        return response
+    return jsonify({
+        "cursor": cursor,
+        "full": changed is None,
+        "orders": orders,
+        "removed": [txn for txn in changed or [] if txn not in orders],
+    })
+
+
+@app.route('/api/kitchen_stream')
+def kitchen_stream():
+    """Server-Sent Events: full snapshot on connect, then one event per changed ticket."""
+    resume_id = parse_event_id(request.headers.get("Last-Event-ID") or request.args.get("last_event_id"))
+    stations = parse_stations(request.args.get("station"))
+
+    def snapshot():
+        event_id = kitchen_feed.last_id
+        conn = get_db()
+        try:
+            orders = load_kitchen_orders(conn.cursor(), stations=stations)
+        finally:
+            conn.close()
+        return event_id, sse(orders, event="snapshot", event_id=event_id)
+
+    def for_station(data):
+        # events carry the whole ticket; a station screen only gets its own lines
+        if not stations or data["order"] is None:
+            return data
+        conn = get_db()
+        try:
+            order = load_kitchen_orders(conn.cursor(), data["txn_id"], stations).get(data["txn_id"])
+        finally:
+            conn.close()
+        return dict(data, order=order)
+
+    def generate():
+        yield f"retry: {RETRY_MS}\n\n"
+        cursor = resume_id
+        pending = kitchen_feed.events_after(cursor) if cursor is not None else None
+        while True:
+            if pending is None:
+                # New client, or it missed more than we kept → start over
+                cursor, message = snapshot()
+                yield message
+                pending = kitchen_feed.events_after(cursor)
+            for event_id, data in pending or []:
+                yield sse(for_station(data), event="ticket", event_id=event_id)
+                cursor = event_id
+            pending = kitchen_feed.wait(cursor)
+            if pending == []:
+                yield ": keepalive\n\n"
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
 
 
 @app.route('/api/update_order_status/<txn_id>/<new_status>', methods=['POST'])
@@ -698,9 +883,10 @@ def update_order_status(txn_id, new_status):
         return jsonify({'error': 'Invalid status'}), 400
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("UPDATE sales SET status = ? WHERE transaction_id = ?", (new_status, txn_id))
+    cur.execute(UPDATE_ORDER_STATUS_SQL, (new_status, txn_id))
     conn.commit()
     conn.close()
+    publish_ticket(txn_id, new_status)
     return jsonify({'success': True})
 # ============================================================
 # 🔹 RECEIPT WHEN PRESS SAVE ORDER
@@ -710,44 +896,26 @@ def payment_page(txn_id):
     """Renders the payment page, showing order details and partial payments."""
     conn = get_db()
     cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT 
-            s.id AS sale_id,
-            s.transaction_id,
-            s.product_id,
-            s.quantity,
-            s.weight_in_kg,
-            s.subtotal,
-            s.discount,
-            s.total,
-            s.order_mode,
-            s.discount_type,
-            p.type,
-            p.variety_1,
-            p.variety_2,
-            p.state_1,
-            p.state_2,
-            p.luto,
-            p.uom,
-            p.price AS product_price
-        FROM sales s
-        LEFT JOIN products p ON s.product_id = p.id
-        WHERE s.transaction_id = ? AND s.status IN ('ACTIVE', 'READY', 'SERVED')
-    """, (txn_id,))
-    sales = cur.fetchall()
-
-    cur.execute("SELECT * FROM payments WHERE transaction_id = ?", (txn_id,))
+    catalog = product_catalog.current(conn)
+
+    cur.execute(PAYMENT_LINES_SQL, (txn_id,))
+    sales = [
+        catalog.with_product(row, ("type", "variety_1", "variety_2", "state_1", "state_2", "luto", "uom", "price"),
+                             price_as="product_price")
+        for row in cur.fetchall()
+    ]
+
+    cur.execute(PAYMENTS_SQL, (txn_id,))
     payments = cur.fetchall()
+    totals = get_totals(cur, txn_id)
     conn.close()
 
-    sub_total = sum(row['subtotal'] for row in sales if row['subtotal'])
-    total_discount = sum(row['discount'] for row in sales if row['discount'])
-    vatable_sales = sub_total / 1.12 if sub_total > 0 else 0
-    vat_amount = sub_total - vatable_sales
-    total = sub_total - total_discount
-    paid_amount = sum(p['amount'] for p in payments if p['amount'])
-    remaining = total - paid_amount
+    sub_total = totals['subtotal']
+    total_discount = totals['discount']
+    vatable_sales, vat_amount = map(to_pesos, vat_breakdown(totals['subtotal_centavos']))
+    total = totals['total']
+    paid_amount = totals['paid']
+    remaining = totals['remaining']
 
     # ✅ FIXED LINE BELOW
     order_type = sales[0]['order_mode'] if sales and sales[0]['order_mode'] else 'Regular'
@@ -786,29 +954,147 @@ def dashboard_page():
     return render_template("dashboard.html")
 
 
-@app.route('/export_csv')
-def export_csv():
-    """Exports paid sales as downloadable CSV."""
+@app.route('/api/sales_analytics')
+def sales_analytics_api():
+    """Dashboard analytics for ?start=YYYY-MM-DD&end=YYYY-MM-DD (default: last 7 days)."""
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Admin login required"}), 403
+
+    today = datetime.now().date()
+    try:
+        end = date.fromisoformat(request.args.get("end") or today.isoformat())
+        start = date.fromisoformat(request.args.get("start") or (end - timedelta(days=6)).isoformat())
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD."}), 400
+    if start > end:
+        return jsonify({"error": "start must not be after end."}), 400
+
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT s.transaction_id, s.table_id, p.type, p.variety_1, p.variety_2,
-               p.state_1, p.state_2, p.luto, s.quantity, s.weight_in_kg, s.subtotal, s.datetime
-        FROM sales s JOIN products p ON s.product_id = p.id
-        WHERE s.status = 'PAID'
-        ORDER BY s.datetime DESC
-    """)
-    sales_data = cur.fetchall()
+    data = sales_analytics(conn.cursor(), start.isoformat(), end.isoformat(), today.isoformat())
     conn.close()
+    return jsonify(data)
+
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Transaction ID', 'Table ID', 'Item', 'Quantity', 'Weight (kg)', 'Subtotal', 'Timestamp'])
-    for row in sales_data:
-        full_name = ' '.join(filter(None, [row['type'], row['variety_1'], row['variety_2'], row['state_1'], row['state_2'], row['luto']]))
-        writer.writerow([row['transaction_id'], row['table_id'], full_name, row['quantity'], row['weight_in_kg'], row['subtotal'], row['datetime']])
-    output.seek(0)
-    return Response(output, mimetype="text/csv", headers={"Content-Disposition": "attachment;filename=sales_report.csv"})
+@app.route('/export_csv')
+@app.route('/export_sales')
+def export_sales():
+    """Streams paid sales as a download.
+
+    ?start=&end=      local dates (YYYY-MM-DD), inclusive
+    ?cashier=&table_id=
+    ?format=csv|columnar   ?gzip=1
+    """
+    fmt = request.args.get("format", "csv")
+    compress = request.args.get("gzip") in ("1", "true", "yes")
+    filters = {key: request.args.get(key) for key in ("start", "end", "cashier", "table_id")}
+    try:
+        export_filters(**filters)  # validate before taking a connection
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"unknown format {fmt!r}")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    _, mimetype, ext = EXPORT_FORMATS[fmt]
+    filename = f"sales_report.{ext}" + (".gz" if compress else "")
+    conn = get_db()
+    chunks = export_stream(conn, fmt, compress, archive_dir=ARCHIVE_DIR, **filters)
+    response = Response(chunks, mimetype="application/gzip" if compress else mimetype,
+                        headers={"Content-Disposition": f"attachment;filename={filename}"})
+    # runs after the stream ends or the client drops the download
+    response.call_on_close(lambda: release_export(conn))
+    return response
+
+
+# ============================================================
+# 🔹 Z-REPORT (END OF DAY)
+# ============================================================
+def z_report_day():
+    """?day=YYYY-MM-DD (default: today, local); ValueError if malformed."""
+    return parse_day(request.args.get("day") or date.today().isoformat())
+
+
+@app.route("/z_report")
+def z_report_page():
+    if "role" not in session or session["role"] != "admin":
+        return redirect(url_for("login"))
+    try:
+        day = z_report_day()
+    except ValueError:
+        day = date.today().isoformat()
+    conn = get_db()
+    try:
+        report = z_report(conn, day, ARCHIVE_DIR)
+    finally:
+        conn.close()
+    return render_template("z_report.html", report=report)
+
+
+@app.route("/api/z_report")
+def z_report_api():
+    """Z-report for ?day= as JSON: stored once the day is closed, computed live before that."""
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Admin login required"}), 403
+    try:
+        day = z_report_day()
+    except ValueError:
+        return jsonify({"error": "day must be YYYY-MM-DD."}), 400
+    conn = get_db()
+    try:
+        report = z_report(conn, day, ARCHIVE_DIR)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        conn.close()
+    return jsonify(report)
+
+
+@app.route("/api/z_report/<day>/count", methods=["POST"])
+def z_report_count(day):
+    """Records a cashier's closing cash count: {"username", "d1000": n, …, "d1": n}."""
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Admin login required"}), 403
+    data = request.get_json(silent=True) or {}
+    conn = get_db()
+    try:
+        counted = record_cash_count(conn, parse_day(day), str(data.get("username") or ""), data,
+                                    session.get("username"))
+    except DayClosed as e:
+        return jsonify({"error": str(e)}), 409
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e) or "Invalid count."}), 400
+    finally:
+        conn.close()
+    return jsonify({"success": True, "counted_cash": to_pesos(counted)})
+
+
+@app.route("/api/z_report/<day>/close", methods=["POST"])
+def z_report_close(day):
+    """Closes the day: the report is stored as it stands and served from then on."""
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Admin login required"}), 403
+    conn = get_db()
+    try:
+        report = close_day(conn, parse_day(day), session.get("username"), ARCHIVE_DIR)
+    except DayClosed as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        conn.close()
+    return jsonify(report)
+
+
+@app.route("/api/z_report/<day>/print", methods=["POST"])
+def z_report_print(day):
+    """Queues the Z-reading on the receipt printer."""
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Admin login required"}), 403
+    try:
+        day = parse_day(day)
+    except ValueError:
+        return jsonify({"error": "day must be YYYY-MM-DD."}), 400
+    job_id = print_queue.enqueue(Z_REPORT_JOB_PREFIX + day, None, session.get("name"))
+    return jsonify({"success": True, "print_job_id": job_id})
 
 
 # ============================================================
@@ -816,14 +1102,20 @@ def export_csv():
 # ============================================================
 @app.route('/apply_discount/<txn_id>', methods=['POST'])
 def apply_discount(txn_id):
-    """Applies Senior, PWD, Employee, or Custom discount logic."""
+    """Applies Senior, PWD, Employee, or Custom discount logic.
+
+    The deduction is computed once for the whole bill in centavos and split
+    over the lines by largest remainder, so the line discounts add up to it.
+    """
     data = request.get_json()
     discount_type = data.get('discount_type')
     conn = get_db()
     cur = conn.cursor()
 
-    cur.execute("SELECT SUM(subtotal) FROM sales WHERE transaction_id = ?", (txn_id,))
-    total_subtotal = cur.fetchone()[0] or 0
+    cur.execute("BEGIN IMMEDIATE")
+    cur.execute("SELECT id, subtotal FROM sales WHERE transaction_id = ? ORDER BY id", (txn_id,))
+    lines = [(row["id"], to_centavos(row["subtotal"])) for row in cur.fetchall()]
+    total_subtotal = sum(subtotal for _, subtotal in lines)
     if total_subtotal == 0:
         conn.close()
         return jsonify({'error': 'Cannot apply discount to an empty order.'}), 400
@@ -844,17 +1136,13 @@ def apply_discount(txn_id):
                 conn.close()
                 return jsonify({'error': 'Senior/PWD count cannot exceed total diners.'}), 400
             else:
-                vat_exclusive_bill = total_subtotal / 1.12
-                eligible_share = (vat_exclusive_bill / total_diners) * headcount
-                discount_amount = eligible_share * 0.20
-                total_vat = total_subtotal - vat_exclusive_bill
-                vat_exempt_share = (total_vat / total_diners) * headcount
-                total_deduction = discount_amount + vat_exempt_share
+                # 20% off the VAT-exclusive share of the eligible diners, plus their VAT
+                total_deduction = senior_pwd_deduction(total_subtotal, total_diners, headcount)
                 message = f"Applied {headcount} {discount_type.upper()} discount."
 
         # Employee discount (10%)
         elif discount_type == 'employee':
-            total_deduction = total_subtotal * 0.10
+            total_deduction = percent_of(total_subtotal, 10)
             message = "Applied 10% Employee discount."
 
         # Custom discount (user-defined %)
@@ -863,7 +1151,7 @@ def apply_discount(txn_id):
             if not (0 <= percent <= 100):
                 conn.close()
                 return jsonify({'error': 'Percentage must be between 0 and 100.'}), 400
-            total_deduction = total_subtotal * (percent / 100.0)
+            total_deduction = percent_of(total_subtotal, percent)
             message = f"Applied {percent}% custom discount."
 
         # Remove discount
@@ -875,11 +1163,12 @@ def apply_discount(txn_id):
             conn.close()
             return jsonify({'error': 'Invalid discount type specified.'}), 400
 
-        # Apply proportionally to all items
-        discount_multiplier = total_deduction / total_subtotal if total_subtotal > 0 else 0
-        cur.execute("""
-            UPDATE sales SET discount = subtotal * ?, discount_type = ? WHERE transaction_id = ?
-        """, (discount_multiplier, final_discount_type_to_save, txn_id))
+        # Apply proportionally to all items (largest remainder, exact to the centavo)
+        shares = allocate(total_deduction, [subtotal for _, subtotal in lines])
+        cur.executemany("UPDATE sales SET discount = ?, discount_type = ? WHERE id = ?", [
+            (to_pesos(share), final_discount_type_to_save, sale_id)
+            for (sale_id, _), share in zip(lines, shares)
+        ])
 
         conn.commit()
         conn.close()
@@ -894,4 +1183,9 @@ def apply_discount(txn_id):
 # 🔹 MAIN ENTRY POINT
 # ============================================================
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', debug=True)
+    from server import run as run_server
+    init_db()
+    print_queue.start()
+    archiver.start()  # 📦 moves closed transactions into monthly archives (PALUTO_ARCHIVE_INTERVAL)
+    backup_scheduler.start()  # 💾 online snapshots (PALUTO_BACKUP_INTERVAL / PALUTO_BACKUP_KEEP)
+    run_server(app)  # production WSGI server; --dev for the Flask debug server
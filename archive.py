@@ -0,0 +1,336 @@
+# ============================================================
+# PALUTO POS — MONTHLY ARCHIVES OF CLOSED TRANSACTIONS
+# ============================================================
+# sales and payments used to keep every PAID transaction forever, so the
+# live floor queried an ever-growing table. The archiver moves transactions
+# that are fully PAID and older than today into one SQLite file per month:
+#
+#   archive/paluto_2025-10.db   (sales + payments, same columns as live)
+#
+# Each batch is copied into the archive and committed there first, then
+# deleted from paluto.db in a second short transaction, so a crash in
+# between leaves a copy in both (the next run finishes it) but never loses
+# a row. Transactions are rolled up for the dashboard before they move.
+# The live tables keep open orders and today's sales only; transaction_totals
+# keeps its row for every transaction, archived or not.
+#
+# Reports read through attach_history(): it ATTACHes the months a date
+# range needs and creates TEMP views history_sales / history_payments
+# (live UNION ALL archives). A range needing more than MAX_ATTACHED files
+# is split with history_ranges() and read one sub-range at a time, as
+# exports.py does; analytics.py --backfill attaches one month at a time.
+#
+#   python archive.py                  → archive everything before today
+#   python archive.py --list           → archive files and their row counts
+# PALUTO_ARCHIVE_INTERVAL (hours, default 1; 0 = off) runs it from app.py.
+# ============================================================
+
+import argparse, os, re, sqlite3, sys, threading, time, traceback
+from datetime import date, timedelta
+
+BATCH_SIZE = 200           # transactions per copy/delete transaction
+BATCH_PAUSE = 0.05         # seconds between batches so live writes get the lock
+MAX_ATTACHED = 10          # SQLite's default SQLITE_MAX_ATTACHED
+ARCHIVED_TABLES = ("sales", "payments")
+ARCHIVE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_sales_txn ON sales(transaction_id)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_sales_status_datetime ON sales(status, datetime)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_payments_txn ON payments(transaction_id)",
+]
+_MONTH_FILE = re.compile(r"^paluto_(\d{4}-\d{2})\.db$")
+
+
+def default_archive_dir(db_path):
+    return os.environ.get("PALUTO_ARCHIVE_DIR") or os.path.join(os.path.dirname(os.path.abspath(db_path)), "archive")
+
+
+def archive_path(archive_dir, month):
+    return os.path.join(archive_dir, f"paluto_{month}.db")
+
+
+def archive_months(archive_dir):
+    """Months ("YYYY-MM") that have an archive file, oldest first."""
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(m.group(1) for m in map(_MONTH_FILE.match, os.listdir(archive_dir)) if m)
+
+
+def _schema(month):
+    return "arc_" + month.replace("-", "_")
+
+
+def _columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def attach_month(conn, archive_dir, month):
+    schema = _schema(month)
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if schema not in attached:
+        conn.execute("ATTACH DATABASE ? AS " + schema, (archive_path(archive_dir, month),))
+    return schema
+
+
+def _prepare_archive(conn, schema):
+    """Creates the archive tables like the live ones, adding columns newer migrations introduced."""
+    for table in ARCHIVED_TABLES:
+        ddl = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                           (table,)).fetchone()[0]
+        conn.execute(re.sub(rf"^CREATE TABLE (IF NOT EXISTS )?[\"`]?{table}\b[\"`]?",
+                            f"CREATE TABLE IF NOT EXISTS {schema}.{table}", ddl))
+        have = set(_columns(conn, schema, table))
+        for row in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+            if row[1] not in have:
+                conn.execute(f'ALTER TABLE {schema}.{table} ADD COLUMN "{row[1]}" {row[2]}')
+    for sql in ARCHIVE_INDEXES:
+        conn.execute(sql.format(schema=schema))
+
+
+# ============================================================
+# 🔹 ARCHIVING
+# ============================================================
+def closed_transactions(conn):
+    """{month: [transaction_id]} for fully PAID transactions whose last line is before today (local)."""
+    rows = conn.execute("""
+        SELECT s.transaction_id, strftime('%Y-%m', MAX(s.datetime), 'localtime') AS month
+        FROM sales s
+        WHERE s.status = 'PAID' AND s.datetime < datetime('now', 'localtime', 'start of day', 'utc')
+          AND NOT EXISTS (
+              SELECT 1 FROM sales o WHERE o.transaction_id = s.transaction_id
+                AND (o.status != 'PAID' OR o.datetime >= datetime('now', 'localtime', 'start of day', 'utc')))
+        GROUP BY s.transaction_id
+    """).fetchall()
+    by_month = {}
+    for txn_id, month in rows:
+        by_month.setdefault(month, []).append(txn_id)
+    return by_month
+
+
+def _move_batch(conn, schema, txn_ids):
+    marks = ", ".join("?" * len(txn_ids))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table in ARCHIVED_TABLES:
+            cols = ", ".join(f'"{c}"' for c in _columns(conn, "main", table))
+            conn.execute(f"""
+                INSERT OR IGNORE INTO {schema}.{table} ({cols})
+                SELECT {cols} FROM main.{table} WHERE transaction_id IN ({marks})
+            """, txn_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    # only rows that are now safely in the archive leave the live tables
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # the delete triggers would zero the running totals; lookups still need them
+        conn.execute("DROP TABLE IF EXISTS temp.archived_totals")
+        conn.execute(f"""
+            CREATE TEMP TABLE archived_totals AS
+            SELECT * FROM main.transaction_totals WHERE transaction_id IN ({marks})
+        """, txn_ids)
+        moved = 0
+        for table in ARCHIVED_TABLES:
+            moved += conn.execute(f"""
+                DELETE FROM main.{table} WHERE transaction_id IN ({marks})
+                  AND id IN (SELECT id FROM {schema}.{table} WHERE transaction_id IN ({marks}))
+            """, txn_ids + txn_ids).rowcount
+        conn.execute("INSERT OR REPLACE INTO main.transaction_totals SELECT * FROM temp.archived_totals")
+        conn.execute("DROP TABLE temp.archived_totals")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return moved
+
+
+def archive_closed(conn, archive_dir, batch_size=BATCH_SIZE, pause=BATCH_PAUSE, dry_run=False, verbose=False):
+    """Moves closed transactions into monthly archives; returns how many transactions moved."""
+    from analytics import backfill
+
+    backfill(conn)  # the dashboard rollups must include them before they leave
+    by_month = closed_transactions(conn)
+    if dry_run or not by_month:
+        if verbose:
+            for month, txns in sorted(by_month.items()):
+                print(f"ℹ️ {month}: {len(txns)} transactions to archive")
+        return sum(len(t) for t in by_month.values()) if dry_run else 0
+
+    os.makedirs(archive_dir, exist_ok=True)
+    done = 0
+    for month, txns in sorted(by_month.items()):
+        schema = attach_month(conn, archive_dir, month)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            _prepare_archive(conn, schema)
+            conn.commit()
+            rows = 0
+            for i in range(0, len(txns), batch_size):
+                rows += _move_batch(conn, schema, txns[i:i + batch_size])
+                time.sleep(pause)
+        finally:
+            conn.execute("DETACH DATABASE " + schema)
+        done += len(txns)
+        if verbose:
+            print(f"✅ {month}: archived {len(txns)} transactions ({rows} rows)")
+    return done
+
+
+# ============================================================
+# 🔹 READING ACROSS ARCHIVES
+# ============================================================
+def history_months(archive_dir, start=None, end=None):
+    """Archive months a report over local dates [start, end] needs.
+
+    A transaction is filed under the month of its last line, so the month
+    after `end` is included for orders that ran past midnight.
+    """
+    first = start[:7] if start else None
+    last = None
+    if end:
+        d = date.fromisoformat(end)
+        last = f"{d.year + d.month // 12}-{d.month % 12 + 1:02d}"
+    return [m for m in archive_months(archive_dir) if (first is None or m >= first) and (last is None or m <= last)]
+
+
+def history_ranges(archive_dir, start=None, end=None):
+    """Splits local dates [start, end] into consecutive sub-ranges, newest first, that
+    attach_history() can each serve with at most MAX_ATTACHED archive files.
+
+    Returns [(start, end)] when the whole range fits. Sub-ranges start on the
+    first of a month; the outer bounds stay as given (None = open).
+    """
+    months = history_months(archive_dir, start, end) if archive_dir else []
+    if len(months) <= MAX_ATTACHED:
+        return [(start, end)]
+    # each sub-range also attaches the next chunk's first month (orders past midnight)
+    chunks = [months[i:i + MAX_ATTACHED - 1] for i in range(0, len(months), MAX_ATTACHED - 1)]
+    firsts = [f"{chunk[0]}-01" for chunk in chunks]
+    ranges = []
+    for n, first in enumerate(firsts):
+        lo = start if n == 0 else first
+        hi = end if n == len(firsts) - 1 else (date.fromisoformat(firsts[n + 1]) - timedelta(days=1)).isoformat()
+        ranges.append((lo, hi))
+    return ranges[::-1]
+
+
+def attach_history(conn, archive_dir, start=None, end=None):
+    """ATTACHes the archives for [start, end] and returns the sales/payments relation names to query.
+
+    Without archives it returns the live tables. Call detach_history() before
+    the connection is reused. Raises ValueError if the range needs more files
+    than SQLite can attach at once (see history_ranges()).
+    """
+    months = history_months(archive_dir, start, end) if archive_dir else []
+    if not months:
+        return "sales", "payments"
+    if len(months) > MAX_ATTACHED:
+        raise ValueError(f"range spans {len(months)} archived months; narrow start/end to {MAX_ATTACHED} or fewer")
+    schemas = [attach_month(conn, archive_dir, month) for month in months]
+    names = []
+    for table in ARCHIVED_TABLES:
+        cols = _columns(conn, "main", table)
+        parts = [f"SELECT {', '.join(cols)} FROM main.{table}"]
+        for schema in schemas:
+            have = set(_columns(conn, schema, table))
+            if have:
+                parts.append(f"SELECT {', '.join(c if c in have else 'NULL AS ' + c for c in cols)} "
+                             f"FROM {schema}.{table}")
+        conn.execute(f"DROP VIEW IF EXISTS temp.history_{table}")
+        conn.execute(f"CREATE TEMP VIEW history_{table} AS " + " UNION ALL ".join(parts))
+        names.append(f"history_{table}")
+    return tuple(names)
+
+
+def detach_history(conn):
+    """Drops the history views and detaches every archive."""
+    for table in ARCHIVED_TABLES:
+        conn.execute(f"DROP VIEW IF EXISTS temp.history_{table}")
+    for row in conn.execute("PRAGMA database_list").fetchall():
+        if row[1].startswith("arc_"):
+            conn.execute("DETACH DATABASE " + row[1])
+
+
+# ============================================================
+# 🔹 BACKGROUND JOB
+# ============================================================
+class Archiver:
+    """Runs archive_closed every interval hours on its own connection."""
+
+    def __init__(self, db_path, archive_dir=None, interval_hours=None):
+        self.db_path = db_path
+        self.archive_dir = archive_dir or default_archive_dir(db_path)
+        self.interval = 3600 * (interval_hours if interval_hours is not None
+                                else float(os.environ.get("PALUTO_ARCHIVE_INTERVAL", 1)))
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_once(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            moved = archive_closed(conn, self.archive_dir)
+        finally:
+            conn.close()
+        if moved:
+            print(f"📦 Archived {moved} closed transactions to {self.archive_dir}")
+        return moved
+
+    def _run(self):
+        while not self._stop.wait(60):   # first run a minute after startup, then every interval
+            try:
+                self.run_once()
+            except Exception:
+                traceback.print_exc()
+            if self._stop.wait(max(self.interval - 60, 0)):
+                return
+
+
+def main(argv=None):
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Move closed transactions into monthly archive databases")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "paluto.db"))
+    parser.add_argument("--archive-dir", help="default: archive/ next to the database")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count what would move")
+    parser.add_argument("--list", action="store_true", help="list archive files and exit")
+    args = parser.parse_args(argv)
+    archive_dir = args.archive_dir or default_archive_dir(args.db)
+
+    if args.list:
+        for month in archive_months(archive_dir):
+            arc = sqlite3.connect(archive_path(archive_dir, month))
+            try:
+                counts = [arc.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ARCHIVED_TABLES]
+            finally:
+                arc.close()
+            print(f"{month}  {counts[0]:>8} sales  {counts[1]:>8} payments")
+        return 0
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        migrate(conn)
+        moved = archive_closed(conn, archive_dir, batch_size=args.batch_size, dry_run=args.dry_run, verbose=True)
+    finally:
+        conn.close()
+    print(f"{'ℹ️ Would archive' if args.dry_run else '✅ Archived'} {moved} transactions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
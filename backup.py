@@ -0,0 +1,245 @@
+# ============================================================
+# PALUTO POS — ONLINE BACKUPS (SQLite backup API)
+# ============================================================
+# paluto.db next to the exe used to be the only copy of the sales history,
+# and copying the file while the POS runs gives a torn copy. The scheduler
+# takes a snapshot every PALUTO_BACKUP_INTERVAL hours (default 6, 0 = off):
+#
+#   backups/paluto-20251031-230000/paluto.db
+#                                 /archive/paluto_2025-10.db   (archive.py)
+#
+# Pages are copied with Connection.backup in small steps with a pause in
+# between. The source connection pins one read snapshot for the whole copy:
+# in WAL mode a reader never blocks add_item or record_payment, and the
+# copy does not restart every time a cashier commits. Each snapshot is
+# checked with PRAGMA integrity_check before it replaces anything, and
+# only the newest PALUTO_BACKUP_KEEP (default 14) are kept.
+#
+#   python backup.py --now                 → take a snapshot
+#   python backup.py --list / --verify [SNAPSHOT]
+#   python backup.py --restore SNAPSHOT    → with the POS stopped
+# ============================================================
+
+import argparse, os, shutil, sqlite3, sys, threading, time, traceback
+
+from archive import archive_months, archive_path, default_archive_dir
+
+PAGES_PER_STEP = 256      # ~1 MiB with 4 KiB pages
+STEP_PAUSE = 0.005        # seconds between steps
+KEEP = int(os.environ.get("PALUTO_BACKUP_KEEP", 14))
+SNAPSHOT_PREFIX = "paluto-"
+
+
+def default_backup_dir(db_path):
+    return os.environ.get("PALUTO_BACKUP_DIR") or os.path.join(os.path.dirname(os.path.abspath(db_path)), "backups")
+
+
+def copy_database(src_path, dest_path, pages=PAGES_PER_STEP, pause=STEP_PAUSE):
+    """Consistent online copy of src_path into dest_path (a single-file, rollback-journal database)."""
+    src = sqlite3.connect(src_path, timeout=30)
+    dest = sqlite3.connect(dest_path)
+    try:
+        # pin one read snapshot; every step copies from it
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(dest, pages=pages, sleep=pause)
+        src.rollback()
+        dest.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dest.close()
+        src.close()
+
+
+def verify_database(path):
+    """Returns a list of problems (empty if PRAGMA integrity_check is ok)."""
+    if not os.path.exists(path):
+        return [f"{path}: missing"]
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        return [f"{path}: {e}"]
+    finally:
+        conn.close()
+    return [] if result == ["ok"] else [f"{path}: {line}" for line in result]
+
+
+# ============================================================
+# 🔹 SNAPSHOTS
+# ============================================================
+def list_snapshots(backup_dir):
+    """Snapshot directories, oldest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    return sorted(os.path.join(backup_dir, name) for name in os.listdir(backup_dir)
+                  if name.startswith(SNAPSHOT_PREFIX) and os.path.isdir(os.path.join(backup_dir, name)))
+
+
+def snapshot_files(snapshot):
+    """Every database file inside a snapshot directory."""
+    files = [os.path.join(snapshot, "paluto.db")]
+    archive_dir = os.path.join(snapshot, "archive")
+    files += [archive_path(archive_dir, month) for month in archive_months(archive_dir)]
+    return files
+
+
+def verify_snapshot(snapshot):
+    problems = []
+    for path in snapshot_files(snapshot):
+        problems += verify_database(path)
+    return problems
+
+
+def take_snapshot(db_path, backup_dir, archive_dir=None, keep=KEEP):
+    """Copies paluto.db and the monthly archives into a new verified snapshot; returns its path."""
+    archive_dir = archive_dir or default_archive_dir(db_path)
+    final = base = os.path.join(backup_dir, SNAPSHOT_PREFIX + time.strftime("%Y%m%d-%H%M%S"))
+    n = 1
+    while os.path.exists(final):
+        n += 1
+        final = f"{base}-{n}"
+    partial = final + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    try:
+        copy_database(db_path, os.path.join(partial, "paluto.db"))
+        for month in archive_months(archive_dir):
+            os.makedirs(os.path.join(partial, "archive"), exist_ok=True)
+            copy_database(archive_path(archive_dir, month), archive_path(os.path.join(partial, "archive"), month))
+        problems = verify_snapshot(partial)
+        if problems:
+            raise RuntimeError("snapshot failed integrity check: " + "; ".join(problems))
+        os.replace(partial, final)
+    except Exception:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+
+    for old in list_snapshots(backup_dir)[:-keep] if keep > 0 else []:
+        shutil.rmtree(old, ignore_errors=True)
+    return final
+
+
+def restore_snapshot(snapshot, db_path, archive_dir=None):
+    """Replaces paluto.db (and the archives) with a verified snapshot. Run with the POS stopped."""
+    problems = verify_snapshot(snapshot)
+    if problems:
+        raise RuntimeError("; ".join(problems))
+    archive_dir = archive_dir or default_archive_dir(db_path)
+
+    # write through SQLite so the -wal/-shm files stay consistent with the new content
+    for src_path, dest_path in [(os.path.join(snapshot, "paluto.db"), db_path)] + [
+            (archive_path(os.path.join(snapshot, "archive"), month), archive_path(archive_dir, month))
+            for month in archive_months(os.path.join(snapshot, "archive"))]:
+        os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+        src = sqlite3.connect(f"file:{src_path}?mode=ro", uri=True)
+        dest = sqlite3.connect(dest_path, timeout=30)
+        try:
+            src.backup(dest)
+        finally:
+            dest.close()
+            src.close()
+
+
+# ============================================================
+# 🔹 SCHEDULER
+# ============================================================
+class BackupScheduler:
+    """Takes a snapshot every interval hours on a background thread."""
+
+    def __init__(self, db_path, backup_dir=None, archive_dir=None, interval_hours=None, keep=KEEP):
+        self.db_path = db_path
+        self.backup_dir = backup_dir or default_backup_dir(db_path)
+        self.archive_dir = archive_dir
+        self.interval = 3600 * (interval_hours if interval_hours is not None
+                                else float(os.environ.get("PALUTO_BACKUP_INTERVAL", 6)))
+        self.keep = keep
+        self.last = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="backup", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_once(self):
+        start = time.perf_counter()
+        self.last = take_snapshot(self.db_path, self.backup_dir, self.archive_dir, self.keep)
+        print(f"💾 Backup {os.path.basename(self.last)} verified ({time.perf_counter() - start:.1f}s)")
+        return self.last
+
+    def _run(self):
+        while not self._stop.wait(120):   # first snapshot two minutes after startup
+            try:
+                self.run_once()
+            except Exception:
+                traceback.print_exc()
+            if self._stop.wait(max(self.interval - 120, 0)):
+                return
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Paluto POS backups")
+    parser.add_argument("--db", default=os.path.join(here, "paluto.db"))
+    parser.add_argument("--backup-dir", help="default: backups/ next to the database")
+    parser.add_argument("--archive-dir", help="default: archive/ next to the database")
+    parser.add_argument("--keep", type=int, default=KEEP, help="snapshots to keep")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--now", action="store_true", help="take a snapshot now")
+    action.add_argument("--list", action="store_true", help="list snapshots")
+    action.add_argument("--verify", nargs="?", const="all", metavar="SNAPSHOT", help="integrity-check snapshots")
+    action.add_argument("--restore", metavar="SNAPSHOT", help="restore a snapshot (stop the POS first)")
+    args = parser.parse_args(argv)
+    backup_dir = args.backup_dir or default_backup_dir(args.db)
+
+    def resolve(name):
+        return name if os.path.isdir(name) else os.path.join(backup_dir, name)
+
+    if args.now:
+        path = take_snapshot(args.db, backup_dir, args.archive_dir, args.keep)
+        print(f"✅ Snapshot {path}")
+        return 0
+
+    if args.list:
+        for snapshot in list_snapshots(backup_dir):
+            size = sum(os.path.getsize(f) for f in snapshot_files(snapshot) if os.path.exists(f))
+            print(f"{os.path.basename(snapshot)}  {size / 1024 / 1024:8.1f} MiB  {len(snapshot_files(snapshot))} files")
+        return 0
+
+    if args.verify:
+        snapshots = list_snapshots(backup_dir) if args.verify == "all" else [resolve(args.verify)]
+        failed = 0
+        for snapshot in snapshots:
+            problems = verify_snapshot(snapshot)
+            failed += bool(problems)
+            print(("❌ " if problems else "✅ ") + os.path.basename(snapshot) +
+                  ("".join(f"\n   {p}" for p in problems)))
+        return 1 if failed or not snapshots else 0
+
+    snapshot = resolve(args.restore)
+    problems = verify_snapshot(snapshot)
+    if problems:
+        print("❌ Not restored: " + "; ".join(problems))
+        return 1
+    # keep what is being replaced, in case the wrong snapshot was picked
+    safety = take_snapshot(args.db, backup_dir, args.archive_dir, keep=0) if os.path.exists(args.db) else None
+    try:
+        restore_snapshot(snapshot, args.db, args.archive_dir)
+    except RuntimeError as e:
+        print(f"❌ Not restored: {e}")
+        return 1
+    print(f"✅ Restored {os.path.basename(snapshot)} into {args.db}"
+          + (f" (previous state saved as {os.path.basename(safety)})" if safety else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
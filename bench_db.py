@@ -0,0 +1,206 @@
+# ============================================================
+# PALUTO POS — CASHIER THROUGHPUT BENCHMARK
+# ============================================================
+# Drives /add_item and /checkout with N concurrent cashiers against a
+# scratch copy of paluto.db, once through the original routes (a fresh
+# rollback-journal connection and a commit per request, unmigrated
+# schema) and once through the app's routes on the pooled WAL connection.
+#
+#   python bench_db.py --cashiers 8 --orders 25
+# ============================================================
+
+import argparse, os, random, shutil, sqlite3, string, tempfile, threading, time, logging
+
+from flask import Flask, request, jsonify
+
+import app as pos_app
+from db import ConnectionPool
+from migrations import migrate
+
+
+def legacy_app(path):
+    """The original /add_item and /checkout, verbatim: sqlite3.connect per request, commit per tap."""
+    legacy = Flask("paluto_legacy")
+
+    def get_db():
+        conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @legacy.route("/add_item", methods=["POST"])
+    def add_item():
+        data = request.get_json()
+        txn_id = data["transaction_id"]
+        table_id = data["table_id"]
+        product_id = data["product_id"]
+        uom = data["uom"]
+        price = float(data["price"])
+        qty = int(data["qty"])
+        grams = float(data.get("grams") or 0)
+        order_type = data.get("order_type", "regular")
+
+        subtotal = price * qty if uom.upper() == "SERVE" else price * (grams / 1000)
+        conn = get_db()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, quantity, weight_in_kg, subtotal
+            FROM sales
+            WHERE transaction_id = ? AND product_id = ? AND status = 'ACTIVE'
+        """, (txn_id, product_id))
+        existing = cur.fetchone()
+
+        if existing:
+            new_qty = existing["quantity"] + qty
+            new_weight = (existing["weight_in_kg"] or 0) + (grams / 1000)
+            new_subtotal = price * new_qty if uom.upper() == "SERVE" else price * new_weight
+            cur.execute("""
+                UPDATE sales
+                SET quantity = ?, weight_in_kg = ?, subtotal = ?, total = ?
+                WHERE id = ?
+            """, (new_qty, new_weight, new_subtotal, new_subtotal, existing["id"]))
+        else:
+            cur.execute("""
+                INSERT INTO sales (
+                    transaction_id, table_id, product_id, weight_in_kg, quantity, subtotal, discount, total, datetime, status, order_mode
+                )
+                VALUES (?, ?, ?, ?, ?, ?, 0, ?, datetime('now'), 'ACTIVE', ?)
+            """, (txn_id, table_id, product_id, grams / 1000, qty, subtotal, subtotal, order_type))
+
+        conn.commit()
+        conn.close()
+        return jsonify({"success": True})
+
+    @legacy.route("/checkout/<txn_id>", methods=["POST"])
+    def checkout(txn_id):
+        try:
+            data = request.get_json()
+            orders = data.get("orders", [])
+            table_id = data.get("table_id")
+            order_type = data.get("order_type")
+
+            if not orders:
+                return jsonify({"error": "No orders received"}), 400
+
+            conn = get_db()
+            cur = conn.cursor()
+            for item in orders:
+                amount = (item.get("price") * (item.get("grams", 0) / 1000.0) if item.get("uom").upper() == "KG"
+                          else item.get("qty") * item.get("price"))
+                cur.execute("""
+                    INSERT INTO sales (transaction_id, table_id, product_id, quantity, weight_in_kg, subtotal, total, status, order_mode)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, 'PENDING', ?)
+                """, (txn_id, table_id, item.get("product_id"), item.get("qty"),
+                      (item.get("grams", 0) / 1000.0), amount, amount, order_type))
+
+            cur.execute("UPDATE sales SET status='ACTIVE' WHERE transaction_id=?", (txn_id,))
+            conn.commit()
+            conn.close()
+            return jsonify({"message": "Order saved successfully!"})
+        except Exception as e:
+            return jsonify({"error": str(e)})
+
+    return legacy
+
+
+def make_scratch_db(workdir, journal_mode, migrated=True):
+    """Copies paluto.db into workdir, migrates it (unless legacy) and forces the requested journal mode."""
+    path = os.path.join(workdir, f"bench_{journal_mode.lower()}.db")
+    shutil.copyfile(pos_app.DB, path)
+    conn = sqlite3.connect(path)
+    try:
+        if migrated:
+            migrate(conn)  # the routes need the current schema, as init_db gives the app
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    finally:
+        conn.close()
+    return path
+
+
+def product_ids(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT id FROM products")]
+    finally:
+        conn.close()
+
+
+def cashier(client, product_ids, orders, items_per_order, stats, lock):
+    ok = errors = 0
+    for _ in range(orders):
+        txn_id = "B" + "".join(random.choices(string.ascii_uppercase + string.digits, k=7))
+        table_id = random.randint(1, 50)
+        picks = random.sample(product_ids, items_per_order)
+
+        for pid in picks:
+            res = client.post("/add_item", json={
+                "transaction_id": txn_id, "table_id": table_id, "product_id": pid,
+                "uom": "SERVE", "price": 100, "qty": 1,
+            })
+            if res.status_code == 200:
+                ok += 1
+            else:
+                errors += 1
+
+        res = client.post(f"/checkout/{txn_id}", json={
+            "table_id": table_id, "order_type": "regular",
+            "orders": [{"product_id": pid, "uom": "SERVE", "price": 100, "qty": 1, "grams": 0} for pid in picks],
+        })
+        if res.status_code == 200 and not (res.get_json() or {}).get("error"):
+            ok += 1
+        else:
+            errors += 1
+
+    with lock:
+        stats["ok"] += ok
+        stats["errors"] += errors
+
+
+def run(label, flask_app, path, cashiers, orders, items_per_order, on_done=None):
+    ids = product_ids(path)
+    stats = {"ok": 0, "errors": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=cashier, args=(flask_app.test_client(), ids,
+                                               orders, items_per_order, stats, lock))
+        for _ in range(cashiers)
+    ]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if on_done:
+        on_done()
+
+    total = stats["ok"] + stats["errors"]
+    print(f"{label:<8} {cashiers:>3} cashiers | {total:>6} requests in {elapsed:6.2f}s "
+          f"| {stats['ok'] / elapsed:8.1f} ok req/s | {stats['errors']:>4} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="add_item/checkout throughput: original routes vs pooled WAL")
+    parser.add_argument("--cashiers", type=int, default=8)
+    parser.add_argument("--orders", type=int, default=25, help="orders per cashier")
+    parser.add_argument("--items", type=int, default=4, help="items per order")
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    pos_app.app.logger.disabled = True
+
+    workdir = tempfile.mkdtemp(prefix="paluto_bench_")
+    try:
+        legacy_db = make_scratch_db(workdir, "DELETE", migrated=False)
+        run("legacy", legacy_app(legacy_db), legacy_db, args.cashiers, args.orders, args.items)
+
+        pooled_db = make_scratch_db(workdir, "WAL")
+        pos_app.db_pool = ConnectionPool(pooled_db)
+        run("pooled", pos_app.app, pooled_db, args.cashiers, args.orders, args.items,
+            on_done=pos_app.db_pool.close_all)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# ============================================================
+# PALUTO POS — RECEIPT RENDERING MICRO-BENCHMARK
+# ============================================================
+# Renders TEMPORARY INVOICE PDFs in memory with the cached receipt
+# templates and reports receipts/sec for small, large and huge orders.
+#
+#   python bench_receipts.py --seconds 2 --paper 58mm
+# ============================================================
+
+import argparse, time
+
+from money import to_centavos, to_pesos
+from receipts import TEMPLATES, invoice_body, invoice_closing
+
+SAMPLE_ITEMS = [
+    {"variety_1": "", "variety_2": "", "luto": "ALATAN SWEET & SPICY", "uom": "KG", "quantity": 1, "weight_in_kg": 0.75, "subtotal": 735.0},
+    {"variety_1": "BLUE", "variety_2": "MARLIN", "luto": "KINILAW", "uom": "SERVE", "quantity": 2, "weight_in_kg": 0, "subtotal": 560.0},
+    {"variety_1": "", "variety_2": "", "luto": "PLAIN RICE", "uom": "SERVE", "quantity": 4, "weight_in_kg": 0, "subtotal": 120.0},
+]
+
+
+def order(n_lines):
+    items = [SAMPLE_ITEMS[i % len(SAMPLE_ITEMS)] for i in range(n_lines)]
+    total = sum(to_centavos(i["subtotal"]) for i in items)
+    totals = {"total": to_pesos(total), "paid": to_pesos(total + 10000), "item_count": n_lines,
+              "total_centavos": total, "paid_centavos": total + 10000}
+    return items, totals
+
+
+def bench(template, n_lines, seconds):
+    items, totals = order(n_lines)
+    closing = invoice_closing("01/01/2026 07:00:00 PM")
+    count, size = 0, 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        pdf = template.render_pdf(invoice_body(template, items, totals, 7, "BENCH"), closing)
+        size = len(pdf)
+        count += 1
+    elapsed = time.perf_counter() - start
+    return count / elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receipt template rendering throughput")
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent per order size")
+    parser.add_argument("--paper", choices=sorted(TEMPLATES), default=None, help="default: all paper sizes")
+    args = parser.parse_args()
+
+    for paper in [args.paper] if args.paper else sorted(TEMPLATES):
+        for n_lines in (5, 50, 200):
+            rate, size = bench(TEMPLATES[paper], n_lines, args.seconds)
+            print(f"{paper}  {n_lines:>4} lines | {rate:8.1f} receipts/sec | {size / 1024:6.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# ============================================================
+# PALUTO POS — PRODUCT CATALOG CACHE
+# ============================================================
+# The product list only changes when catalog_import.py runs or a price is
+# edited, yet /fetch_products used to SELECT and serialize all rows on every
+# POS page load.
+#
+# The `catalog_version` row (migration 4) is bumped by triggers on every
+# INSERT/UPDATE/DELETE on products, whichever process makes the change.
+# ProductCatalog keeps one immutable CatalogSnapshot per version:
+#   * rows / by_id         → product lookups without joining in SQL
+#   * json_body / gzip_body → pre-serialized, pre-compressed /fetch_products
+#   * etag                 → strong validator for If-None-Match → 304
+# Checking for a newer version costs one primary-key read per request.
+# ============================================================
+
+import gzip, hashlib, json, threading
+
+PRODUCT_FIELDS = ("category", "type", "variety_1", "variety_2", "state_1", "state_2", "luto", "uom", "price")
+
+
+def product_key(value):
+    """products.id as stored in sales.product_id (INTEGER since migration 16); ValueError if not one."""
+    if isinstance(value, bool):
+        raise ValueError(f"Not a product id: {value!r}")
+    if isinstance(value, int):
+        return value
+    text = str(value).strip()
+    if not text.isdigit():
+        raise ValueError(f"Not a product id: {value!r}")
+    return int(text)
+
+
+def catalog_version(conn):
+    row = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+class CatalogSnapshot:
+    """The product catalog as of one catalog version."""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.rows = rows
+        self.by_id = {row["id"]: row for row in rows}
+
+        # products dropped from the CSV (active = 0) stay in by_id for old sales
+        listed = [row for row in rows if row.get("active", 1)]
+        self.json_body = json.dumps(listed, separators=(",", ":")).encode("utf-8")
+        self.gzip_body = gzip.compress(self.json_body, compresslevel=9, mtime=0)
+        digest = hashlib.sha1(self.json_body).hexdigest()[:16]
+        self.etag = f"catalog-{version}-{digest}"
+        self.gzip_etag = self.etag + "-gz"
+
+    def product(self, product_id):
+        """Looks up a product by id (int, or digits from a request)."""
+        try:
+            return self.by_id.get(product_key(product_id))
+        except ValueError:
+            return None
+
+    def with_product(self, row, fields=PRODUCT_FIELDS, price_as="price"):
+        """dict(row) plus the product's catalog fields (None when the product is gone)."""
+        item = dict(row)
+        product = self.product(item.get("product_id")) or {}
+        for field in fields:
+            item[price_as if field == "price" else field] = product.get(field)
+        return item
+
+
+class ProductCatalog:
+    """Process-wide cache of CatalogSnapshot, reloaded when the catalog version changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def current(self, conn):
+        version = catalog_version(conn)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                rows = [dict(row) for row in conn.execute("SELECT * FROM products ORDER BY id")]
+                self._snapshot = CatalogSnapshot(version, rows)
+            return self._snapshot
+
+    def invalidate(self):
+        """Drops the cached snapshot; the next request reloads it."""
+        with self._lock:
+            self._snapshot = None
+
+
+product_catalog = ProductCatalog()
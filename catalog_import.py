@@ -0,0 +1,200 @@
+# ============================================================
+# PALUTO POS — CATALOG IMPORT (UPSERT BY SKU + DIFF)
+# ============================================================
+# import_products.py used to INSERT every CSV row again on each run, so
+# re-importing duplicated the whole catalog. Now the CSV's ID column
+# (FISH_0001, …) is the product's stable `sku` (migration 13):
+#
+#   * rows are streamed from the CSV and compared with the database
+#   * new SKUs are inserted, changed ones updated, unchanged ones skipped,
+#     all in one transaction with executemany
+#   * SKUs missing from the CSV are deactivated (active = 0), not deleted,
+#     so old sales keep their product
+#   * products from before SKUs existed are matched once by their fields
+#     and adopt the SKU instead of being duplicated
+#
+# Every change bumps catalog_version (migration 4 triggers), so running
+# app.py instances serve the new catalog on their next request.
+#
+#   python import_products.py                      → products.csv into paluto.db
+#   python catalog_import.py --csv new.csv --dry-run
+#   python catalog_import.py --keep-missing        → do not deactivate anything
+# ============================================================
+
+import argparse, csv, os, sqlite3, sys, time
+
+CATALOG_FIELDS = ("category", "type", "variety_1", "variety_2", "state_1", "state_2", "luto", "uom",
+                  "price", "price_2")
+NATURAL_KEY = CATALOG_FIELDS[:8]   # everything but the prices
+
+
+def clean_price(value):
+    """Remove ₱ sign, commas, and blanks; convert to float safely."""
+    if not value or str(value).strip() == "":
+        return 0.0
+    value = str(value).replace("₱", "").replace(",", "").replace(" ", "")
+    try:
+        return float(value)
+    except ValueError:
+        print(f"⚠️ Warning: Could not convert '{value}' — set to 0.0")
+        return 0.0
+
+
+def read_catalog_csv(path):
+    """Yields (sku, {field: value}) per CSV row without loading the whole file."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line_no, r in enumerate(csv.DictReader(f), start=2):
+            sku = (r.get("ID") or "").strip()
+            if not sku:
+                print(f"⚠️ Line {line_no}: no ID, skipped")
+                continue
+            yield sku, {
+                "category": (r.get("CATEGORY") or "").strip(),
+                "type": (r.get("TYPE") or "").strip(),
+                "variety_1": (r.get("VARIETY_1") or "").strip(),
+                "variety_2": (r.get("VARIETY_2") or "").strip(),
+                "state_1": (r.get("STATE_1") or "").strip(),
+                "state_2": (r.get("STATE_2") or "").strip(),
+                "luto": (r.get("LUTO") or "").strip(),
+                "uom": (r.get("UOM") or "").strip(),
+                "price": clean_price(r.get("PRICE")),
+                "price_2": clean_price(r.get("PRICE_2")) if (r.get("PRICE_2") or "").strip() else None,
+            }
+
+
+def _key(row, fields=NATURAL_KEY):
+    return tuple((row[f] or "") for f in fields)
+
+
+# ============================================================
+# 🔹 DIFF
+# ============================================================
+class CatalogDiff:
+    def __init__(self):
+        self.added = []      # (sku, fields)
+        self.changed = []    # (id, sku, fields, {field: (old, new)})
+        self.adopted = []    # (id, sku, fields) — pre-SKU rows that get their SKU now
+        self.removed = []    # (id, sku)
+        self.reactivated = []
+        self.unchanged = 0
+        self.duplicates = []
+
+    def has_changes(self):
+        return bool(self.added or self.changed or self.adopted or self.removed or self.reactivated)
+
+    def report(self, limit=20):
+        print(f"➕ added {len(self.added)}  ✏️ changed {len(self.changed)}  🔗 adopted {len(self.adopted)}  "
+              f"♻️ reactivated {len(self.reactivated)}  ➖ removed {len(self.removed)}  "
+              f"= unchanged {self.unchanged}")
+        for sku, fields in self.added[:limit]:
+            print(f"  + {sku}: {fields['luto'] or fields['type']} @ {fields['price']:.2f}")
+        for _, sku, _, delta in self.changed[:limit]:
+            print(f"  ~ {sku}: " + ", ".join(f"{k} {old!r} → {new!r}" for k, (old, new) in delta.items()))
+        for _, sku in self.removed[:limit]:
+            print(f"  - {sku}")
+        if self.duplicates:
+            print(f"⚠️ Duplicate IDs in the CSV (last row wins): {', '.join(self.duplicates[:limit])}")
+
+
+def diff_catalog(conn, incoming, keep_missing=False):
+    """Compares CSV rows (iterable of (sku, fields)) with the products table."""
+    diff = CatalogDiff()
+    existing, legacy = {}, {}
+    for row in conn.execute(f"SELECT id, sku, active, {', '.join(CATALOG_FIELDS)} FROM products ORDER BY id"):
+        row = dict(row)
+        if row["sku"]:
+            existing[row["sku"]] = row
+        else:
+            legacy.setdefault(_key(row), []).append(row)
+
+    seen = {}
+    for sku, fields in incoming:
+        if sku in seen:
+            diff.duplicates.append(sku)
+        seen[sku] = fields
+
+    for sku, fields in seen.items():
+        current = existing.get(sku)
+        if current is None:
+            matches = legacy.get(_key(fields))
+            if matches:
+                diff.adopted.append((matches.pop(0)["id"], sku, fields))
+            else:
+                diff.added.append((sku, fields))
+            continue
+        delta = {f: (current[f], fields[f]) for f in CATALOG_FIELDS if current[f] != fields[f]}
+        if delta:
+            diff.changed.append((current["id"], sku, fields, delta))
+        elif not current["active"]:
+            diff.reactivated.append((current["id"], sku))
+        else:
+            diff.unchanged += 1
+
+    if not keep_missing:
+        diff.removed = [(row["id"], sku) for sku, row in existing.items() if sku not in seen and row["active"]]
+    return diff
+
+
+# ============================================================
+# 🔹 APPLY
+# ============================================================
+def apply_diff(conn, diff):
+    """Writes the diff in one transaction; returns the new catalog version."""
+    cols = ", ".join(CATALOG_FIELDS)
+    assignments = ", ".join(f"{f} = excluded.{f}" for f in CATALOG_FIELDS)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(f"""
+            INSERT INTO products (sku, active, {cols}) VALUES (?, 1, {', '.join('?' * len(CATALOG_FIELDS))})
+            ON CONFLICT(sku) DO UPDATE SET active = 1, {assignments}
+        """, [(sku,) + tuple(fields[f] for f in CATALOG_FIELDS)
+              for sku, fields in diff.added + [(sku, fields) for _, sku, fields, _ in diff.changed]])
+        conn.executemany(f"""
+            UPDATE products SET sku = ?, active = 1, {', '.join(f'{f} = ?' for f in CATALOG_FIELDS)} WHERE id = ?
+        """, [(sku,) + tuple(fields[f] for f in CATALOG_FIELDS) + (pid,) for pid, sku, fields in diff.adopted])
+        conn.executemany("UPDATE products SET active = 1 WHERE id = ?", [(pid,) for pid, _ in diff.reactivated])
+        conn.executemany("UPDATE products SET active = 0 WHERE id = ?", [(pid,) for pid, _ in diff.removed])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+
+
+def import_catalog(conn, csv_path, dry_run=False, keep_missing=False):
+    diff = diff_catalog(conn, read_catalog_csv(csv_path), keep_missing=keep_missing)
+    diff.report()
+    if dry_run or not diff.has_changes():
+        print("ℹ️ Dry run — nothing written." if dry_run else "✅ Catalog already up to date.")
+        return diff
+    version = apply_diff(conn, diff)
+    print(f"✅ Catalog imported (version {version}).")
+    return diff
+
+
+def main(argv=None):
+    from migrations import migrate
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Import products.csv into the catalog (upsert by ID/SKU)")
+    parser.add_argument("--db", default=os.path.join(here, "paluto.db"))
+    parser.add_argument("--csv", default=os.path.join(here, "products.csv"))
+    parser.add_argument("--dry-run", action="store_true", help="only print the diff")
+    parser.add_argument("--keep-missing", action="store_true", help="leave products missing from the CSV active")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    try:
+        migrate(conn)
+        start = time.perf_counter()
+        import_catalog(conn, args.csv, dry_run=args.dry_run, keep_missing=args.keep_missing)
+        print(f"⏱️ {time.perf_counter() - start:.2f}s")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+# ============================================================
+# PALUTO POS — PASSWORD HASHING + AUTH CACHE
+# ============================================================
+# user_credentials.password used to hold the plaintext password and
+# login() compared it in SQL. It now holds a salted hash:
+#
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>          (default)
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>  (PALUTO_PASSWORD_HASH=pbkdf2,
+#                                              or when OpenSSL lacks scrypt)
+#
+# Cost is tunable with PALUTO_SCRYPT_N / PALUTO_PBKDF2_ITERATIONS; hashes
+# made with older settings are upgraded on the next successful login.
+# Migrations 14 and 20 hash the existing rows. Only stored hashes verify: a
+# password typed into the table by hand never logs in until it is hashed
+# with --set-password or --hash-plaintext.
+#
+# AuthCache keeps user records and "opening cash set today" in memory so
+# /tables does not query daily_opening_cash on every load. Both are cleared
+# when the auth_version row (bumped by triggers on user_credentials and
+# daily_opening_cash) changes, checked at most every RECHECK_SECONDS.
+#
+#   python credentials.py --set-password USERNAME [--db paluto.db]
+#   python credentials.py --hash-plaintext [--db paluto.db]
+# ============================================================
+
+import argparse, base64, collections, getpass, hashlib, hmac, os, secrets, sqlite3, sys, threading, time
+
+SCRYPT_N = int(os.environ.get("PALUTO_SCRYPT_N", 2 ** 14))
+SCRYPT_R, SCRYPT_P = 8, 1
+PBKDF2_ITERATIONS = int(os.environ.get("PALUTO_PBKDF2_ITERATIONS", 600_000))
+HASH_SCHEME = os.environ.get("PALUTO_PASSWORD_HASH", "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2")
+
+MAX_USERS = 256
+MAX_OPENING_CASH = 1024
+RECHECK_SECONDS = 5.0
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+
+def hash_password(password):
+    """Salted hash of password in the configured scheme."""
+    salt = secrets.token_bytes(16)
+    if HASH_SCHEME == "scrypt":
+        digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+    digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(digest)}"
+
+
+def is_hashed(stored):
+    return str(stored).startswith(("scrypt$", "pbkdf2_sha256$"))
+
+
+def verify_password(password, stored):
+    """True if password matches the stored hash; a value in no known hash format never matches."""
+    if password is None or not stored:
+        return False
+    parts = str(stored).split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = (int(x) for x in parts[1:4])
+            digest = _scrypt(password, base64.b64decode(parts[4]), n, r, p)
+        elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            digest = _pbkdf2(password, base64.b64decode(parts[2]), int(parts[1]))
+        else:
+            return False
+        return hmac.compare_digest(digest, base64.b64decode(parts[-1]))
+    except (ValueError, TypeError):
+        return False
+
+
+def needs_rehash(stored):
+    """True when stored was hashed with other settings than today's."""
+    parts = str(stored).split("$")
+    if HASH_SCHEME == "scrypt":
+        return parts[:4] != ["scrypt", str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+    return parts[:2] != ["pbkdf2_sha256", str(PBKDF2_ITERATIONS)]
+
+
+# verified against when the username does not exist, so a miss costs as much as a wrong password
+_DUMMY_HASH = None
+
+
+def check_login(conn, cache, username, password):
+    """The user row if username/password are valid (upgrading its hash if due), else None."""
+    global _DUMMY_HASH
+    user = cache.user(conn, username) if username else None
+    if user is None:
+        _DUMMY_HASH = _DUMMY_HASH or hash_password(secrets.token_hex(8))
+        verify_password(password or "", _DUMMY_HASH)
+        return None
+    if not verify_password(password, user["password"]):
+        return None
+    if needs_rehash(user["password"]):
+        conn.execute("UPDATE user_credentials SET password = ? WHERE id = ?", (hash_password(password), user["id"]))
+        conn.commit()
+    return user
+
+
+def hash_stored_passwords(conn):
+    """Replaces every plaintext user_credentials.password with its hash; returns how many."""
+    rows = conn.execute("SELECT id, password FROM user_credentials").fetchall()
+    plain = [(hash_password(pw), uid) for uid, pw in rows if pw and not is_hashed(pw)]
+    conn.executemany("UPDATE user_credentials SET password = ? WHERE id = ?", plain)
+    return len(plain)
+
+
+# ============================================================
+# 🔹 AUTH CACHE
+# ============================================================
+OPENING_CASH_SQL = "SELECT * FROM daily_opening_cash WHERE username = ? AND date_opened = ?"
+
+
+def auth_version(conn):
+    row = conn.execute("SELECT version FROM auth_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+class AuthCache:
+    """Bounded in-memory user records and today's opening cash per cashier."""
+
+    def __init__(self, max_users=MAX_USERS, max_opening_cash=MAX_OPENING_CASH, recheck_seconds=RECHECK_SECONDS):
+        self.max_users = max_users
+        self.max_opening_cash = max_opening_cash
+        self.recheck_seconds = recheck_seconds
+        self._lock = threading.Lock()
+        self._users = collections.OrderedDict()          # username → dict(row)
+        self._opening_cash = collections.OrderedDict()   # (username, day) → dict(row)
+        self._version = None
+        self._checked = 0.0
+
+    def _revalidate(self, conn):
+        """Clears everything if auth_version moved; reads it at most every recheck_seconds."""
+        now = time.monotonic()
+        if now - self._checked < self.recheck_seconds:
+            return
+        version = auth_version(conn)
+        with self._lock:
+            if version != self._version:
+                self._users.clear()
+                self._opening_cash.clear()
+                self._version = version
+            self._checked = now
+
+    @staticmethod
+    def _get(store, key):
+        value = store.get(key)
+        if value is not None:
+            store.move_to_end(key)
+        return value
+
+    @staticmethod
+    def _put(store, key, value, limit):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > limit:
+            store.popitem(last=False)
+
+    def user(self, conn, username):
+        self._revalidate(conn)
+        with self._lock:
+            user = self._get(self._users, username)
+        if user is None:
+            row = conn.execute("SELECT * FROM user_credentials WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                return None
+            user = dict(row)
+            with self._lock:
+                self._put(self._users, username, user, self.max_users)
+        return user
+
+    def opening_cash(self, conn, username, day):
+        """Today's daily_opening_cash row for username (None if not set yet)."""
+        self._revalidate(conn)
+        with self._lock:
+            row = self._get(self._opening_cash, (username, day))
+        if row is None:
+            row = conn.execute(OPENING_CASH_SQL, (username, day)).fetchone()
+            if row is None:
+                return None   # not cached: the cashier is about to set it
+            row = dict(row)
+            with self._lock:
+                self._put(self._opening_cash, (username, day), row, self.max_opening_cash)
+        return row
+
+    def invalidate(self):
+        with self._lock:
+            self._users.clear()
+            self._opening_cash.clear()
+            self._checked = 0.0
+
+
+def main(argv=None):
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Set a user's password (stored hashed)")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--set-password", metavar="USERNAME")
+    action.add_argument("--hash-plaintext", action="store_true",
+                        help="hash every password that was typed into user_credentials by hand")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "paluto.db"))
+    args = parser.parse_args(argv)
+
+    if args.hash_plaintext:
+        conn = sqlite3.connect(args.db, timeout=10)
+        try:
+            migrate(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            hashed = hash_stored_passwords(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"✅ Hashed {hashed} plaintext password(s).")
+        return 0
+
+    password = getpass.getpass(f"New password for {args.set_password}: ")
+    if not password or password != getpass.getpass("Repeat: "):
+        print("❌ Passwords empty or do not match.")
+        return 1
+    conn = sqlite3.connect(args.db, timeout=10)
+    try:
+        migrate(conn)
+        updated = conn.execute("UPDATE user_credentials SET password = ? WHERE username = ?",
+                               (hash_password(password), args.set_password)).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    if not updated:
+        print(f"❌ No user {args.set_password!r}.")
+        return 1
+    print(f"✅ Password updated for {args.set_password}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
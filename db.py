@@ -0,0 +1,150 @@
+# ============================================================
+# PALUTO POS — SQLITE CONNECTION POOL
+# ============================================================
+# Every route used to open a brand-new sqlite3 connection in the default
+# rollback-journal mode. Under load (/add_item, /checkout and the kitchen
+# polling at the same time) that meant "database is locked" errors.
+#
+# This module keeps a small pool of ready connections that are already
+# configured for concurrent use:
+#   * WAL journal mode      → readers never block the writer
+#   * synchronous=NORMAL    → one fsync per checkpoint instead of per commit
+#   * busy_timeout          → writers wait for the lock instead of failing
+#   * cached_statements     → prepared statements are reused per connection
+#
+# Routes keep the same pattern as before:
+#     conn = get_db()
+#     ...
+#     conn.close()   # hands the connection back to the pool
+#
+# With an observer (see metrics.py) every statement run through a pooled
+# connection is timed: observer(sql, seconds, error).
+# ============================================================
+
+import queue
+import sqlite3
+import time
+
+POOL_SIZE = 8               # idle connections kept open
+BUSY_TIMEOUT_MS = 10000     # how long a writer waits for the lock
+STATEMENT_CACHE_SIZE = 256  # prepared statements cached per connection
+
+
+def _observed(observer, sql, run, *args):
+    start = time.perf_counter()
+    error = None
+    try:
+        return run(*args)
+    except sqlite3.Error as e:
+        error = e
+        raise
+    finally:
+        observer(sql, time.perf_counter() - start, error)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports each execute()/executemany() to an observer."""
+
+    observer = None
+
+    def execute(self, sql, params=()):
+        return _observed(self.observer, sql, super().execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return _observed(self.observer, sql, super().executemany, sql, seq_of_params)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() returns it to its pool."""
+
+    pool = None
+
+    def cursor(self, factory=None):
+        observer = self.pool.observer if self.pool is not None else None
+        if observer is None or factory not in (None, InstrumentedCursor):
+            return super().cursor(factory or sqlite3.Cursor)
+        cur = super().cursor(InstrumentedCursor)
+        cur.observer = observer
+        return cur
+
+    def commit(self):
+        observer = self.pool.observer if self.pool is not None else None
+        if observer is None:
+            return super().commit()
+        return _observed(observer, "COMMIT", super().commit)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def close(self):
+        if self.pool is None:
+            return super().close()
+        self.pool.release(self)
+
+    def discard(self):
+        """Closes the underlying connection for real."""
+        self.pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Bounded LIFO pool of WAL-mode SQLite connections."""
+
+    def __init__(self, path, size=POOL_SIZE, busy_timeout_ms=BUSY_TIMEOUT_MS,
+                 cached_statements=STATEMENT_CACHE_SIZE, observer=None):
+        self.path = path
+        self.observer = observer  # callable(sql, seconds, error) or None
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue()
+
+    # ------------------------------------------------------------
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.pool = self
+        return conn
+
+    def connect(self):
+        """Borrows an idle connection, opening a new one if none is free."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def release(self, conn):
+        """Takes a connection back; anything left uncommitted is rolled back."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.discard()
+            return
+
+        if self._idle.qsize() >= self.size:
+            conn.discard()
+        else:
+            self._idle.put(conn)
+
+    def close_all(self):
+        """Closes every idle connection (used on shutdown and in benchmarks)."""
+        while True:
+            try:
+                self._idle.get_nowait().discard()
+            except queue.Empty:
+                break
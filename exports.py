@@ -0,0 +1,288 @@
+# ============================================================
+# PALUTO POS — STREAMING SALES EXPORTS (CSV / COLUMNAR)
+# ============================================================
+# export_csv used to fetchall() every PAID sale into a StringIO before the
+# first byte went out. Exports are now generators:
+#
+#   SQL (filters pushed down) → fetchmany(batch) → encode batch → yield
+#
+# so memory stays at one batch no matter how much history there is, and
+# the download starts right away. Filters: start/end (local dates,
+# inclusive), cashier, table_id. Output: CSV or a compact columnar binary,
+# either one optionally gzip-compressed on the fly. Given an archive_dir,
+# the monthly archives for the range are read too (archive.py): the range is
+# split into sub-ranges of at most MAX_ATTACHED archive files, newest first,
+# and each one is attached, streamed and detached in turn.
+#
+# Columnar layout (little-endian, one block per fetched batch):
+#
+#   b"PALUTOC1" | u16 ncols | per column: u8 type ('s'/'i'/'f'), u16 len, name
+#   block: u32 nrows | per column: validity bitmap (1 bit/row), then
+#          'i' → int64[nrows]   'f' → float64[nrows]
+#          's' → uint32 offsets[nrows + 1] + utf-8 data
+#   end:   u32 0
+#
+# read_columnar() loads a file back into {column: list} for reconciliation:
+#   python exports.py --start 2025-10-01 --end 2025-10-31 -o october.pcol
+#   python exports.py --read october.pcol
+# ============================================================
+
+import argparse, csv, io, os, sqlite3, struct, sys, zlib
+from array import array
+from datetime import date
+
+from archive import attach_history, default_archive_dir, detach_history, history_ranges
+
+BATCH_SIZE = 500
+
+# (column, CSV header, columnar type)
+EXPORT_COLUMNS = [
+    ("transaction_id", "Transaction ID", "s"),
+    ("table_id", "Table ID", "i"),
+    ("item", "Item", "s"),
+    ("quantity", "Quantity", "i"),
+    ("weight_in_kg", "Weight (kg)", "f"),
+    ("subtotal", "Subtotal", "f"),
+    ("discount", "Discount", "f"),
+    ("cashier", "Cashier", "s"),
+    ("datetime", "Timestamp", "s"),
+]
+
+EXPORT_SQL = """
+    SELECT s.transaction_id, s.table_id,
+           p.type, p.variety_1, p.variety_2, p.state_1, p.state_2, p.luto,
+           s.quantity, s.weight_in_kg, s.subtotal, s.discount, s.cashier, s.datetime
+    FROM {sales} s JOIN products p ON s.product_id = p.id
+    WHERE {where}
+    ORDER BY s.datetime DESC
+"""
+
+
+# ============================================================
+# 🔹 FILTERS + BATCHED READS
+# ============================================================
+def export_filters(start=None, end=None, cashier=None, table_id=None):
+    """Builds the WHERE clause; raises ValueError on a bad date or table."""
+    clauses, params = ["s.status = 'PAID'"], []
+    # sales.datetime is UTC (CURRENT_TIMESTAMP); the bounds are local days
+    if start:
+        clauses.append("s.datetime >= datetime(?, 'utc')")
+        params.append(date.fromisoformat(start).isoformat())
+    if end:
+        clauses.append("s.datetime < datetime(?, '+1 day', 'utc')")
+        params.append(date.fromisoformat(end).isoformat())
+    if start and end and start > end:
+        raise ValueError("start must not be after end")
+    if cashier:
+        clauses.append("s.cashier = ?")
+        params.append(cashier)
+    if table_id not in (None, ""):
+        clauses.append("s.table_id = ?")
+        params.append(int(table_id))
+    return " AND ".join(clauses), params
+
+
+def _export_row(row):
+    item = " ".join(filter(None, row[2:8]))
+    return (row[0], row[1], item) + tuple(row[8:])
+
+
+def iter_batches(conn, where, params, batch_size=BATCH_SIZE, sales="sales"):
+    """Yields lists of export rows straight off the cursor (conn is released by release_export)."""
+    cur = conn.execute(EXPORT_SQL.format(where=where, sales=sales), params)
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [_export_row(row) for row in rows]
+    finally:
+        cur.close()
+
+
+def iter_history_batches(conn, archive_dir, batch_size=BATCH_SIZE, start=None, end=None, cashier=None,
+                         table_id=None):
+    """iter_batches over live sales and the archives, one attached sub-range at a time."""
+    for lo, hi in history_ranges(archive_dir, start, end):
+        where, params = export_filters(lo, hi, cashier, table_id)
+        sales, _ = attach_history(conn, archive_dir, lo, hi)
+        try:
+            yield from iter_batches(conn, where, params, batch_size, sales)
+        finally:
+            detach_history(conn)
+
+
+def release_export(conn):
+    """Detaches the archives an export attached and closes conn, whether or not it was read to the end."""
+    try:
+        detach_history(conn)
+    finally:
+        conn.close()
+
+
+# ============================================================
+# 🔹 ENCODERS
+# ============================================================
+def csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for _, header, _ in EXPORT_COLUMNS])
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _little_endian(arr):
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _encode_column(values, kind):
+    n = len(values)
+    validity = bytearray((n + 7) // 8)
+    for i, v in enumerate(values):
+        if v is not None:
+            validity[i >> 3] |= 1 << (i & 7)
+
+    if kind == "i":
+        return bytes(validity) + _little_endian(array("q", (int(v) if v is not None else 0 for v in values)))
+    if kind == "f":
+        return bytes(validity) + _little_endian(array("d", (float(v) if v is not None else 0.0 for v in values)))
+
+    offsets, data, pos = array("I", [0]), bytearray(), 0
+    for v in values:
+        if v is not None:
+            encoded = str(v).encode("utf-8")
+            data += encoded
+            pos += len(encoded)
+        offsets.append(pos)
+    return bytes(validity) + _little_endian(offsets) + bytes(data)
+
+
+def columnar_chunks(batches):
+    header = [b"PALUTOC1", struct.pack("<H", len(EXPORT_COLUMNS))]
+    for name, _, kind in EXPORT_COLUMNS:
+        encoded = name.encode("utf-8")
+        header.append(struct.pack("<cH", kind.encode(), len(encoded)) + encoded)
+    yield b"".join(header)
+
+    for rows in batches:
+        block = [struct.pack("<I", len(rows))]
+        for idx, (_, _, kind) in enumerate(EXPORT_COLUMNS):
+            block.append(_encode_column([row[idx] for row in rows], kind))
+        yield b"".join(block)
+    yield struct.pack("<I", 0)
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 → gzip container
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+EXPORT_FORMATS = {
+    # format → (encoder, mimetype, file extension)
+    "csv": (csv_chunks, "text/csv", "csv"),
+    "columnar": (columnar_chunks, "application/octet-stream", "pcol"),
+}
+
+
+def export_stream(conn, fmt="csv", compress=False, batch_size=BATCH_SIZE, archive_dir=None, **filters):
+    """Generator of encoded bytes for the filtered PAID sales (raises ValueError on bad input).
+
+    The caller owns conn: call release_export(conn) once the stream is done or abandoned.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown format {fmt!r} (use {', '.join(EXPORT_FORMATS)})")
+    export_filters(**filters)  # bad input fails here, before the first byte
+    chunks = EXPORT_FORMATS[fmt][0](iter_history_batches(conn, archive_dir, batch_size, **filters))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+# ============================================================
+# 🔹 READING A COLUMNAR EXPORT BACK
+# ============================================================
+def read_columnar(fp):
+    """Columnar export (file object) → {column: [values...]}."""
+    if fp.read(8) != b"PALUTOC1":
+        raise ValueError("not a PALUTO columnar export")
+    (ncols,) = struct.unpack("<H", fp.read(2))
+    columns = []
+    for _ in range(ncols):
+        kind, length = struct.unpack("<cH", fp.read(3))
+        columns.append((fp.read(length).decode("utf-8"), kind.decode()))
+
+    result = {name: [] for name, _ in columns}
+    while True:
+        (n,) = struct.unpack("<I", fp.read(4))
+        if n == 0:
+            return result
+        for name, kind in columns:
+            validity = fp.read((n + 7) // 8)
+            valid = [bool(validity[i >> 3] & (1 << (i & 7))) for i in range(n)]
+            if kind in ("i", "f"):
+                values = array("q" if kind == "i" else "d")
+                values.frombytes(fp.read(8 * n))
+                if sys.byteorder != "little":
+                    values.byteswap()
+                result[name] += [v if ok else None for v, ok in zip(values, valid)]
+            else:
+                offsets = array("I")
+                offsets.frombytes(fp.read(4 * (n + 1)))
+                if sys.byteorder != "little":
+                    offsets.byteswap()
+                data = fp.read(offsets[-1])
+                result[name] += [data[offsets[i]:offsets[i + 1]].decode("utf-8") if valid[i] else None
+                                 for i in range(n)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paluto POS sales export")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "paluto.db"))
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--cashier")
+    parser.add_argument("--table-id")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="columnar")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--read", metavar="FILE", help="summarize a columnar export instead")
+    parser.add_argument("--archive-dir", help="monthly archives to include (default: archive/ next to the db)")
+    args = parser.parse_args(argv)
+
+    if args.read:
+        with open(args.read, "rb") as f:
+            data = read_columnar(f)
+        rows = len(data["transaction_id"])
+        print(f"✅ {rows} lines, {len(set(data['transaction_id']))} transactions, "
+              f"subtotal {sum(v or 0 for v in data['subtotal']):.2f}, "
+              f"discount {sum(v or 0 for v in data['discount']):.2f}")
+        return 0
+
+    conn = sqlite3.connect(args.db)
+    try:
+        chunks = export_stream(conn, args.format, args.gzip,
+                               archive_dir=args.archive_dir or default_archive_dir(args.db),
+                               start=args.start, end=args.end, cashier=args.cashier, table_id=args.table_id)
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
+    finally:
+        release_export(conn)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# ============================================================
+# PALUTO POS — FAKE ESC/POS NETWORK PRINTER
+# ============================================================
+# Listens like a thermal printer on raw TCP (port 9100 by default), keeps
+# every job it receives and prints a plain-text preview, so the ESC/POS
+# backend can be exercised without hardware:
+#
+#   python fake_printer.py --port 9100 --out fake_printer_jobs
+#   PALUTO_PRINTER_BACKEND=escpos PALUTO_ESCPOS_TARGET=tcp://127.0.0.1:9100 python app.py
+#
+# It can also be started from a script: FakePrinter(port=0).start()
+# ============================================================
+
+import argparse, os, re, socketserver, threading, time
+
+# ESC/POS command sequences stripped from the text preview
+_COMMANDS = re.compile(rb"\x1b@|\x1b[aMt!E-].|\x1dV[AB].|\x1dV[\x00\x01\x30\x31]")
+
+
+def preview(data):
+    """Best-effort plain text of an ESC/POS job."""
+    return _COMMANDS.sub(b"", data).decode("cp437", errors="replace")
+
+
+class FakePrinter:
+    """Threaded TCP server that records every ESC/POS job."""
+
+    def __init__(self, host="127.0.0.1", port=9100, out_dir=None, echo=False):
+        self.jobs = []
+        self.out_dir = out_dir
+        self.echo = echo
+        self._received = threading.Condition()
+        printer = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                chunks = []
+                while True:
+                    chunk = self.request.recv(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                printer._store(b"".join(chunks))
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address[:2]
+
+    def _store(self, data):
+        with self._received:
+            self.jobs.append(data)
+            n = len(self.jobs)
+            self._received.notify_all()
+        if self.out_dir:
+            os.makedirs(self.out_dir, exist_ok=True)
+            with open(os.path.join(self.out_dir, f"job_{n:05d}.bin"), "wb") as f:
+                f.write(data)
+        if self.echo:
+            print(f"🖨️ job #{n} ({len(data)} bytes)\n{preview(data)}")
+
+    def wait_for_jobs(self, count, timeout=5.0):
+        """Blocks until at least `count` jobs arrived; returns True on success."""
+        with self._received:
+            return self._received.wait_for(lambda: len(self.jobs) >= count, timeout=timeout)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-printer", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake ESC/POS printer on raw TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--out", default=None, help="folder to save received jobs as .bin")
+    args = parser.parse_args()
+
+    printer = FakePrinter(args.host, args.port, out_dir=args.out, echo=True).start()
+    print(f"✅ Fake printer listening on {printer.host}:{printer.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        printer.stop()
+
+
+if __name__ == "__main__":
+    main()
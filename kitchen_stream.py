@@ -0,0 +1,84 @@
+# ============================================================
+# PALUTO POS — KITCHEN DISPLAY EVENT FEED (Server-Sent Events)
+# ============================================================
+# kitchen.html and view.html used to poll /api/kitchen_orders every five
+# seconds. Now the routes that change orders (/checkout, /add_item,
+# /api/update_order_status, /complete_payment) publish a small delta here
+# and /api/kitchen_stream pushes it to every open screen.
+#
+# Each event carries the full, current ticket of ONE transaction (or null
+# when it left the board), so clients can apply events idempotently:
+#     orders[txn_id] = order   /   delete orders[txn_id]
+#
+# Event ids increase by one, starting from the process start time in ms so
+# they keep growing across restarts. A reconnecting client sends
+# Last-Event-ID and receives only what it missed; if that is older than the
+# kept history (or from another server run) it gets a fresh snapshot.
+# ============================================================
+
+import collections, json, threading, time
+
+HISTORY_SIZE = 1000       # events kept for resuming clients
+KEEPALIVE_SECONDS = 15    # comment line sent when nothing happens
+RETRY_MS = 3000           # client reconnect delay
+
+
+class KitchenFeed:
+    """Thread-safe, in-process log of kitchen ticket changes."""
+
+    def __init__(self, history=HISTORY_SIZE):
+        self._cond = threading.Condition()
+        self._events = collections.deque(maxlen=history)
+        self._last_id = int(time.time() * 1000)
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._last_id
+
+    def publish(self, kind, txn_id, order):
+        """Records a ticket change and wakes every waiting stream."""
+        with self._cond:
+            self._last_id += 1
+            self._events.append((self._last_id, {"kind": kind, "txn_id": txn_id, "order": order}))
+            self._cond.notify_all()
+            return self._last_id
+
+    def events_after(self, last_id):
+        """Events newer than last_id, or None if some of them were already dropped."""
+        with self._cond:
+            if last_id == self._last_id:
+                return []
+            if last_id > self._last_id:
+                return None
+            oldest = self._events[0][0] if self._events else self._last_id + 1
+            if last_id < oldest - 1:
+                return None
+            return [e for e in self._events if e[0] > last_id]
+
+    def wait(self, last_id, timeout=KEEPALIVE_SECONDS):
+        """Blocks until there is something after last_id (or timeout); same result as events_after."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._last_id > last_id, timeout=timeout)
+        return self.events_after(last_id)
+
+
+def sse(data, event=None, event_id=None):
+    """Formats one Server-Sent Events message."""
+    out = []
+    if event_id is not None:
+        out.append(f"id: {event_id}")
+    if event:
+        out.append(f"event: {event}")
+    out.append("data: " + json.dumps(data, separators=(",", ":")))
+    return "\n".join(out) + "\n\n"
+
+
+def parse_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+kitchen_feed = KitchenFeed()
@@ -0,0 +1,366 @@
+# ============================================================
+# PALUTO POS — DINNER SERVICE LOAD TEST
+# ============================================================
+# Simulates a full service through the real routes:
+#
+#   cashiers  login → opening_cash → per table turn:
+#             start_order → checkout → add_item (add-ons) → apply_discount
+#             (some orders) → record_payment → complete_payment
+#   kitchen   screens poll /api/kitchen_orders?since=… ; screen 0 also
+#             bumps tickets ACTIVE → READY → SERVED
+#
+# By default the app runs in-process (Flask test client, one per cashier
+# thread) against a scratch copy of paluto.db with throwaway cashier
+# accounts. --url points it at a running server instead (then pass the
+# cashier logins with --login USER:PASS).
+#
+# Reports p50/p95/p99 latency and error rate per route, plus lock
+# contention ("database is locked"/busy errors). Save a run with
+# --save-baseline and compare later runs with --baseline:
+#
+#   python loadtest.py --cashiers 4 --tables 20 --turns 2 --save-baseline base.json
+#   python loadtest.py --cashiers 4 --tables 20 --turns 2 --baseline base.json
+# ============================================================
+
+import argparse, contextlib, io, json, os, random, shutil, sqlite3, sys, tempfile, threading, time
+import urllib.error, urllib.parse, urllib.request
+from http.cookiejar import CookieJar
+
+from credentials import hash_password
+from table_state import TABLE_IDS
+
+BENCH_PASSWORD = "bench"
+
+
+# ============================================================
+# 🔹 RESULTS
+# ============================================================
+class Recorder:
+    """Per-route latencies (ms), errors and lock-contention counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.locked = {}
+
+    def record(self, route, ms, ok, locked=False):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(ms)
+            self.errors[route] = self.errors.get(route, 0) + (not ok)
+            self.locked[route] = self.locked.get(route, 0) + bool(locked)
+
+    def lock_error(self, route):
+        with self._lock:
+            self.locked[route] = self.locked.get(route, 0) + 1
+
+    def summary(self):
+        rows = {}
+        for route, values in self.latencies.items():
+            values = sorted(values)
+            rows[route] = {
+                "count": len(values),
+                "errors": self.errors.get(route, 0),
+                "error_rate": self.errors.get(route, 0) / len(values),
+                "locked": self.locked.get(route, 0),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": values[-1],
+            }
+        return rows
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def is_lock_error(text):
+    text = (text or "").lower()
+    return "database is locked" in text or "database is busy" in text or "sqlite_busy" in text
+
+
+# ============================================================
+# 🔹 CLIENTS (in-process test client / real HTTP)
+# ============================================================
+class InProcessClient:
+    def __init__(self, app, recorder):
+        self.client = app.test_client()
+        self.recorder = recorder
+
+    def call(self, route, method, path, json_body=None, form=None):
+        start = time.perf_counter()
+        res = self.client.open(path, method=method, json=json_body, data=form)
+        ms = (time.perf_counter() - start) * 1000
+        return self._finish(route, ms, res.status_code, res.get_data(as_text=True), res.headers)
+
+    def _finish(self, route, ms, status, text, headers):
+        data = None
+        if "json" in (headers.get("Content-Type") or ""):
+            try:
+                data = json.loads(text)
+            except ValueError:
+                pass
+        ok = status < 400 and not (isinstance(data, dict) and data.get("error"))
+        self.recorder.record(route, ms, ok, locked=not ok and is_lock_error(text))
+        return status, data, headers
+
+
+class HttpClient(InProcessClient):
+    """Same interface over HTTP; keeps its own session cookie, never follows redirects."""
+
+    class _NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url, recorder, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), self._NoRedirect)
+
+    def call(self, route, method, path, json_body=None, form=None):
+        headers, body = {}, None
+        if json_body is not None:
+            body, headers["Content-Type"] = json.dumps(json_body).encode(), "application/json"
+        elif form is not None:
+            body = urllib.parse.urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+
+        start = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=self.timeout) as res:
+                status, text, res_headers = res.status, res.read().decode("utf-8", "replace"), res.headers
+        except urllib.error.HTTPError as e:
+            status, text, res_headers = e.code, e.read().decode("utf-8", "replace"), e.headers
+        except OSError as e:
+            status, text, res_headers = 599, str(e), {}
+        ms = (time.perf_counter() - start) * 1000
+        return self._finish(route, ms, status, text, res_headers)
+
+
+# ============================================================
+# 🔹 SIMULATED STAFF
+# ============================================================
+def cashier_shift(client, login, tables, products, args):
+    username, password = login
+    _, _, headers = client.call("login", "POST", "/login", form={"username": username, "password": password})
+    if "/tables" not in headers.get("Location", ""):
+        print(f"❌ Login failed for {username}", file=sys.stderr)
+        return
+    client.call("opening_cash", "POST", "/opening_cash", form={"opening_amount": "5000", "d1000": "5"})
+
+    rng = random.Random(f"{username}-{args.seed}")
+    for _ in range(args.turns):
+        for table_id in tables:
+            order_type = "unli" if rng.random() < 0.1 else "regular"
+            _, _, headers = client.call("start_order", "POST", "/start_order",
+                                        form={"table_id": table_id, "order_type": order_type})
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(headers.get("Location", "")).query)
+            txn_id = (query.get("txn_id") or [None])[0]
+            if not txn_id:
+                continue
+
+            def line(product):
+                serve = (product["uom"] or "").upper() == "SERVE"
+                return {"product_id": product["id"], "uom": product["uom"] or "SERVE",
+                        "price": product["price"] or 0, "qty": rng.randint(1, 3) if serve else 1,
+                        "grams": 0 if serve else rng.choice((250, 500, 750, 1000)),
+                        "transaction_id": txn_id, "table_id": table_id, "order_type": order_type}
+
+            first_round = [line(p) for p in rng.sample(products, min(args.items, len(products)))]
+            client.call("checkout", "POST", f"/checkout/{txn_id}",
+                        json_body={"table_id": table_id, "order_type": order_type, "orders": first_round})
+            for product in rng.sample(products, min(args.add_ons, len(products))):
+                client.call("add_item", "POST", "/add_item", json_body=line(product))
+            if args.think_ms:
+                time.sleep(rng.uniform(0, args.think_ms) / 1000)
+
+            if rng.random() < args.discount_rate:
+                client.call("apply_discount", "POST", f"/apply_discount/{txn_id}",
+                            json_body={"discount_type": "senior", "total_diners": 4, "headcount": 1})
+            client.call("record_payment", "POST", f"/record_payment/{txn_id}",
+                        json_body={"amount": 1_000_000, "method": "CASH"})
+            client.call("complete_payment", "POST", f"/complete_payment/{txn_id}")
+
+
+def kitchen_screen(client, screen_no, done, args):
+    cursor, board = None, {}
+    while not done.is_set():
+        path = "/api/kitchen_orders" + (f"?since={cursor}" if cursor is not None else "")
+        _, data, headers = client.call("kitchen_orders", "GET", path)
+        if isinstance(data, dict):
+            if cursor is None:
+                board, cursor = data, headers.get("X-Kitchen-Cursor")
+            else:
+                if data.get("full"):
+                    board = {}
+                board.update(data.get("orders") or {})
+                for txn_id in data.get("removed") or []:
+                    board.pop(txn_id, None)
+                cursor = data.get("cursor", cursor)
+
+        if screen_no == 0:  # the expo screen moves tickets along
+            for txn_id, order in list(board.items()):
+                nxt = {"ACTIVE": "READY", "READY": "SERVED"}.get(order.get("status"))
+                if nxt:
+                    client.call("update_order_status", "POST", f"/api/update_order_status/{txn_id}/{nxt}")
+                    order["status"] = nxt
+        done.wait(args.poll_ms / 1000)
+
+
+# ============================================================
+# 🔹 SCRATCH DATABASE (in-process mode)
+# ============================================================
+def prepare_in_process(workdir, cashiers, recorder):
+    """Points app.py at a scratch copy of paluto.db; returns (app module, logins)."""
+    import app as pos_app
+    from db import ConnectionPool
+    from flask import got_request_exception
+
+    path = os.path.join(workdir, "loadtest.db")
+    shutil.copyfile(pos_app.DB, path)
+    pos_app.DB = path
+    pos_app.db_pool = ConnectionPool(path, observer=pos_app.metrics.observe_sql)
+    pos_app.ROOT_DIR = workdir
+    pos_app.SPOOL_DIR = os.path.join(workdir, "print_spool")
+    with contextlib.redirect_stdout(io.StringIO()):
+        pos_app.init_db()
+
+    logins = [(f"BENCH-C{n:03d}", BENCH_PASSWORD) for n in range(cashiers)]
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO user_credentials (username, password, name, role) VALUES (?, ?, ?, 'cashier')",
+                     [(user, hash_password(pw), f"BENCH CASHIER {user[-3:]}") for user, pw in logins])
+    conn.commit()
+    conn.close()
+
+    def on_exception(sender, exception, **extra):
+        if isinstance(exception, sqlite3.OperationalError) and is_lock_error(str(exception)):
+            from flask import request
+            recorder.lock_error(request.endpoint or "?")
+
+    got_request_exception.connect(on_exception, pos_app.app, weak=False)
+    pos_app.app.logger.disabled = True
+    return pos_app, logins
+
+
+# ============================================================
+# 🔹 RUN + REPORT
+# ============================================================
+def run(args):
+    recorder = Recorder()
+    workdir = tempfile.mkdtemp(prefix="paluto_load_")
+    try:
+        if args.url:
+            if not args.login:
+                sys.exit("❌ --url needs at least one --login USER:PASS")
+            logins = [tuple(item.split(":", 1)) for item in args.login]
+            make_client = lambda: HttpClient(args.url, recorder)
+            pos_app = None
+        else:
+            pos_app, logins = prepare_in_process(workdir, args.cashiers, recorder)
+            make_client = lambda: InProcessClient(pos_app.app, recorder)
+
+        _, products, _ = make_client().call("fetch_products", "GET", "/fetch_products")
+        products = [p for p in products or [] if (p.get("price") or 0) > 0]
+        if not products:
+            sys.exit("❌ No priced products to order")
+
+        tables = TABLE_IDS[:args.tables]
+        done = threading.Event()
+        kitchen = [threading.Thread(target=kitchen_screen, args=(make_client(), n, done, args), daemon=True)
+                   for n in range(args.kitchen_screens)]
+        cashiers = [threading.Thread(target=cashier_shift, args=(
+                        make_client(), logins[n % len(logins)], tables[n::args.cashiers],
+                        products, args))
+                    for n in range(args.cashiers)]
+
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            start = time.perf_counter()
+            for t in kitchen + cashiers:
+                t.start()
+            for t in cashiers:
+                t.join()
+            elapsed = time.perf_counter() - start
+            done.set()
+            for t in kitchen:
+                t.join()
+            if pos_app is not None:
+                pos_app.print_queue.stop()
+                pos_app.db_pool.close_all()
+        return recorder.summary(), elapsed
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+ROUTE_ORDER = ["fetch_products", "login", "opening_cash", "start_order", "checkout", "add_item",
+               "apply_discount", "record_payment", "complete_payment", "kitchen_orders", "update_order_status"]
+
+
+def report(summary, elapsed, baseline=None):
+    total = sum(r["count"] for r in summary.values())
+    errors = sum(r["errors"] for r in summary.values())
+    locked = sum(r["locked"] for r in summary.values())
+    print(f"\n{'route':<20}{'count':>7}{'err%':>7}{'locked':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          + ("   p95 vs baseline" if baseline else ""))
+    routes = [r for r in ROUTE_ORDER if r in summary] + sorted(set(summary) - set(ROUTE_ORDER))
+    for route in routes:
+        r = summary[route]
+        line = (f"{route:<20}{r['count']:>7}{r['error_rate'] * 100:>6.1f}%{r['locked']:>8}"
+                f"{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}{r['max']:>9.1f}")
+        base = (baseline or {}).get("routes", {}).get(route)
+        if base and base["p95"]:
+            line += f"   {(r['p95'] - base['p95']) / base['p95'] * 100:+6.1f}%"
+        print(line)
+    print(f"\n{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s), "
+          f"{errors} errors, {locked} lock contentions")
+    if errors:
+        print("⚠️ Some requests failed — see err% above.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paluto POS dinner-service load test")
+    parser.add_argument("--cashiers", type=int, default=4)
+    parser.add_argument("--tables", type=int, default=20, help=f"tables in use (max {len(TABLE_IDS)})")
+    parser.add_argument("--turns", type=int, default=2, help="orders per table over the service")
+    parser.add_argument("--items", type=int, default=4, help="lines per order at checkout")
+    parser.add_argument("--add-ons", type=int, default=1, help="extra add_item calls per order")
+    parser.add_argument("--discount-rate", type=float, default=0.2, help="share of orders with a discount")
+    parser.add_argument("--kitchen-screens", type=int, default=2)
+    parser.add_argument("--poll-ms", type=int, default=500, help="kitchen polling interval")
+    parser.add_argument("--think-ms", type=int, default=0, help="max random pause before paying")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="test a running server instead of the in-process app")
+    parser.add_argument("--login", action="append", help="USER:PASS of a cashier (with --url)")
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--baseline", metavar="FILE", help="compare p95 with a saved run")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own print() output")
+    args = parser.parse_args(argv)
+    args.tables = max(1, min(args.tables, len(TABLE_IDS)))
+    args.cashiers = max(1, min(args.cashiers, args.tables))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    summary, elapsed = run(args)
+    report(summary, elapsed, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k not in ("login",)},
+                       "elapsed": elapsed, "routes": summary}, f, indent=2)
+        print(f"✅ Baseline saved to {args.save_baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+# ============================================================
+# PALUTO POS — REQUEST + SQL METRICS (/metrics)
+# ============================================================
+# Always-on, low-overhead instrumentation of the hot paths:
+#
+#   * per-route request latency histograms (route template, method, status)
+#   * every SQL statement on a pooled connection: count + latency per
+#     statement kind (SELECT/INSERT/UPDATE/…/COMMIT) and per route
+#   * slow statements (>= PALUTO_SLOW_QUERY_MS, default 50 ms): counted,
+#     the most recent kept for /metrics and the rolling log
+#   * lock contention: time spent waiting in BEGIN IMMEDIATE, and
+#     SQLITE_BUSY/SQLITE_LOCKED errors that survived busy_timeout
+#
+# Each observation is a few additions under one lock. /metrics serves it
+# in the Prometheus text format to whoever install()'s `authorized` check
+# lets through (the app: an admin session or PALUTO_METRICS_TOKEN), since
+# the slow-query lines carry SQL text. Set PALUTO_METRICS_LOG=path to also append
+# one JSON line per interval (PALUTO_METRICS_INTERVAL, default 60 s) with
+# what changed since the previous line.
+# ============================================================
+
+import bisect, collections, json, os, sqlite3, threading, time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # seconds
+LOCK_WAIT_SECONDS = 0.001    # a BEGIN IMMEDIATE slower than this had to wait for the lock
+SLOW_QUERIES_KEPT = 20
+SQLITE_BUSY, SQLITE_LOCKED = 5, 6   # primary result codes; extended codes keep them in the low byte
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram (not thread-safe on its own)."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def lines(self, name, labels):
+        out, running = [], 0
+        for bound, n in zip(LATENCY_BUCKETS + (float("inf"),), self.counts):
+            running += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            out.append(f'{name}_bucket{{{labels},le="{le}"}} {running}')
+        out.append(f"{name}_sum{{{labels}}} {self.total:.6f}")
+        out.append(f"{name}_count{{{labels}}} {self.count}")
+        return out
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def is_lock_error(error):
+    """True for SQLITE_BUSY / SQLITE_LOCKED, i.e. the lock was still held when busy_timeout ran out."""
+    code = getattr(error, "sqlite_errorcode", None)   # Python 3.11+
+    if code is not None:
+        return code & 0xFF in (SQLITE_BUSY, SQLITE_LOCKED)
+    return isinstance(error, sqlite3.OperationalError) and str(error).startswith(
+        ("database is locked", "database table is locked"))
+
+
+def statement_kind(sql):
+    word = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "?"
+    return word if word != "WITH" else "SELECT"
+
+
+class Metrics:
+    """Thread-safe registry for request and SQL timings."""
+
+    def __init__(self, slow_query_ms=None, log_path=None, log_interval=None):
+        self.slow_query_seconds = (slow_query_ms if slow_query_ms is not None
+                                   else float(os.environ.get("PALUTO_SLOW_QUERY_MS", 50))) / 1000
+        self.log_path = log_path if log_path is not None else os.environ.get("PALUTO_METRICS_LOG")
+        self.log_interval = log_interval or float(os.environ.get("PALUTO_METRICS_INTERVAL", 60))
+
+        self._lock = threading.Lock()
+        self._local = threading.local()   # route of the request running on this thread
+        self.started = time.time()
+        self.requests = {}                 # (route, method, status) → Histogram
+        self.sql = {}                      # (kind, route) → Histogram
+        self.sql_errors = collections.Counter()   # kind → errors
+        self.slow_count = collections.Counter()   # route → slow statements
+        self.slow_recent = collections.deque(maxlen=SLOW_QUERIES_KEPT)
+        self.lock_waits = Histogram()
+        self.lock_waits_contended = 0
+        self.locked_errors = 0
+        self._logger = None
+
+    # ------------------------------------------------------------
+    # Observations
+    # ------------------------------------------------------------
+    def observe_request(self, route, method, status, seconds):
+        key = (route, method, status)
+        with self._lock:
+            hist = self.requests.get(key)
+            if hist is None:
+                hist = self.requests[key] = Histogram()
+            hist.observe(seconds)
+
+    def observe_sql(self, sql, seconds, error=None):
+        """Statement observer for db.ConnectionPool."""
+        kind = statement_kind(sql)
+        route = getattr(self._local, "route", None) or "background"
+        with self._lock:
+            key = (kind, route)
+            hist = self.sql.get(key)
+            if hist is None:
+                hist = self.sql[key] = Histogram()
+            hist.observe(seconds)
+            if kind == "BEGIN" and "IMMEDIATE" in sql.upper():
+                self.lock_waits.observe(seconds)
+                self.lock_waits_contended += seconds >= LOCK_WAIT_SECONDS
+            if error is not None:
+                self.sql_errors[kind] += 1
+                self.locked_errors += is_lock_error(error)
+            if seconds >= self.slow_query_seconds:
+                self.slow_count[route] += 1
+                self.slow_recent.append((time.time(), route, round(seconds * 1000, 1), " ".join(sql.split())[:300]))
+
+    # ------------------------------------------------------------
+    # Flask wiring
+    # ------------------------------------------------------------
+    def install(self, app, path="/metrics", authorized=None):
+        """Times every request of app and serves path; authorized() → bool guards the endpoint."""
+        from flask import Response, request
+
+        @app.before_request
+        def _metrics_start():
+            rule = request.url_rule
+            self._local.route = rule.rule if rule is not None else "unmatched"
+            self._local.start = time.perf_counter()
+
+        @app.after_request
+        def _metrics_stop(response):
+            start = getattr(self._local, "start", None)
+            if start is not None:
+                self.observe_request(self._local.route, request.method, response.status_code,
+                                     time.perf_counter() - start)
+                self._local.start = None
+            self._local.route = None
+            return response
+
+        @app.route(path)
+        def metrics_endpoint():
+            if authorized is not None and not authorized():
+                return Response("Forbidden\n", status=403, mimetype="text/plain")
+            return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+        if self.log_path:
+            self.start_log()
+
+    # ------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------
+    def render(self):
+        """Prometheus text exposition."""
+        with self._lock:
+            out = [
+                "# HELP paluto_request_seconds Request latency by route template, method and status.",
+                "# TYPE paluto_request_seconds histogram",
+            ]
+            for (route, method, status), hist in sorted(self.requests.items()):
+                out += hist.lines("paluto_request_seconds",
+                                  f'route="{_label(route)}",method="{method}",status="{status}"')
+
+            out += ["# HELP paluto_sql_seconds SQL statement latency by kind and calling route.",
+                    "# TYPE paluto_sql_seconds histogram"]
+            for (kind, route), hist in sorted(self.sql.items()):
+                out += hist.lines("paluto_sql_seconds", f'kind="{kind}",route="{_label(route)}"')
+
+            out += ["# HELP paluto_sql_errors_total Failed SQL statements by kind.",
+                    "# TYPE paluto_sql_errors_total counter"]
+            out += [f'paluto_sql_errors_total{{kind="{k}"}} {n}' for k, n in sorted(self.sql_errors.items())]
+
+            out += ["# HELP paluto_sql_slow_total Statements slower than the slow-query threshold.",
+                    "# TYPE paluto_sql_slow_total counter"]
+            out += [f'paluto_sql_slow_total{{route="{_label(r)}"}} {n}' for r, n in sorted(self.slow_count.items())]
+
+            out += ["# HELP paluto_sqlite_lock_wait_seconds Time spent in BEGIN IMMEDIATE waiting for the write lock.",
+                    "# TYPE paluto_sqlite_lock_wait_seconds histogram"]
+            out += self.lock_waits.lines("paluto_sqlite_lock_wait_seconds", 'db="main"')
+            out += ["# HELP paluto_sqlite_lock_waits_total BEGIN IMMEDIATE calls slower than 1 ms (waited for the write lock).",
+                    "# TYPE paluto_sqlite_lock_waits_total counter",
+                    f"paluto_sqlite_lock_waits_total {self.lock_waits_contended}",
+                    "# HELP paluto_sqlite_locked_errors_total SQLITE_BUSY/SQLITE_LOCKED errors after busy_timeout.",
+                    "# TYPE paluto_sqlite_locked_errors_total counter",
+                    f"paluto_sqlite_locked_errors_total {self.locked_errors}",
+                    "# HELP paluto_uptime_seconds Seconds since the process started.",
+                    "# TYPE paluto_uptime_seconds gauge",
+                    f"paluto_uptime_seconds {time.time() - self.started:.0f}"]
+            for ts, route, ms, sql in self.slow_recent:
+                out.append(f"# slow {time.strftime('%H:%M:%S', time.localtime(ts))} {ms}ms {route}: {sql}")
+        return "\n".join(out) + "\n"
+
+    def snapshot(self):
+        """Totals used for the rolling log: route → (count, seconds), plus counters."""
+        with self._lock:
+            routes = collections.defaultdict(lambda: [0, 0.0])
+            for (route, _, _), hist in self.requests.items():
+                routes[route][0] += hist.count
+                routes[route][1] += hist.total
+            sql_count = sum(h.count for h in self.sql.values())
+            return {"routes": dict(routes), "sql": sql_count, "slow": sum(self.slow_count.values()),
+                    "lock_waits": self.lock_waits_contended, "locked_errors": self.locked_errors}
+
+    def start_log(self):
+        if self._logger is not None:
+            return
+        self._logger = threading.Thread(target=self._log_loop, name="metrics-log", daemon=True)
+        self._logger.start()
+
+    def _log_loop(self):
+        previous = self.snapshot()
+        while True:
+            time.sleep(self.log_interval)
+            current = self.snapshot()
+            routes = {}
+            for route, (count, seconds) in current["routes"].items():
+                old_count, old_seconds = previous["routes"].get(route, (0, 0.0))
+                if count > old_count:
+                    routes[route] = {"count": count - old_count,
+                                     "avg_ms": round((seconds - old_seconds) / (count - old_count) * 1000, 2)}
+            line = {"ts": time.strftime("%Y-%m-%d %H:%M:%S"), "routes": routes}
+            line.update({k: current[k] - previous[k] for k in ("sql", "slow", "lock_waits", "locked_errors")})
+            previous = current
+            if not routes and not line["sql"]:
+                continue  # idle interval
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(line) + "\n")
+            except OSError as e:
+                print(f"⚠️ Could not write metrics log: {e}")
@@ -0,0 +1,868 @@
+# ============================================================
+# PALUTO POS — VERSIONED SCHEMA MIGRATIONS
+# ============================================================
+# Replaces the ad-hoc create_db.py. Each migration runs once, inside its
+# own write transaction, and is recorded in the `schema_version` table.
+#
+#   python migrations.py                 → apply pending migrations
+#   python migrations.py --status        → show applied versions
+#   python migrations.py --check-plans   → fail if a hot query does a SCAN
+#                                          (also run by tests/test_query_plans.py)
+#
+# To change the schema, append a new (version, name, steps) entry to
+# MIGRATIONS. Never edit a migration that has already shipped.
+# ============================================================
+
+import argparse, os, re, sqlite3, sys
+
+
+# ============================================================
+# 🔹 MIGRATION STEPS
+# ============================================================
+BASELINE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category TEXT,
+        type TEXT,
+        variety_1 TEXT,
+        variety_2 TEXT,
+        state_1 TEXT,
+        state_2 TEXT,
+        luto TEXT,
+        uom TEXT,
+        price REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_id TEXT,
+        table_id INTEGER,
+        product_id TEXT,
+        weight_in_kg REAL,
+        quantity INTEGER,
+        subtotal REAL,
+        discount REAL,
+        total REAL,
+        datetime TEXT DEFAULT CURRENT_TIMESTAMP,
+        status TEXT DEFAULT 'ACTIVE'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_id TEXT,
+        amount REAL,
+        method TEXT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_credentials (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        name TEXT,
+        role TEXT CHECK(role IN ('admin', 'cashier')) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS daily_opening_cash (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        username TEXT,
+        opening_amount REAL,
+        date_opened TEXT DEFAULT (date('now')),
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+
+def add_missing_columns(conn):
+    """Adds the columns older databases got by hand (order mode, discounts, denominations)."""
+    wanted = {
+        "sales": [
+            ("TYPE_EAT", "VARCHAR(10)"),
+            ("order_mode", "VARCHAR(10) NOT NULL DEFAULT 'regular'"),
+            ("discount_type", "TEXT"),
+        ],
+        "daily_opening_cash": [
+            (f"d{n}", "INTEGER DEFAULT 0") for n in (1000, 500, 200, 100, 50, 20, 10, 5, 1)
+        ],
+    }
+    for table, columns in wanted.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+HOT_QUERY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_sales_txn_status ON sales(transaction_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_status_datetime ON sales(status, datetime)",
+    "CREATE INDEX IF NOT EXISTS idx_payments_txn ON payments(transaction_id)",
+    "CREATE INDEX IF NOT EXISTS idx_opening_cash_user_date ON daily_opening_cash(username, date_opened)",
+]
+
+
+CATALOG_VERSION = [
+    """
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 1
+    )
+    """,
+    "INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)",
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_products_{event.lower()}_catalog_version
+    AFTER {event} ON products
+    BEGIN
+        UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+    END
+    """
+    for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+
+# Running totals per transaction, maintained by triggers so every write path
+# (routes, scripts, manual fixes) updates them inside its own transaction.
+TRANSACTION_TOTALS = [
+    """
+    CREATE TABLE IF NOT EXISTS transaction_totals (
+        transaction_id TEXT PRIMARY KEY,
+        subtotal REAL NOT NULL DEFAULT 0,
+        discount REAL NOT NULL DEFAULT 0,
+        paid REAL NOT NULL DEFAULT 0,
+        item_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_sales_insert_totals AFTER INSERT ON sales
+    BEGIN
+        INSERT OR IGNORE INTO transaction_totals (transaction_id) VALUES (NEW.transaction_id);
+        UPDATE transaction_totals
+        SET subtotal = subtotal + COALESCE(NEW.subtotal, 0),
+            discount = discount + COALESCE(NEW.discount, 0),
+            item_count = item_count + 1
+        WHERE transaction_id = NEW.transaction_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_sales_delete_totals AFTER DELETE ON sales
+    BEGIN
+        UPDATE transaction_totals
+        SET subtotal = subtotal - COALESCE(OLD.subtotal, 0),
+            discount = discount - COALESCE(OLD.discount, 0),
+            item_count = item_count - 1
+        WHERE transaction_id = OLD.transaction_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_sales_update_totals
+    AFTER UPDATE OF subtotal, discount, transaction_id ON sales
+    BEGIN
+        UPDATE transaction_totals
+        SET subtotal = subtotal - COALESCE(OLD.subtotal, 0),
+            discount = discount - COALESCE(OLD.discount, 0),
+            item_count = item_count - 1
+        WHERE transaction_id = OLD.transaction_id;
+        INSERT OR IGNORE INTO transaction_totals (transaction_id) VALUES (NEW.transaction_id);
+        UPDATE transaction_totals
+        SET subtotal = subtotal + COALESCE(NEW.subtotal, 0),
+            discount = discount + COALESCE(NEW.discount, 0),
+            item_count = item_count + 1
+        WHERE transaction_id = NEW.transaction_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_payments_insert_totals AFTER INSERT ON payments
+    BEGIN
+        INSERT OR IGNORE INTO transaction_totals (transaction_id) VALUES (NEW.transaction_id);
+        UPDATE transaction_totals SET paid = paid + COALESCE(NEW.amount, 0)
+        WHERE transaction_id = NEW.transaction_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_payments_delete_totals AFTER DELETE ON payments
+    BEGIN
+        UPDATE transaction_totals SET paid = paid - COALESCE(OLD.amount, 0)
+        WHERE transaction_id = OLD.transaction_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_payments_update_totals
+    AFTER UPDATE OF amount, transaction_id ON payments
+    BEGIN
+        UPDATE transaction_totals SET paid = paid - COALESCE(OLD.amount, 0)
+        WHERE transaction_id = OLD.transaction_id;
+        INSERT OR IGNORE INTO transaction_totals (transaction_id) VALUES (NEW.transaction_id);
+        UPDATE transaction_totals SET paid = paid + COALESCE(NEW.amount, 0)
+        WHERE transaction_id = NEW.transaction_id;
+    END
+    """,
+    # Backfill from existing history
+    """
+    INSERT OR REPLACE INTO transaction_totals (transaction_id, subtotal, discount, paid, item_count)
+    SELECT transaction_id, COALESCE(SUM(subtotal), 0), COALESCE(SUM(discount), 0), 0, COUNT(*)
+    FROM sales GROUP BY transaction_id
+    """,
+    """
+    INSERT OR IGNORE INTO transaction_totals (transaction_id)
+    SELECT DISTINCT transaction_id FROM payments
+    """,
+    """
+    UPDATE transaction_totals SET paid = (
+        SELECT COALESCE(SUM(amount), 0) FROM payments p
+        WHERE p.transaction_id = transaction_totals.transaction_id
+    )
+    """,
+]
+
+
+CHECKOUT_IDEMPOTENCY = [
+    """
+    CREATE TABLE IF NOT EXISTS checkout_requests (
+        idempotency_key TEXT PRIMARY KEY,
+        transaction_id TEXT NOT NULL,
+        line_ids TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+
+PRINT_JOBS = [
+    """
+    CREATE TABLE IF NOT EXISTS print_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_id TEXT NOT NULL,
+        table_id INTEGER,
+        cashier TEXT,
+        status TEXT NOT NULL DEFAULT 'QUEUED',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 3,
+        result TEXT,
+        last_error TEXT,
+        next_attempt_at TEXT DEFAULT (datetime('now')),
+        created_at TEXT DEFAULT (datetime('now')),
+        updated_at TEXT DEFAULT (datetime('now'))
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_print_jobs_status_due ON print_jobs(status, next_attempt_at)",
+    "CREATE INDEX IF NOT EXISTS idx_print_jobs_txn ON print_jobs(transaction_id)",
+]
+
+
+SALES_ROLLUPS = [
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        day TEXT PRIMARY KEY,
+        revenue REAL NOT NULL DEFAULT 0,
+        discount REAL NOT NULL DEFAULT 0,
+        orders INTEGER NOT NULL DEFAULT 0,
+        covers INTEGER NOT NULL DEFAULT 0,
+        items INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sales_hourly (
+        day TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        revenue REAL NOT NULL DEFAULT 0,
+        orders INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, hour)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily_discounts (
+        day TEXT NOT NULL,
+        discount_type TEXT NOT NULL,
+        amount REAL NOT NULL DEFAULT 0,
+        orders INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, discount_type)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily_products (
+        day TEXT NOT NULL,
+        product_id TEXT NOT NULL,
+        category TEXT,
+        luto TEXT,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        weight_kg REAL NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily_payments (
+        day TEXT NOT NULL,
+        method TEXT NOT NULL,
+        amount REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, method)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analytics_rollup_log (
+        transaction_id TEXT PRIMARY KEY,
+        day TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        rolled_at TEXT DEFAULT (datetime('now'))
+    )
+    """,
+]
+
+
+def add_sales_cashier(conn):
+    """sales.cashier (set by complete_payment) so exports can filter by cashier."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(sales)")}
+    if "cashier" not in existing:
+        conn.execute("ALTER TABLE sales ADD COLUMN cashier TEXT")
+    # older PAID sales: the cashier recorded on their receipt job, if any
+    conn.execute("""
+        UPDATE sales SET cashier = (
+            SELECT j.cashier FROM print_jobs j
+            WHERE j.transaction_id = sales.transaction_id AND j.cashier IS NOT NULL
+            ORDER BY j.id LIMIT 1)
+        WHERE status = 'PAID' AND cashier IS NULL
+    """)
+
+
+OPEN_STATUSES = "('ACTIVE', 'READY', 'SERVED')"
+
+
+def _open_lines_where(table):
+    return f"table_id = {table} AND status IN {OPEN_STATUSES}"
+
+
+def _refresh_table_state(table):
+    """Trigger body: recompute one table's row from its open sales lines."""
+    return f"""
+        DELETE FROM table_state WHERE table_id = {table};
+        INSERT INTO table_state (table_id, transaction_id, order_mode, open_lines, updated_at)
+        SELECT table_id, transaction_id, order_mode,
+               (SELECT COUNT(*) FROM sales WHERE {_open_lines_where(table)}),
+               datetime('now')
+        FROM sales WHERE {_open_lines_where(table)}
+        ORDER BY id LIMIT 1;
+    """
+
+
+TABLE_STATE = [
+    "CREATE INDEX IF NOT EXISTS idx_sales_table_status ON sales(table_id, status)",
+    """
+    CREATE TABLE IF NOT EXISTS table_state (
+        table_id INTEGER PRIMARY KEY,
+        transaction_id TEXT NOT NULL,
+        order_mode TEXT,
+        open_lines INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS table_state_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 1
+    )
+    """,
+    "INSERT OR IGNORE INTO table_state_version (id, version) VALUES (1, 1)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_sales_insert_table_state AFTER INSERT ON sales
+    WHEN NEW.status IN {OPEN_STATUSES}
+    BEGIN
+        {_refresh_table_state("NEW.table_id")}
+        UPDATE table_state_version SET version = version + 1 WHERE id = 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_sales_delete_table_state AFTER DELETE ON sales
+    WHEN OLD.status IN {OPEN_STATUSES}
+    BEGIN
+        {_refresh_table_state("OLD.table_id")}
+        UPDATE table_state_version SET version = version + 1 WHERE id = 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_sales_update_table_state
+    AFTER UPDATE OF status, table_id, transaction_id, order_mode ON sales
+    WHEN OLD.status IN {OPEN_STATUSES} OR NEW.status IN {OPEN_STATUSES}
+    BEGIN
+        {_refresh_table_state("OLD.table_id")}
+        {_refresh_table_state("NEW.table_id")}
+        UPDATE table_state_version SET version = version + 1 WHERE id = 1;
+    END
+    """,
+    # Backfill: first open line per table, like the old /tables lookup
+    f"""
+    INSERT OR REPLACE INTO table_state (table_id, transaction_id, order_mode, open_lines, updated_at)
+    SELECT s.table_id, s.transaction_id, s.order_mode, c.open_lines, datetime('now')
+    FROM sales s
+    JOIN (SELECT table_id, MIN(id) AS first_id, COUNT(*) AS open_lines FROM sales
+          WHERE status IN {OPEN_STATUSES} AND table_id IS NOT NULL GROUP BY table_id) c
+      ON s.id = c.first_id
+    """,
+]
+
+
+# "D. VARIETY LUTO": DEAD/ALIVE initial, then variety and luto — what the kitchen reads
+_STATE = "COALESCE(NULLIF(state_1, ''), state_2)"
+KITCHEN_NAME_SQL = f"""LTRIM(
+    CASE WHEN UPPER({_STATE}) IN ('DEAD', 'ALIVE') THEN SUBSTR(UPPER({_STATE}), 1, 1) || '.' ELSE '' END
+    || COALESCE(' ' || NULLIF(variety_1, ''), '')
+    || COALESCE(' ' || NULLIF(variety_2, ''), '')
+    || COALESCE(' ' || NULLIF(luto, ''), ''))"""
+
+
+def add_kitchen_names(conn):
+    """products.kitchen_name, kept current by triggers on insert/update."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(products)")}
+    if "kitchen_name" not in existing:
+        conn.execute("ALTER TABLE products ADD COLUMN kitchen_name TEXT")
+    for event in ("INSERT", "UPDATE OF state_1, state_2, variety_1, variety_2, luto"):
+        name = event.split()[0].lower()
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_products_{name}_kitchen_name AFTER {event} ON products
+            BEGIN
+                UPDATE products SET kitchen_name = {KITCHEN_NAME_SQL} WHERE id = NEW.id;
+            END
+        """)
+    conn.execute(f"UPDATE products SET kitchen_name = {KITCHEN_NAME_SQL}")
+
+
+WRITE_SEQUENCE = [
+    """
+    CREATE TABLE IF NOT EXISTS write_sequence (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        seq INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT OR IGNORE INTO write_sequence (id, seq) VALUES (1, 0)",
+]
+
+
+def add_product_skus(conn):
+    """products.sku (the CSV's ID, unique), price_2 and active for catalog_import.py."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(products)")}
+    for name, decl in (("sku", "TEXT"), ("price_2", "REAL"), ("active", "INTEGER NOT NULL DEFAULT 1")):
+        if name not in existing:
+            conn.execute(f"ALTER TABLE products ADD COLUMN {name} {decl}")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_products_sku ON products(sku)")
+
+
+def hash_passwords(conn):
+    """auth_version (bumped on user/opening-cash changes) and hashed passwords."""
+    from credentials import hash_stored_passwords
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS auth_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 1
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO auth_version (id, version) VALUES (1, 1)")
+    for table in ("user_credentials", "daily_opening_cash"):
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_auth_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE auth_version SET version = version + 1 WHERE id = 1;
+                END
+            """)
+    hash_stored_passwords(conn)
+
+
+# transaction_totals again, but summing whole centavos (see money.py) so a
+# settled balance is exactly 0 instead of 0.0000001.
+def _centavos(column):
+    return f"CAST(ROUND(COALESCE({column}, 0) * 100) AS INTEGER)"
+
+
+def _totals_delta(sign, row, table):
+    """UPDATE adding (sign '+') or removing ('-') row's amounts in transaction_totals."""
+    if table == "sales":
+        return f"""
+            UPDATE transaction_totals
+            SET subtotal_centavos = subtotal_centavos {sign} {_centavos(row + ".subtotal")},
+                discount_centavos = discount_centavos {sign} {_centavos(row + ".discount")},
+                item_count = item_count {sign} 1
+            WHERE transaction_id = {row}.transaction_id;"""
+    return f"""
+            UPDATE transaction_totals SET paid_centavos = paid_centavos {sign} {_centavos(row + ".amount")}
+            WHERE transaction_id = {row}.transaction_id;"""
+
+
+def _totals_trigger(table, event, columns):
+    name = f"trg_{table}_{event.split()[0].lower()}_totals"
+    body = ""
+    if event != "INSERT":
+        body += _totals_delta("-", "OLD", table)
+    if event != "DELETE":
+        body += "\n            INSERT OR IGNORE INTO transaction_totals (transaction_id) VALUES (NEW.transaction_id);"
+        body += _totals_delta("+", "NEW", table)
+    on = f"UPDATE OF {columns}, transaction_id" if event == "UPDATE" else event
+    return f"CREATE TRIGGER {name} AFTER {on} ON {table}\n        BEGIN{body}\n        END"
+
+
+CENTAVO_TOTALS = [
+    f"DROP TRIGGER IF EXISTS trg_{table}_{event}_totals"
+    for table in ("sales", "payments") for event in ("insert", "delete", "update")
+] + [
+    "DROP TABLE IF EXISTS transaction_totals",
+    """
+    CREATE TABLE transaction_totals (
+        transaction_id TEXT PRIMARY KEY,
+        subtotal_centavos INTEGER NOT NULL DEFAULT 0,
+        discount_centavos INTEGER NOT NULL DEFAULT 0,
+        paid_centavos INTEGER NOT NULL DEFAULT 0,
+        item_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+] + [
+    _totals_trigger(table, event, columns)
+    for table, columns in (("sales", "subtotal, discount"), ("payments", "amount"))
+    for event in ("INSERT", "DELETE", "UPDATE")
+] + [
+    f"""
+    INSERT INTO transaction_totals (transaction_id, subtotal_centavos, discount_centavos, item_count)
+    SELECT transaction_id, SUM({_centavos("subtotal")}), SUM({_centavos("discount")}), COUNT(*)
+    FROM sales GROUP BY transaction_id
+    """,
+    "INSERT OR IGNORE INTO transaction_totals (transaction_id) SELECT DISTINCT transaction_id FROM payments",
+    f"""
+    UPDATE transaction_totals SET paid_centavos = (
+        SELECT COALESCE(SUM({_centavos("amount")}), 0) FROM payments p
+        WHERE p.transaction_id = transaction_totals.transaction_id
+    )
+    """,
+]
+
+
+def _retype_column(conn, table, column, decl, convert):
+    """Rebuilds table with column declared as decl, filling it with the convert expression.
+
+    SQLite cannot change a column's type in place: copy into a new table, drop
+    the old one, rename, then recreate its indexes and triggers.
+    """
+    ddl = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    ddl, found = re.subn(rf"(\b{column}\s+)\w+", rf"\g<1>{decl}", ddl, count=1)
+    if not found:
+        raise RuntimeError(f"{table}.{column} not found")
+    ddl = re.sub(rf"^CREATE TABLE (IF NOT EXISTS )?[\"`]?{table}\b[\"`]?", f"CREATE TABLE {table}_rebuild", ddl)
+    extras = [sql for (sql,) in conn.execute("""
+        SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """, (table,))]
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone() \
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone() else None
+
+    conn.execute(ddl)
+    conn.execute(f"""
+        INSERT INTO {table}_rebuild ({", ".join(f'"{c}"' for c in columns)})
+        SELECT {", ".join(convert if c == column else f'"{c}"' for c in columns)} FROM {table}
+    """)
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_rebuild RENAME TO {table}")
+    if seq:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq[0], table))
+    for sql in extras:
+        conn.execute(sql)
+
+
+def integer_product_ids(conn):
+    """sales/sales_daily_products.product_id as INTEGER (products.id); SKUs and digits converted."""
+    for table in ("sales", "sales_daily_products"):
+        ref = f"{table}.product_id"
+        _retype_column(conn, table, "product_id", "INTEGER", f"""
+            CASE WHEN typeof({ref}) = 'integer' THEN {ref}
+                 WHEN CAST({ref} AS INTEGER) || '' = TRIM({ref}) THEN CAST({ref} AS INTEGER)
+                 ELSE COALESCE((SELECT p.id FROM products p WHERE p.sku = TRIM({ref})), {ref})
+            END""")
+
+
+Z_REPORTS = [
+    "CREATE INDEX IF NOT EXISTS idx_rollup_log_day ON analytics_rollup_log(day)",
+    "CREATE INDEX IF NOT EXISTS idx_opening_cash_timestamp ON daily_opening_cash(timestamp)",
+    """
+    CREATE TABLE IF NOT EXISTS cash_counts (
+        day TEXT NOT NULL,
+        username TEXT NOT NULL,
+        d1000 INTEGER DEFAULT 0, d500 INTEGER DEFAULT 0, d200 INTEGER DEFAULT 0,
+        d100 INTEGER DEFAULT 0, d50 INTEGER DEFAULT 0, d20 INTEGER DEFAULT 0,
+        d10 INTEGER DEFAULT 0, d5 INTEGER DEFAULT 0, d1 INTEGER DEFAULT 0,
+        counted_centavos INTEGER NOT NULL DEFAULT 0,
+        counted_by TEXT,
+        counted_at TEXT DEFAULT (datetime('now')),
+        PRIMARY KEY (day, username)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS z_reports (
+        day TEXT PRIMARY KEY,
+        body TEXT NOT NULL,
+        closed_by TEXT,
+        closed_at TEXT DEFAULT (datetime('now'))
+    )
+    """,
+]
+
+
+TRANSACTION_IDS = [
+    """
+    CREATE TABLE IF NOT EXISTS transaction_ids (
+        id TEXT PRIMARY KEY,
+        created_at TEXT DEFAULT (datetime('now')),
+        table_id INTEGER,
+        order_mode TEXT,
+        cashier TEXT
+    ) WITHOUT ROWID
+    """,
+    # ids handed out before the table existed stay reserved
+    """
+    INSERT OR IGNORE INTO transaction_ids (id, created_at, table_id, order_mode, cashier)
+    SELECT transaction_id, MIN(datetime), MIN(table_id), MIN(order_mode), MAX(cashier)
+    FROM sales WHERE transaction_id IS NOT NULL GROUP BY transaction_id
+    """,
+]
+
+
+ADD_ITEM_REQUESTS = [
+    """
+    CREATE TABLE IF NOT EXISTS add_item_requests (
+        idempotency_key TEXT PRIMARY KEY,
+        transaction_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        created_at TEXT DEFAULT (datetime('now'))
+    )
+    """,
+]
+
+
+def catalog_version_once(conn):
+    """Bump catalog_version once per product write, not again for the kitchen_name trigger's UPDATE.
+
+    The update trigger is limited to the columns a product write sets, so the
+    nested UPDATE of kitchen_name alone no longer fires it. A migration adding
+    a products column must recreate this trigger to include it.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(products)") if row[1] != "kitchen_name"]
+    conn.execute("DROP TRIGGER IF EXISTS trg_products_update_catalog_version")
+    conn.execute(f"""
+        CREATE TRIGGER trg_products_update_catalog_version
+        AFTER UPDATE OF {", ".join(columns)} ON products
+        BEGIN
+            UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+        END
+    """)
+
+
+# (version, name, steps) — steps is a list of SQL strings or a callable(conn)
+MIGRATIONS = [
+    (1, "baseline schema", BASELINE_SCHEMA),
+    (2, "order mode, discount and denomination columns", add_missing_columns),
+    (3, "hot query indexes", HOT_QUERY_INDEXES),
+    (4, "catalog version with product change triggers", CATALOG_VERSION),
+    (5, "trigger-maintained transaction totals", TRANSACTION_TOTALS),
+    (6, "checkout idempotency keys", CHECKOUT_IDEMPOTENCY),
+    (7, "persistent print job queue", PRINT_JOBS),
+    (8, "daily and hourly sales rollups", SALES_ROLLUPS),
+    (9, "cashier on sales lines", add_sales_cashier),
+    (10, "trigger-maintained table state", TABLE_STATE),
+    (11, "precomputed kitchen display names", add_kitchen_names),
+    (12, "add_item write sequence", WRITE_SEQUENCE),
+    (13, "product SKUs, second price and active flag", add_product_skus),
+    (14, "hashed passwords and auth cache version", hash_passwords),
+    (15, "transaction totals in integer centavos", CENTAVO_TOTALS),
+    (16, "integer product ids on sales", integer_product_ids),
+    (17, "z-report closings and cash counts", Z_REPORTS),
+    (18, "reserved time-ordered transaction ids", TRANSACTION_IDS),
+    (19, "add_item idempotency keys", ADD_ITEM_REQUESTS),
+    (20, "catalog version bumped once per product write", catalog_version_once),
+]
+
+
+# ============================================================
+# 🔹 RUNNER
+# ============================================================
+def applied_versions(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+
+def current_version(conn):
+    return max(applied_versions(conn), default=0)
+
+
+def migrate(conn, verbose=False):
+    """Applies every pending migration in order; returns the resulting schema version."""
+    done = applied_versions(conn)
+    for version, name, steps in MIGRATIONS:
+        if version in done:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if callable(steps):
+                steps(conn)
+            else:
+                for sql in steps:
+                    conn.execute(sql)
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if verbose:
+            print(f"✅ Applied migration {version}: {name}")
+    return current_version(conn)
+
+
+# ============================================================
+# 🔹 QUERY-PLAN REGRESSION CHECK
+# ============================================================
+# The queries the live floor runs on every tap/poll, imported from the
+# modules that run them. None of them may fall back to a full table SCAN
+# once the migrations above are applied (tests/test_query_plans.py).
+def hot_queries():
+    """{name: (sql, params)} of the hot queries, exactly as the routes run them."""
+    from credentials import OPENING_CASH_SQL
+    from exports import EXPORT_SQL, export_filters
+    from queries import (KITCHEN_ORDERS_SQL, KITCHEN_TICKET_SQL, PAYMENT_LINES_SQL, PAYMENTS_SQL, PRINT_LINES_SQL,
+                         RECEIPT_LINES_SQL, UPDATE_ORDER_STATUS_SQL)
+    from totals import TOTALS_SQL
+    from txn_ids import ARCHIVED_TOTALS_SQL, LOOKUP_SQL, _centavos
+    from write_queue import EXISTING_LINE_SQL
+    from zreport import REPORT_SQL
+
+    export_where, export_params = export_filters("2025-10-01", "2025-10-31")
+    return {
+        "tables.opening_cash": (OPENING_CASH_SQL, ("cashier", "2025-01-01")),
+        "tables.state_refresh": (
+            f"SELECT transaction_id FROM sales WHERE {_open_lines_where('?')} ORDER BY id LIMIT 1", (1,)),
+        "add_item.existing_line": (EXISTING_LINE_SQL, ("T", 1)),
+        "kitchen_ticket": (KITCHEN_TICKET_SQL, ("T",)),
+        "get_receipt": (RECEIPT_LINES_SQL, ("T",)),
+        "transaction_totals": (TOTALS_SQL, ("T",)),
+        "print_receipt.items": (PRINT_LINES_SQL, ("T",)),
+        "payment_page.sales": (PAYMENT_LINES_SQL, ("T",)),
+        "payment_page.payments": (PAYMENTS_SQL, ("T",)),
+        "kitchen_orders": (
+            KITCHEN_ORDERS_SQL.format(where="s.status IN ('ACTIVE', 'READY') AND UPPER(p.category) IN (?)"),
+            ("FISH",)),
+        "update_order_status": (UPDATE_ORDER_STATUS_SQL, ("READY", "T")),
+        "export_sales": (EXPORT_SQL.format(where=export_where, sales="sales"), export_params),
+        "z_report": (REPORT_SQL.format(sales="sales", payments="payments"), {"day": "2025-10-31"}),
+        "transaction_lookup": (LOOKUP_SQL.format(order="ASC", where=""), ("01HZ", "01J0", 50)),
+        "transaction_lookup.archived_totals": (
+            ARCHIVED_TOTALS_SQL.format(sub=_centavos("s.subtotal"), disc=_centavos("s.discount"),
+                                       amount=_centavos("p.amount"), sales="sales", payments="payments",
+                                       marks="?"), ("T",)),
+    }
+
+
+_FROM_ALIAS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_NOT_ALIASES = {"WHERE", "ON", "USING", "JOIN", "LEFT", "INNER", "CROSS", "NATURAL", "GROUP", "ORDER", "LIMIT",
+                "UNION", "HAVING"}
+
+
+def _table_scans(conn, sql, plan):
+    """Plan lines that SCAN a stored table; scans of CTEs and subqueries are fine."""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    names = {}
+    for name, alias in _FROM_ALIAS.findall(sql):
+        names.setdefault(name, name)
+        if alias and alias.upper() not in _NOT_ALIASES:
+            names[alias] = name
+    scans = []
+    for line in plan:
+        words = line.split()
+        if words[0] == "SCAN" and len(words) > 1 and names.get(words[1], words[1]) in tables:
+            scans.append(line)
+    return scans
+
+
+def query_plan_scans(conn, queries=None):
+    """Returns {query name: [plan lines]} for every hot query whose plan SCANs a table."""
+    offenders = {}
+    for name, (sql, params) in (queries or hot_queries()).items():
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        scans = _table_scans(conn, sql, plan)
+        if scans:
+            offenders[name] = plan
+    return offenders
+
+
+PRODUCT_JOIN = "JOIN products p ON s.product_id = p.id"
+
+
+def product_join_problems(conn, queries=None):
+    """Returns {what: problem} where a hot sales↔products join needs coercion or is not a rowid lookup."""
+    problems = {}
+    declared = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(sales)")}.get("product_id", "")
+    if declared.upper() != "INTEGER":
+        problems["sales.product_id"] = f"declared {declared or '?'}, products.id is INTEGER"
+    mixed = conn.execute("""
+        SELECT COUNT(*) FROM sales WHERE typeof(product_id) NOT IN ('integer', 'null')
+    """).fetchone()[0]
+    if mixed:
+        problems["sales.product_id values"] = f"{mixed} rows not stored as integers"
+    for name, (sql, params) in (queries or hot_queries()).items():
+        if PRODUCT_JOIN not in sql:
+            continue
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        if not any(line.startswith("SEARCH p USING INTEGER PRIMARY KEY") for line in plan):
+            problems[name] = " | ".join(plan)
+    return problems
+
+
+# ============================================================
+# 🔹 CLI
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paluto POS schema migrations")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "paluto.db"))
+    parser.add_argument("--status", action="store_true", help="list applied migrations and exit")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="fail if a hot query plan contains SCAN or a product join needs coercion")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.status:
+            applied_versions(conn)
+            for row in conn.execute("SELECT version, name, applied_at FROM schema_version ORDER BY version"):
+                print(f"{row[0]:>4}  {row[2]}  {row[1]}")
+            return 0
+
+        version = migrate(conn, verbose=True)
+        print(f"✅ Schema is at version {version}")
+
+        if args.check_plans:
+            offenders = query_plan_scans(conn)
+            for name, plan in offenders.items():
+                print(f"❌ {name}: " + " | ".join(plan))
+            join_problems = product_join_problems(conn)
+            for name, problem in join_problems.items():
+                print(f"❌ {name}: {problem}")
+            if offenders or join_problems:
+                return 1
+            queries = hot_queries()
+            print(f"✅ {len(queries)} hot queries use indexes")
+            joins = sum(PRODUCT_JOIN in sql for sql, _ in queries.values())
+            print(f"✅ {joins} sales↔products joins are integer rowid lookups")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
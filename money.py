@@ -0,0 +1,97 @@
+# ============================================================
+# PALUTO POS — MONEY IN INTEGER CENTAVOS
+# ============================================================
+# Discounts, VAT and payments used to be float math (subtotal / 1.12,
+# subtotal * ratio, min(given, remaining)), so a balance could end at
+# 0.0000001 and the transaction never closed. All of it now goes through
+# integer centavos:
+#
+#   to_centavos("1,234.50") → 123450      to_pesos(123450) → 1234.5
+#
+#   * line_amount      price × qty or price × kg, rounded once per line
+#   * vat_breakdown    12% VAT-inclusive amount → (vatable, vat)
+#   * senior_pwd_deduction / percent_of → whole-bill deduction
+#   * allocate         splits a deduction over the lines (largest remainder),
+#                      so the line discounts add up to it exactly
+#
+# Amounts are rounded half up. sales/payments keep their REAL peso columns,
+# but every value written is a whole number of centavos, and
+# transaction_totals (migration 15) sums them as INTEGER centavos.
+# ============================================================
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+VAT_PERCENT = 12
+SENIOR_PWD_PERCENT = 20
+
+
+def to_centavos(amount):
+    """Pesos (number or text, ₱ and commas allowed) → int centavos; ValueError if not a number."""
+    if amount is None or amount == "":
+        return 0
+    try:
+        value = Decimal(str(amount).replace("₱", "").replace(",", "").strip())
+    except InvalidOperation:
+        raise ValueError(f"Not an amount: {amount!r}")
+    if not value.is_finite():
+        raise ValueError(f"Not an amount: {amount!r}")
+    return int((value * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_pesos(centavos):
+    """int centavos → float pesos for JSON, templates and the REAL columns."""
+    return centavos / 100
+
+
+def _div_half_up(numerator, denominator):
+    """numerator / denominator rounded half up (away from zero), in integers."""
+    sign = -1 if (numerator < 0) != (denominator < 0) else 1
+    numerator, denominator = abs(numerator), abs(denominator)
+    return sign * ((2 * numerator + denominator) // (2 * denominator))
+
+
+def line_amount(price, qty=0, weight_kg=None):
+    """Centavos for one line: price per serve × qty, or price per kg × weight_kg when given."""
+    factor = Decimal(str(weight_kg)) if weight_kg is not None else Decimal(int(qty))
+    value = Decimal(to_centavos(price)) * factor
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def vat_breakdown(gross):
+    """VAT-inclusive centavos → (vatable sales, VAT amount); the two add up to gross."""
+    vatable = _div_half_up(gross * 100, 100 + VAT_PERCENT)
+    return vatable, gross - vatable
+
+
+def senior_pwd_deduction(gross, total_diners, headcount):
+    """Senior/PWD deduction on a shared bill: 20% off and VAT exemption for headcount of total_diners."""
+    vatable, vat = vat_breakdown(gross)
+    discount = _div_half_up(vatable * headcount * SENIOR_PWD_PERCENT, total_diners * 100)
+    vat_exempt = _div_half_up(vat * headcount, total_diners)
+    return discount + vat_exempt
+
+
+def percent_of(amount, percent):
+    """percent (e.g. 10 or "12.5") of amount centavos, rounded to the centavo."""
+    value = Decimal(amount) * Decimal(str(percent)) / 100
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def allocate(total, weights):
+    """Splits total centavos proportionally to weights; the parts always sum to total.
+
+    Each part gets its floor share, and the centavos left over go one each to
+    the parts with the largest remainders (earlier parts win ties).
+    """
+    weights = list(weights)
+    if not weights:
+        return []
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        weights, weight_sum = [1] * len(weights), len(weights)
+    parts = [total * w // weight_sum for w in weights]
+    leftover = total - sum(parts)
+    by_remainder = sorted(range(len(weights)), key=lambda i: (-(total * weights[i] % weight_sum), i))
+    for i in by_remainder[:leftover]:
+        parts[i] += 1
+    return parts
@@ -0,0 +1,177 @@
+# ============================================================
+# PALUTO POS — BACKGROUND RECEIPT PRINT QUEUE
+# ============================================================
+# complete_payment used to lay out the PDF and talk to the printer while
+# the cashier's request waited. Now it only inserts a row into `print_jobs`
+# (migration 7) and returns; a worker thread picks the job up, calls the
+# print handler and records the outcome.
+#
+#   QUEUED → PRINTING → DONE
+#                     ↘ QUEUED again (retry with backoff) … → FAILED
+#
+# Jobs live in SQLite, so a crash or restart does not lose them: anything
+# left PRINTING is re-queued when the worker starts.
+# ============================================================
+
+import os, threading, time, traceback
+
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 5    # 5s, 10s, ... between attempts
+POLL_SECONDS = 2             # idle wake-up to pick up retries that came due
+
+
+class PrintQueue:
+    """Persistent print job queue served by background worker thread(s)."""
+
+    def __init__(self, get_db, handler, workers=1, max_attempts=MAX_ATTEMPTS):
+        self.get_db = get_db        # callable → pooled sqlite3 connection
+        self.handler = handler      # callable(job dict) → result message; raises on failure
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------
+    def enqueue(self, txn_id, table_id=None, cashier=None):
+        """Adds a receipt job and returns its id; never blocks on the printer."""
+        conn = self.get_db()
+        try:
+            cur = conn.execute("""
+                INSERT INTO print_jobs (transaction_id, table_id, cashier, max_attempts)
+                VALUES (?, ?, ?, ?)
+            """, (txn_id, table_id, cashier, self.max_attempts))
+            conn.commit()
+            job_id = cur.lastrowid
+        finally:
+            conn.close()
+        self.start()
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id):
+        conn = self.get_db()
+        try:
+            row = conn.execute("SELECT * FROM print_jobs WHERE id = ?", (job_id,)).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def jobs_for(self, txn_id):
+        conn = self.get_db()
+        try:
+            rows = conn.execute("SELECT * FROM print_jobs WHERE transaction_id = ? ORDER BY id", (txn_id,)).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._requeue_interrupted()
+            self._stop.clear()
+            for n in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"print-worker-{n}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            for t in self._threads:
+                t.join(timeout)
+            self._threads = []
+
+    def _requeue_interrupted(self):
+        conn = self.get_db()
+        try:
+            conn.execute("UPDATE print_jobs SET status = 'QUEUED' WHERE status = 'PRINTING'")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _claim_next(self):
+        conn = self.get_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT * FROM print_jobs
+                WHERE status = 'QUEUED' AND next_attempt_at <= datetime('now')
+                ORDER BY id LIMIT 1
+            """).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            conn.execute("""
+                UPDATE print_jobs SET status = 'PRINTING', attempts = attempts + 1, updated_at = datetime('now')
+                WHERE id = ?
+            """, (row["id"],))
+            conn.commit()
+            job = dict(row)
+            job["attempts"] += 1
+            return job
+        finally:
+            conn.close()
+
+    def _finish(self, job, status, result=None, error=None, retry_in=0):
+        conn = self.get_db()
+        try:
+            conn.execute("""
+                UPDATE print_jobs
+                SET status = ?, result = COALESCE(?, result), last_error = ?,
+                    next_attempt_at = datetime('now', ?), updated_at = datetime('now')
+                WHERE id = ?
+            """, (status, result, error, f"+{int(retry_in)} seconds", job["id"]))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def process(self, job):
+        """Runs one claimed job through the handler and records the outcome."""
+        try:
+            result = self.handler(job)
+        except Exception as e:
+            traceback.print_exc()
+            if job["attempts"] < job["max_attempts"]:
+                self._finish(job, "QUEUED", error=str(e), retry_in=RETRY_BACKOFF_SECONDS * job["attempts"])
+            else:
+                self._finish(job, "FAILED", error=str(e))
+            return False
+        self._finish(job, "DONE", result=result)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()  # before the scan, so a job enqueued during it still wakes us
+            try:
+                job = self._claim_next()
+            except Exception:
+                traceback.print_exc()
+                job = None
+            if job is None:
+                self._wake.wait(POLL_SECONDS)
+                continue
+            self.process(job)
+
+
+# ============================================================
+# 🔹 LOCAL SPOOL DIRECTORY (no physical printer)
+# ============================================================
+def spool_bytes(data, filename, spool_dir):
+    """Writes a rendered receipt into a CUPS-style spool directory; returns the spooled path."""
+    os.makedirs(spool_dir, exist_ok=True)
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"{int(now * 1000) % 1000:03d}"
+    target = os.path.join(spool_dir, f"{stamp}-{filename}")
+    with open(target + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(target + ".tmp", target)  # never leave a half-written job behind
+    return target
@@ -0,0 +1,202 @@
+# ============================================================
+# PALUTO POS — RECEIPT PRINTER BACKENDS (PDF / ESC/POS)
+# ============================================================
+# print_receipt builds the receipt once as tagged text lines (see
+# receipts.py) and hands it to a backend:
+#
+#   PdfBackend    → reportlab PDF, then the Windows print verb, CUPS `lp`
+#                   or the local spool folder (the original behaviour)
+#   EscPosBackend → raw ESC/POS bytes written straight to the thermal
+#                   printer: a device file, a TCP port (9100) or a folder
+#
+# Selected with environment variables:
+#   PALUTO_PRINTER_BACKEND = pdf (default) | escpos
+#   PALUTO_ESCPOS_TARGET   = tcp://192.168.1.50:9100 | /dev/usb/lp0 | file:///path/to/folder
+# ============================================================
+
+import os, platform, shutil, socket, subprocess
+
+from print_queue import spool_bytes
+
+
+# ============================================================
+# 🔹 PDF BACKEND
+# ============================================================
+class PdfBackend:
+    """Renders a PDF and prints it through the OS (or spools it)."""
+
+    def __init__(self, root_dir, spool_dir, printer_name=None):
+        self.root_dir = root_dir
+        self.spool_dir = spool_dir
+        self.printer_name = printer_name if printer_name is not None else os.environ.get("PALUTO_PRINTER")
+
+    def print_receipt(self, template, body, closing, name):
+        pdf_bytes = template.render_pdf(body, closing)
+        return self.send(pdf_bytes, f"{name}.pdf")
+
+    def send(self, pdf_bytes, filename):
+        """Prints a rendered receipt; without a printer it lands in the local spool directory."""
+        current_os = platform.system().lower()
+        if "windows" in current_os:
+            import win32print, win32api
+            pdf_filename = os.path.join(self.root_dir, filename)  # the Windows print verb needs a file
+            with open(pdf_filename, "wb") as f:
+                f.write(pdf_bytes)
+            printer_name = win32print.GetDefaultPrinter() or ""
+            if "microsoft print to pdf" in printer_name.lower():
+                print(f"⚠️ No physical printer detected. PDF saved: {pdf_filename}")
+                return f"⚠️ No printer detected. PDF saved as {pdf_filename}"
+            win32api.ShellExecute(0, "print", pdf_filename, f'"{printer_name}"', ".", 0)
+            return f"✅ Receipt printed on: {printer_name}"
+
+        # Linux / macOS: CUPS when a printer is configured, otherwise the spool folder
+        if self.printer_name and shutil.which("lp"):
+            subprocess.run(["lp", "-d", self.printer_name, "-"], input=pdf_bytes,
+                           check=True, capture_output=True, timeout=30)
+            return f"✅ Receipt sent to CUPS printer: {self.printer_name}"
+        spooled = spool_bytes(pdf_bytes, filename, self.spool_dir)
+        return f"🗂️ No printer configured. Receipt spooled: {spooled}"
+
+
+# ============================================================
+# 🔹 ESC/POS RENDERER
+# ============================================================
+ESC_INIT = b"\x1b@"                  # ESC @   reset printer
+ALIGN_LEFT = b"\x1ba\x00"            # ESC a 0
+ALIGN_CENTER = b"\x1ba\x01"          # ESC a 1
+FONT_A = b"\x1bM\x00"                # 12x24, 32 cols on 58mm / 48 on 80mm
+FONT_B = b"\x1bM\x01"                # 9x17, 42 cols on 58mm
+FEED_AND_CUT = b"\n" * 4 + b"\x1dVB\x03"   # GS V 66 3 → feed, partial cut
+CODE_PAGES = {                       # ESC t n: character table matching the text encoding
+    "cp437": b"\x1bt\x00",
+    "cp850": b"\x1bt\x02",
+    "cp858": b"\x1bt\x13",
+}
+
+# printer columns and font per paper width
+ESCPOS_PROFILES = {
+    "58mm": (42, FONT_B),
+    "80mm": (48, FONT_A),
+}
+
+
+class EscPosRenderer:
+    """Turns tagged receipt lines ("<C>" = centered) into ESC/POS bytes."""
+
+    def __init__(self, columns=42, font=FONT_B, encoding="cp437"):
+        self.columns = columns
+        self.font = font
+        self.encoding = encoding
+        self.prelude = ESC_INIT + CODE_PAGES[encoding] + font   # starts every job
+        self._cache = {}
+
+    def _encode(self, text):
+        return text.replace("₱", "P").encode(self.encoding, errors="replace")
+
+    def render(self, lines, text_width=None):
+        """lines → bytes. text_width is the receipt's block width (template.char_width)."""
+        text_width = min(text_width or self.columns, self.columns)
+        pad = " " * ((self.columns - text_width) // 2)   # center the text block
+
+        out = [self.prelude]
+        aligned_center = False
+        for line in lines:
+            centered = line.startswith("<C>")
+            if centered != aligned_center:
+                out.append(ALIGN_CENTER if centered else ALIGN_LEFT)
+                aligned_center = centered
+            text = line[3:].strip() if centered else pad + line.rstrip()
+            out.append(self._encode(text[:self.columns]) + b"\n")
+        if aligned_center:
+            out.append(ALIGN_LEFT)
+        out.append(FEED_AND_CUT)
+        return b"".join(out)
+
+    def render_cached_header(self, template):
+        """The template's fixed header in ESC/POS, encoded once per template."""
+        key = id(template)
+        if key not in self._cache:
+            self._cache[key] = self.render(template.header, template.char_width)[:-len(FEED_AND_CUT)]
+        return self._cache[key]
+
+
+# ============================================================
+# 🔹 SINKS (where the ESC/POS bytes go)
+# ============================================================
+class DeviceSink:
+    """Character device such as /dev/usb/lp0 or a COM/LPT port."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, data, name):
+        with open(self.path, "wb", buffering=0) as dev:
+            dev.write(data)
+        return f"✅ Receipt printed on {self.path}"
+
+
+class TcpSink:
+    """Network thermal printer speaking raw TCP (JetDirect, port 9100)."""
+
+    def __init__(self, host, port=9100, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def write(self, data, name):
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.sendall(data)
+        return f"✅ Receipt printed on {self.host}:{self.port}"
+
+
+class FileSink:
+    """Folder of .bin jobs (testing, or a spooler that forwards them)."""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def write(self, data, name):
+        return f"🗂️ ESC/POS receipt spooled: {spool_bytes(data, f'{name}.bin', self.folder)}"
+
+
+def sink_from_target(target, spool_dir):
+    """tcp://host:port | file:///folder | /dev/... path → sink (default: spool folder)."""
+    if not target:
+        return FileSink(spool_dir)
+    if target.startswith("tcp://"):
+        host, _, port = target[len("tcp://"):].partition(":")
+        return TcpSink(host, int(port or 9100))
+    if target.startswith("file://"):
+        return FileSink(target[len("file://"):])
+    return DeviceSink(target)
+
+
+class EscPosBackend:
+    """Raw ESC/POS output: milliseconds per receipt, no PDF and no OS driver."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self._renderers = {}   # one per paper width, each caching its encoded header
+
+    def renderer_for(self, template):
+        renderer = self._renderers.get(template.paper)
+        if renderer is None:
+            columns, font = ESCPOS_PROFILES.get(template.paper, ESCPOS_PROFILES["58mm"])
+            renderer = self._renderers[template.paper] = EscPosRenderer(columns, font)
+        return renderer
+
+    def print_receipt(self, template, body, closing, name):
+        renderer = self.renderer_for(template)
+        header = renderer.render_cached_header(template)
+        rest = renderer.render(list(body) + list(closing), template.char_width)[len(renderer.prelude):]
+        return self.sink.write(header + rest, name)
+
+
+# ============================================================
+# 🔹 CONFIGURATION
+# ============================================================
+def backend_from_env(root_dir, spool_dir):
+    kind = os.environ.get("PALUTO_PRINTER_BACKEND", "pdf").lower()
+    if kind == "escpos":
+        return EscPosBackend(sink_from_target(os.environ.get("PALUTO_ESCPOS_TARGET"), spool_dir))
+    return PdfBackend(root_dir, spool_dir)
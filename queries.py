@@ -0,0 +1,62 @@
+# ============================================================
+# PALUTO POS — SQL OF THE HOT ROUTES
+# ============================================================
+# The statements app.py runs on every tap, poll and payment. They live
+# here so the query-plan check (migrations.hot_queries, tests/
+# test_query_plans.py) explains exactly what the routes execute instead
+# of a copy that can drift.
+# ============================================================
+
+OPEN_ORDER_STATUSES = "('ACTIVE', 'READY', 'SERVED')"
+
+# /get_receipt: every line still on the order
+RECEIPT_LINES_SQL = """
+    SELECT s.* FROM sales s
+    WHERE s.transaction_id = ? AND s.status IN ('PENDING', 'ACTIVE', 'READY', 'SERVED')
+"""
+
+# print_receipt: every line of the transaction
+PRINT_LINES_SQL = """
+    SELECT s.product_id, s.quantity, s.weight_in_kg, s.subtotal, s.discount, s.total
+    FROM sales s
+    WHERE s.transaction_id = ?
+"""
+
+# /payment/<txn_id>: open lines and the payments so far
+PAYMENT_LINES_SQL = f"""
+    SELECT
+        s.id AS sale_id,
+        s.transaction_id,
+        s.table_id,
+        s.product_id,
+        s.quantity,
+        s.weight_in_kg,
+        s.subtotal,
+        s.discount,
+        s.total,
+        s.order_mode,
+        s.discount_type
+    FROM sales s
+    WHERE s.transaction_id = ? AND s.status IN {OPEN_ORDER_STATUSES}
+"""
+PAYMENTS_SQL = "SELECT * FROM payments WHERE transaction_id = ?"
+
+# kitchen board: one ticket per transaction; {where} filters the sales lines
+KITCHEN_ORDERS_SQL = """
+    SELECT transaction_id, MIN(table_id) AS table_id,
+           CASE WHEN SUM(status = 'ACTIVE') > 0 THEN 'ACTIVE' ELSE 'READY' END AS status,
+           json_group_array(item) AS items
+    FROM (
+        SELECT s.transaction_id, s.table_id, s.status, s.datetime,
+               COALESCE(p.kitchen_name, p.luto) AS item
+        FROM sales s JOIN products p ON s.product_id = p.id
+        WHERE {where}
+        ORDER BY s.datetime, s.id
+    )
+    GROUP BY transaction_id
+    ORDER BY MIN(datetime), transaction_id
+"""
+KITCHEN_TICKET_SQL = """
+    SELECT 1 FROM sales WHERE transaction_id = ? AND status IN ('ACTIVE', 'READY') LIMIT 1
+"""
+UPDATE_ORDER_STATUS_SQL = "UPDATE sales SET status = ? WHERE transaction_id = ?"
@@ -0,0 +1,242 @@
+# ============================================================
+# PALUTO POS — RECEIPT TEMPLATES (58mm / 80mm)
+# ============================================================
+# A ReceiptTemplate is built once per paper size and reused for every
+# receipt. It precomputes everything that never changes:
+#   * page width, font metrics and line height
+#   * column widths for the item table and the label/amount rows
+#   * the PALUTO header block, already wrapped and positioned
+#
+# Receipts are described as a list of text lines (same format the printer
+# backends use): a "<C>" prefix centers the line, every other line is
+# left-aligned inside a text block that is centered on the paper.
+# layout() wraps each line exactly once, and render_pdf() draws onto an
+# in-memory BytesIO and returns the PDF bytes — nothing touches the disk.
+# ============================================================
+
+import io, os, textwrap
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from reportlab.lib.units import mm
+
+from money import to_pesos, vat_breakdown
+
+CENTER = "<C>"
+RECEIPT_PAPER = os.environ.get("PALUTO_RECEIPT_PAPER", "58mm")
+
+HEADER_LINES = [
+    "<C>PALUTO SEAFOOD GRILL",
+    "<C>& RESTAURANT",
+    "<C>- Passi Branch -",
+    "<C>PIGGLY FOODS CORP.",
+    "<C>TIN #: 010-748-236-00004",
+    "<C>Sablogon, Passi City,",
+    "<C>Iloilo",
+    "",
+]
+
+CLOSING_LINES = [
+    "<C>THIS SERVES AS TEMPORARY",
+    "<C>INVOICE",
+]
+
+
+class ReceiptTemplate:
+    """Fixed layout for one paper width; build once, render many receipts."""
+
+    def __init__(self, paper, width_mm, char_width, qty_width=5, amount_width=10,
+                 font_name="Courier", font_size=7.0, margin_mm=10.5, extra_lines=12,
+                 title="TEMPORARY INVOICE", item_columns=True):
+        self.paper = paper
+        self.width_mm = width_mm
+        self.char_width = char_width
+        self.font_name = font_name
+        self.font_size = font_size
+        self.margin_pt = margin_mm * mm
+        self.extra_lines = extra_lines
+
+        self.width_pt = width_mm * mm
+        self.line_height = font_size * 1.22
+        self.char_advance = stringWidth("M", font_name, font_size)  # monospaced
+        self.block_x = (self.width_pt - char_width * self.char_advance) / 2
+
+        # Column layout: QTY | DESC | AMT   and   LABEL | VALUE
+        self.qty_width = qty_width
+        self.amount_width = amount_width
+        self.desc_width = char_width - qty_width - amount_width
+        self.value_width = amount_width + 1
+        self.label_width = char_width - self.value_width
+        self.rule = "-" * char_width
+
+        self.header = HEADER_LINES + [CENTER + title, self.rule]
+        if item_columns:
+            self.header += [f"{'QTY':<{qty_width}}{'DESC':<{self.desc_width}}{'AMT':>{amount_width}}", self.rule]
+        self._header_layout = self.layout(self.header)
+
+    # ------------------------------------------------------------
+    # Line builders
+    # ------------------------------------------------------------
+    def item_lines(self, qty, name, amount):
+        """One item row; long names continue on the following rows."""
+        wrapped = textwrap.wrap(name, self.desc_width) or [""]
+        rows = [f"{qty:<{self.qty_width}}{wrapped[0]:<{self.desc_width}}{format(amount, '.2f'):>{self.amount_width}}"]
+        rows += [f"{'':<{self.qty_width}}{w}" for w in wrapped[1:]]
+        return rows
+
+    def amount_line(self, label, amount):
+        value = amount if isinstance(amount, str) else format(amount, ".2f")
+        return f"{label:<{self.label_width}}{value:>{self.value_width}}"
+
+    # ------------------------------------------------------------
+    # Layout + rendering
+    # ------------------------------------------------------------
+    def layout(self, lines):
+        """Wraps and positions every line once → list of (x, text)."""
+        placed = []
+        width = self.char_width
+        for line in lines:
+            centered = line.startswith(CENTER)
+            text = line[len(CENTER):].strip() if centered else line.rstrip()
+            parts = [text] if len(text) <= width else textwrap.wrap(text, width)
+            for part in parts:
+                if centered:
+                    placed.append(((self.width_pt - len(part) * self.char_advance) / 2, part))
+                else:
+                    placed.append((self.block_x, part))
+        return placed
+
+    def render_pdf(self, body_lines, closing_lines=()):
+        """Header + body (+ closing block) → PDF bytes."""
+        placed = self._header_layout + self.layout(body_lines) + self.layout(closing_lines)
+        height_pt = self.margin_pt * 2 + (len(placed) + self.extra_lines) * self.line_height
+
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=(self.width_pt, height_pt))
+        c.setFont(self.font_name, self.font_size)
+        y = height_pt - self.margin_pt
+        for x, text in placed:
+            if text:
+                c.drawString(x, y, text)
+            y -= self.line_height
+        c.showPage()
+        c.save()
+        return buffer.getvalue()
+
+
+TEMPLATES = {
+    "58mm": ReceiptTemplate("58mm", width_mm=75, char_width=38),   # near full printable width for 58mm roll
+    "80mm": ReceiptTemplate("80mm", width_mm=80, char_width=48, amount_width=12),
+}
+
+
+Z_TEMPLATES = {
+    "58mm": ReceiptTemplate("58mm", width_mm=75, char_width=38, title="Z-READING", item_columns=False),
+    "80mm": ReceiptTemplate("80mm", width_mm=80, char_width=48, amount_width=12, title="Z-READING",
+                            item_columns=False),
+}
+
+
+def get_template(paper=None):
+    return TEMPLATES.get(paper or RECEIPT_PAPER, TEMPLATES["58mm"])
+
+
+def get_z_template(paper=None):
+    return Z_TEMPLATES.get(paper or RECEIPT_PAPER, Z_TEMPLATES["58mm"])
+
+
+# ============================================================
+# 🔹 TEMPORARY INVOICE
+# ============================================================
+def invoice_body(template, items, totals, table_id=None, cashier=None):
+    """Item rows and totals for the TEMPORARY INVOICE (header/closing come from the template)."""
+    total = totals["total"]
+    paid = totals["paid"]
+    change = to_pesos(max(totals["paid_centavos"] - totals["total_centavos"], 0))
+    vatable, vat_amt = map(to_pesos, vat_breakdown(totals["total_centavos"]))
+    rule = template.rule
+
+    lines = []
+    for r in items:
+        name = " ".join(filter(None, [r["variety_1"], r["variety_2"], r["luto"]]))
+        qty = f"{int(r['quantity'])}" if (r["uom"] or "").upper() == "SERVE" else f"{r['weight_in_kg']*1000:.0f}g"
+        lines += template.item_lines(qty, name, r["subtotal"])
+
+    lines += [
+        rule,
+        template.amount_line("TOTAL:", total),
+        rule,
+        template.amount_line("TOTAL:", total),
+        template.amount_line("AMT. TENDERED:", paid),
+        template.amount_line("CHANGE:", change),
+        rule,
+        "CUSTOMER:",
+        "ADDRESS:",
+        "TIN:",
+        "B. STYLE:",
+        rule,
+        template.amount_line("VATABLE SALES:", vatable),
+        template.amount_line("VAT AMOUNT:", vat_amt),
+        template.amount_line("VAT EXEMPT SALES:", "0.00"),
+        rule,
+        template.amount_line("NO. OF ITEM(S):", str(totals["item_count"])),
+        f"TABLE #: {table_id or ''}",
+        f"CASHIER: {cashier or ''}",
+        rule,
+        "",
+    ]
+    return lines
+
+
+def invoice_closing(now):
+    return CLOSING_LINES + [f"<C>{now}", ""]
+
+
+# ============================================================
+# 🔹 Z-READING (END OF DAY)
+# ============================================================
+def z_report_body(template, report):
+    """Totals, discounts, payments and the per-cashier cash count of a Z-report (see zreport.py)."""
+    rule = template.rule
+
+    def amount(value):
+        return "-" if value is None else format(value, ".2f")
+
+    lines = [
+        f"DATE: {report['day']}",
+        "STATUS: " + (f"CLOSED {report.get('closed_at', '')}" if report["closed"] else "OPEN (X-READING)"),
+        rule,
+        template.amount_line("TRANSACTIONS:", str(report["transactions"])),
+        template.amount_line("GROSS SALES:", report["gross_sales"]),
+        template.amount_line("LESS DISCOUNTS:", report["discount"]),
+        template.amount_line("NET SALES:", report["net_sales"]),
+        template.amount_line("VATABLE SALES:", report["vatable_sales"]),
+        template.amount_line("VAT AMOUNT:", report["vat_amount"]),
+        rule,
+        "DISCOUNTS",
+    ]
+    lines += [template.amount_line(f"  {d['discount_type'].upper()} ({d['transactions']})", d["amount"])
+              for d in report["discounts"]] or ["  none"]
+    lines += [rule, "PAYMENTS"]
+    lines += [template.amount_line(f"  {p['method']} ({p['count']})", p["amount"])
+              for p in report["payments"]] or ["  none"]
+    for c in report["cashiers"]:
+        lines += [
+            rule,
+            f"CASHIER: {c['cashier']}",
+            template.amount_line("  NET SALES:", c["net_sales"]),
+            template.amount_line("  OPENING CASH:", c["opening_cash"]),
+            template.amount_line("  CASH PAYMENTS:", c["cash_payments"]),
+            template.amount_line("  EXPECTED CASH:", c["expected_cash"]),
+            template.amount_line("  COUNTED CASH:", amount(c["counted_cash"])),
+            template.amount_line("  OVER/(SHORT):", amount(c["over_short"])),
+        ]
+    lines += [
+        rule,
+        template.amount_line("EXPECTED CASH:", report["expected_cash"]),
+        template.amount_line("COUNTED CASH:", amount(report["counted_cash"])),
+        template.amount_line("OVER/(SHORT):", amount(report["over_short"])),
+        rule,
+        "",
+    ]
+    return lines
@@ -0,0 +1,115 @@
+# ============================================================
+# PALUTO POS — SERVING MODES (production WSGI / dev server)
+# ============================================================
+# `python app.py` (and paluto_pos.exe) used to start Flask's development
+# server with debug=True. It now serves with a multi-threaded production
+# WSGI server by default and keeps the debug server as an opt-in:
+#
+#   python app.py                         → production (waitress, or cheroot)
+#   python app.py --threads 16 --port 8080
+#   python app.py --dev                   → Flask dev server, debug + reloader
+#
+# Every flag can also come from the environment, which is the easy way to
+# configure the frozen .exe (e.g. a shortcut or a .bat file):
+#   PALUTO_SERVER=prod|dev  PALUTO_HOST  PALUTO_PORT  PALUTO_THREADS
+#   PALUTO_TIMEOUT  PALUTO_CONNECTION_LIMIT
+#
+# Each open kitchen/view screen holds one worker thread for its event
+# stream, so --threads must cover the screens plus the cashiers. waitress
+# sends every event as soon as it is yielded (send_bytes defaults to 1)
+# and its channel_timeout only closes connections with no request in
+# flight, so an open stream is never cut; the 15 s keepalive keeps
+# proxies and browsers from giving up on it.
+#
+# Without waitress or cheroot installed, production mode falls back to
+# Flask's threaded server (no debug) with a warning.
+# ============================================================
+
+import argparse, os, sys
+
+DEFAULT_THREADS = 16
+DEFAULT_TIMEOUT = 60          # seconds an idle keep-alive / stalled connection is kept
+DEFAULT_CONNECTION_LIMIT = 100
+
+
+def _env(name, default, cast=str):
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"⚠️ Ignoring invalid {name}={value!r}")
+        return default
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Paluto POS server")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--dev", dest="mode", action="store_const", const="dev",
+                      help="Flask development server with debug and auto-reload")
+    mode.add_argument("--prod", dest="mode", action="store_const", const="prod",
+                      help="multi-threaded production WSGI server (default)")
+    parser.add_argument("--host", default=_env("PALUTO_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=_env("PALUTO_PORT", 5000, int))
+    parser.add_argument("--threads", type=int, default=_env("PALUTO_THREADS", DEFAULT_THREADS, int),
+                        help="worker threads (cashiers + kitchen screens)")
+    parser.add_argument("--timeout", type=int, default=_env("PALUTO_TIMEOUT", DEFAULT_TIMEOUT, int),
+                        help="seconds before an idle keep-alive or stalled connection is closed")
+    parser.add_argument("--connection-limit", type=int,
+                        default=_env("PALUTO_CONNECTION_LIMIT", DEFAULT_CONNECTION_LIMIT, int))
+    parser.add_argument("--backend", choices=("auto", "waitress", "cheroot"), default="auto")
+    args = parser.parse_args(argv)
+    args.mode = args.mode or _env("PALUTO_SERVER", "prod").lower()
+    return args
+
+
+def serve_waitress(app, args):
+    from waitress import serve
+    serve(app, host=args.host, port=args.port, threads=args.threads,
+          channel_timeout=args.timeout, connection_limit=args.connection_limit,
+          ident="PALUTO POS")
+
+
+def serve_cheroot(app, args):
+    from cheroot.wsgi import Server
+    server = Server((args.host, args.port), app, numthreads=args.threads,
+                    timeout=args.timeout, accepted_queue_size=args.connection_limit,
+                    server_name="PALUTO POS")
+    try:
+        server.start()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+BACKENDS = [("waitress", serve_waitress), ("cheroot", serve_cheroot)]
+
+
+def run(app, argv=None):
+    """Serves app in the mode chosen on the command line / environment; blocks."""
+    args = parse_args(argv)
+    if args.mode == "dev":
+        print(f"🛠️ Development server on http://{args.host}:{args.port} (debug)")
+        frozen = getattr(sys, "frozen", False)
+        app.run(host=args.host, port=args.port, debug=True, use_reloader=not frozen, threaded=True)
+        return
+
+    for name, serve in BACKENDS:
+        if args.backend not in ("auto", name):
+            continue
+        try:
+            __import__(name)
+        except ImportError:
+            continue
+        print(f"✅ PALUTO POS on http://{args.host}:{args.port} "
+              f"({name}, {args.threads} threads, {args.timeout}s timeout)")
+        serve(app, args)
+        return
+
+    if args.backend != "auto":
+        print(f"❌ {args.backend} is not installed (pip install {args.backend}).")
+        sys.exit(1)
+    print("⚠️ No production WSGI server installed (pip install waitress); "
+          "falling back to Flask's threaded server, which is not meant for production.")
+    print(f"✅ PALUTO POS on http://{args.host}:{args.port} (flask)")
+    app.run(host=args.host, port=args.port, debug=False, use_reloader=False, threaded=True)
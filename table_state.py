@@ -0,0 +1,42 @@
+# ============================================================
+# PALUTO POS — FLOOR MAP (TABLE STATE)
+# ============================================================
+# table_state (migration 10) has one row per occupied table: its open
+# transaction, order mode and number of open lines. Triggers on sales keep
+# it current whenever a line opens, changes status or is removed, and bump
+# table_state_version, so:
+#
+#   /tables      → one read of ≤57 rows instead of matching every table
+#                  against every open sales line
+#   /api/tables  → ETag from the version; an unchanged floor is a 304
+#                  after a single primary-key read
+# ============================================================
+
+TABLE_IDS = list(range(1, 51)) + list(range(101, 108))   # tables 1–50, kubo huts 101–107
+
+
+def table_state_version(cur):
+    cur.execute("SELECT version FROM table_state_version WHERE id = 1")
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def table_state_etag(version):
+    return f'"tables-{version}"'
+
+
+def load_tables(cur):
+    """Every table on the floor with its status, in display order."""
+    cur.execute("SELECT table_id, transaction_id, order_mode FROM table_state")
+    occupied = {row["table_id"]: row for row in cur.fetchall()}
+
+    tables = []
+    for table_id in TABLE_IDS:
+        match = occupied.get(table_id)
+        tables.append({
+            "table_id": table_id,
+            "status": "ACTIVE" if match else "AVAILABLE",
+            "transaction_id": match["transaction_id"] if match else None,
+            "order_mode": match["order_mode"] if match else None,
+        })
+    return tables
@@ -0,0 +1,31 @@
+import os, sys
+
+# the app modules live at the repository root, next to paluto.db
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3
+
+import pytest
+
+from db import ConnectionPool
+from migrations import migrate
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """A pool over an empty database at the current schema, configured as the app's."""
+    conn = sqlite3.connect(tmp_path / "pos.db")
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+    pool = ConnectionPool(str(tmp_path / "pos.db"))
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture
+def db(pool):
+    conn = pool.connect()
+    yield conn
+    conn.close()
@@ -0,0 +1,158 @@
+import csv
+import io
+import sqlite3
+
+import pytest
+
+from analytics import backfill
+from archive import MAX_ATTACHED, archive_closed, archive_months, attach_history, detach_history, history_ranges
+from exports import export_stream, release_export
+from totals import get_totals
+from zreport import z_report
+
+# one paid transaction mid-month for 13 months (more than MAX_ATTACHED archive files)
+MONTHS = [f"2024-{m:02d}" for m in range(1, 13)] + ["2025-01"]
+
+
+def add_paid(db, txn_id, lines, cashier="Ana", method="CASH", discount=0.0):
+    """lines: [(local datetime or None for now, product_id, subtotal)]; paid in full at the last line."""
+    for local, product_id, subtotal in lines:
+        db.execute("""
+            INSERT INTO sales (transaction_id, table_id, product_id, quantity, weight_in_kg, subtotal, discount,
+                               total, datetime, status, cashier, discount_type)
+            VALUES (?, 5, ?, 1, 0, ?, ?, ?, COALESCE(datetime(?, 'utc'), datetime('now')), 'PAID', ?, ?)
+        """, (txn_id, product_id, subtotal, discount, subtotal - discount, local, cashier,
+              "senior" if discount else None))
+    paid = sum(subtotal for _, _, subtotal in lines) - discount * len(lines)
+    db.execute("""
+        INSERT INTO payments (transaction_id, amount, method, timestamp)
+        VALUES (?, ?, ?, COALESCE(datetime(?, 'utc'), datetime('now')))
+    """, (txn_id, paid, method, lines[-1][0]))
+
+
+@pytest.fixture
+def history(db):
+    db.executemany("INSERT INTO products (id, type, variety_1, luto, uom, price) VALUES (?, ?, ?, ?, ?, ?)",
+                   [(1, "FISH", "BANGUS", "INIHAW", "SERVE", 250), (2, "CRAB", "ALIMANGO", "STEAM", "KG", 900)])
+    for n, month in enumerate(MONTHS):
+        add_paid(db, f"M{n:02d}", [(f"{month}-15 12:00:00", 1, 250.0), (f"{month}-15 12:05:00", 2, 450.5)],
+                 cashier="Ana" if n % 2 else "Ben", method="CASH" if n % 3 else "GCASH", discount=10.0 * (n % 2))
+    # runs past midnight: filed under 2024-10, the first month of the newer export sub-range
+    add_paid(db, "NIGHT", [("2024-09-30 23:30:00", 1, 250.0), ("2024-10-01 00:30:00", 2, 300.0)])
+    add_paid(db, "TODAY", [(None, 1, 250.0)])   # stays live
+    db.commit()
+    backfill(db)
+    return db
+
+
+def export_rows(conn, archive_dir, **filters):
+    body = b"".join(export_stream(conn, "csv", archive_dir=archive_dir, **filters))
+    detach_history(conn)
+    return list(csv.reader(io.StringIO(body.decode("utf-8"))))[1:]
+
+
+def attached(conn):
+    return [row[1] for row in conn.execute("PRAGMA database_list") if row[1].startswith("arc_")]
+
+
+def test_unfiltered_export_over_more_archive_months_than_can_be_attached(history, tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    before = export_rows(history, archive_dir)
+    moved = archive_closed(history, archive_dir, pause=0)
+
+    assert moved == len(MONTHS) + 1
+    assert len(archive_months(archive_dir)) == len(MONTHS) > MAX_ATTACHED
+    assert [row[0] for row in history.execute("SELECT DISTINCT transaction_id FROM sales")] == ["TODAY"]
+    assert len(history_ranges(archive_dir)) == 2
+
+    after = export_rows(history, archive_dir)
+    assert after == before
+    assert len(after) == 2 * len(MONTHS) + 3
+    assert [row[8] for row in after] == sorted((row[8] for row in after), reverse=True)
+    assert attached(history) == []
+
+
+def test_filtered_exports_match_before_and_after_archiving(history, tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    ranges = [dict(start="2024-09-30", end="2024-10-01"), dict(start="2024-03-01", end="2024-12-31"),
+              dict(end="2024-06-30", cashier="Ana"), dict(start="2024-01-01", table_id="5")]
+    before = [export_rows(history, archive_dir, **r) for r in ranges]
+    archive_closed(history, archive_dir, pause=0)
+    assert [export_rows(history, archive_dir, **r) for r in ranges] == before
+    assert [len(rows) for rows in before] == [2, 22, 6, 2 * len(MONTHS) + 3]
+
+
+def test_totals_and_z_reports_survive_the_move(history, tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    days = ["2024-01-15", "2024-06-15", "2024-10-01", "2025-01-15"]
+    reports = [z_report(history, day, archive_dir) for day in days]
+    totals = {txn: get_totals(history.cursor(), txn) for txn in ("M00", "M05", "NIGHT")}
+
+    archive_closed(history, archive_dir, pause=0)
+
+    for day, report in zip(days, reports):
+        again = z_report(history, day, archive_dir)
+        assert {**again, "generated_at": None} == {**report, "generated_at": None}
+        assert report["transactions"] == 1 and report["gross_sales"] > 0
+    assert {txn: get_totals(history.cursor(), txn) for txn in totals} == totals
+    assert totals["M05"]["remaining_centavos"] == 0
+
+
+def test_history_views_read_live_and_archived_rows(history, tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    live = history.execute("SELECT COUNT(*), SUM(subtotal) FROM sales").fetchone()
+    paid = history.execute("SELECT SUM(amount) FROM payments").fetchone()[0]
+    archive_closed(history, archive_dir, pause=0)
+
+    sales, payments = attach_history(history, archive_dir, "2024-04-01", "2024-12-31")
+    assert (sales, payments) == ("history_sales", "history_payments")
+    assert len(attached(history)) == 10   # April to December, plus January for orders past midnight
+    assert history.execute("SELECT COUNT(*) FROM history_sales WHERE transaction_id = 'NIGHT'").fetchone()[0] == 2
+    assert history.execute("SELECT COUNT(*) FROM history_sales WHERE transaction_id = 'TODAY'").fetchone()[0] == 1
+    detach_history(history)
+    assert attached(history) == []
+    with pytest.raises(sqlite3.OperationalError):
+        history.execute("SELECT 1 FROM history_sales")
+
+    with pytest.raises(ValueError):
+        attach_history(history, archive_dir)   # 13 months do not fit at once
+    detach_history(history)
+
+    # the sub-ranges tile the whole history: every row is read exactly once
+    rows = total = amount = 0
+    for start, end in history_ranges(archive_dir):
+        sales, payments = attach_history(history, archive_dir, start, end)
+        n, subtotal = history.execute(f"""
+            SELECT COUNT(*), SUM(subtotal) FROM {sales}
+            WHERE datetime >= datetime(COALESCE(?, '0001-01-01'), 'utc')
+              AND datetime < datetime(COALESCE(?, '9999-12-30'), '+1 day', 'utc')
+        """, (start, end)).fetchone()
+        amount += history.execute(f"""
+            SELECT SUM(amount) FROM {payments}
+            WHERE timestamp >= datetime(COALESCE(?, '0001-01-01'), 'utc')
+              AND timestamp < datetime(COALESCE(?, '9999-12-30'), '+1 day', 'utc')
+        """, (start, end)).fetchone()[0]
+        rows, total = rows + n, total + subtotal
+        detach_history(history)
+    assert (rows, total) == (live[0], pytest.approx(live[1]))
+    assert amount == pytest.approx(paid)
+    assert attached(history) == []
+
+
+def test_releasing_an_abandoned_export_detaches_before_the_pool_reuses_it(history, pool, tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    archive_closed(history, archive_dir, pause=0)
+    conn = pool.connect()
+    chunks = export_stream(conn, "csv", archive_dir=archive_dir, batch_size=1)
+    next(chunks)   # the newest sub-range is attached while its rows stream
+    assert len(attached(conn)) == len(MONTHS) - (MAX_ATTACHED - 1)
+    chunks.close()
+    release_export(conn)
+
+    again = pool.connect()
+    try:
+        assert again is conn
+        assert attached(again) == []
+        assert again.execute("SELECT COUNT(*) FROM sqlite_temp_master WHERE name LIKE 'history_%'").fetchone()[0] == 0
+    finally:
+        again.close()
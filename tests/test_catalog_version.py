@@ -0,0 +1,33 @@
+from catalog import catalog_version
+
+
+def add_product(conn, **columns):
+    columns = {"type": "FISH", "variety_1": "BANGUS", "luto": "INIHAW", "uom": "SERVE", "price": 100, **columns}
+    cur = conn.execute(f"INSERT INTO products ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                       tuple(columns.values()))
+    conn.commit()
+    return cur.lastrowid
+
+
+def test_each_product_write_bumps_the_version_once(db):
+    start = catalog_version(db)
+    pid = add_product(db, state_1="ALIVE")
+    assert catalog_version(db) == start + 1
+    assert db.execute("SELECT kitchen_name FROM products WHERE id = ?", (pid,)).fetchone()[0] == "A. BANGUS INIHAW"
+
+    db.execute("UPDATE products SET luto = 'SINIGANG' WHERE id = ?", (pid,))   # renames via the kitchen trigger
+    db.commit()
+    assert catalog_version(db) == start + 2
+    assert db.execute("SELECT kitchen_name FROM products WHERE id = ?", (pid,)).fetchone()[0] == "A. BANGUS SINIGANG"
+
+    db.execute("UPDATE products SET price = 120 WHERE id = ?", (pid,))
+    db.execute("DELETE FROM products WHERE id = ?", (pid,))
+    db.commit()
+    assert catalog_version(db) == start + 4
+
+
+def test_bulk_insert_bumps_once_per_row(db):
+    start = catalog_version(db)
+    for n in range(25):
+        add_product(db, variety_1=f"V{n}")
+    assert catalog_version(db) == start + 25
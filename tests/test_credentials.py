@@ -0,0 +1,26 @@
+import sqlite3
+
+from credentials import hash_password, hash_stored_passwords, verify_password
+from migrations import migrate
+
+
+def test_hashes_verify():
+    stored = hash_password("s3cret")
+    assert verify_password("s3cret", stored)
+    assert not verify_password("wrong", stored)
+
+
+def test_plaintext_is_never_accepted():
+    assert not verify_password("s3cret", "s3cret")
+    assert not verify_password("", "")
+
+
+def test_plaintext_rows_are_hashed_by_migration(tmp_path):
+    conn = sqlite3.connect(tmp_path / "users.db")
+    migrate(conn)
+    conn.execute("INSERT INTO user_credentials (username, password, role) VALUES ('typed', 'pw', 'cashier')")
+    conn.commit()
+    assert hash_stored_passwords(conn) == 1
+    stored = conn.execute("SELECT password FROM user_credentials WHERE username = 'typed'").fetchone()[0]
+    assert verify_password("pw", stored)
+    conn.close()
@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+from fake_printer import FakePrinter, preview
+from printers import (CODE_PAGES, ESC_INIT, ESCPOS_PROFILES, FEED_AND_CUT, EscPosBackend, TcpSink,
+                      sink_from_target)
+from receipts import get_template, invoice_body, invoice_closing
+
+ITEMS = [
+    {"variety_1": "LAPU-LAPU", "variety_2": None, "luto": "SWEET AND SOUR WITH EXTRA GINGER AND CHILI",
+     "uom": "KG", "quantity": 0, "weight_in_kg": 0.85, "subtotal": 1105.0},
+    {"variety_1": "GARLIC RICE", "variety_2": None, "luto": None,
+     "uom": "SERVE", "quantity": 3, "weight_in_kg": 0, "subtotal": 135.0},
+]
+TOTALS = {"total": 1240.0, "paid": 1500.0, "total_centavos": 124000, "paid_centavos": 150000, "item_count": 2}
+
+
+@pytest.fixture
+def printer():
+    printer = FakePrinter(port=0).start()
+    yield printer
+    printer.stop()
+
+
+def print_job(printer, paper, name="receipt_T1"):
+    template = get_template(paper)
+    backend = EscPosBackend(sink_from_target(f"tcp://{printer.host}:{printer.port}", None))
+    assert isinstance(backend.sink, TcpSink)
+    body = invoice_body(template, ITEMS, TOTALS, table_id=7, cashier="ANA")
+    sent = len(printer.jobs)
+    backend.print_receipt(template, body, invoice_closing("10/31/2025 08:15:00 PM"), name)
+    assert printer.wait_for_jobs(sent + 1)
+    return printer.jobs[sent]
+
+
+@pytest.mark.parametrize("paper", ["58mm", "80mm"])
+def test_job_is_initialised_and_cut(printer, paper):
+    job = print_job(printer, paper)
+    columns, font = ESCPOS_PROFILES[paper]
+    assert job.startswith(ESC_INIT + CODE_PAGES["cp437"] + font)
+    assert job.endswith(FEED_AND_CUT)
+    assert job.count(ESC_INIT) == 1
+    assert job.count(FEED_AND_CUT) == 1
+
+
+@pytest.mark.parametrize("paper", ["58mm", "80mm"])
+def test_lines_fit_the_paper(printer, paper):
+    text = preview(print_job(printer, paper))
+    columns, _ = ESCPOS_PROFILES[paper]
+    lines = text.split("\n")
+    assert max(len(line) for line in lines) <= columns
+    assert "PALUTO SEAFOOD GRILL" in lines
+    assert "THIS SERVES AS TEMPORARY" in lines
+    assert any(re.match(r"\s*850g\s+LAPU-LAPU", line) for line in lines)
+    assert any(line.rstrip().endswith("1240.00") and "TOTAL:" in line for line in lines)
+
+
+def test_text_is_encoded_for_the_selected_code_page(printer):
+    items = [dict(ITEMS[1], variety_1="PIÑA JUICE ₱")]
+    template = get_template("58mm")
+    backend = EscPosBackend(TcpSink(printer.host, printer.port))
+    backend.print_receipt(template, invoice_body(template, items, TOTALS), [], "receipt_T2")
+    assert printer.wait_for_jobs(1)
+    job = printer.jobs[-1]
+    assert "PIÑA JUICE P".encode("cp437") in job
+    assert "₱".encode("utf-8") not in job
+
+
+def test_cached_header_is_reused_across_jobs(printer):
+    first, second = print_job(printer, "58mm"), print_job(printer, "58mm", "receipt_T3")
+    header = preview(first).split("QTY")[0]
+    assert preview(second).startswith(header)
+    assert len(printer.jobs) == 2
@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+from metrics import Metrics, is_lock_error
+
+
+def test_only_busy_and_locked_errors_count_as_lock_errors(tmp_path):
+    path = tmp_path / "lock.db"
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("CREATE TABLE t (x)")
+    holder.execute("BEGIN IMMEDIATE")
+    waiter = sqlite3.connect(path, timeout=0, isolation_level=None)
+    with pytest.raises(sqlite3.OperationalError) as busy:
+        waiter.execute("BEGIN IMMEDIATE")
+    holder.rollback()
+    with pytest.raises(sqlite3.OperationalError) as missing:
+        waiter.execute("SELECT * FROM no_such_table")
+
+    metrics = Metrics(slow_query_ms=1000)
+    metrics.observe_sql("BEGIN IMMEDIATE", 0.0, busy.value)
+    metrics.observe_sql("SELECT * FROM no_such_table", 0.0, missing.value)
+    assert is_lock_error(busy.value) and not is_lock_error(missing.value)
+    assert metrics.locked_errors == 1
+    assert sum(metrics.sql_errors.values()) == 2
+
+
+def test_metrics_need_an_admin_session_or_the_token(monkeypatch):
+    import app as pos_app
+    client = pos_app.app.test_client()
+    monkeypatch.delenv("PALUTO_METRICS_TOKEN", raising=False)
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 403
+
+    monkeypatch.setenv("PALUTO_METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+    with client.session_transaction() as s:
+        s["role"] = "cashier"
+    assert client.get("/metrics").status_code == 403
+    with client.session_transaction() as s:
+        s["role"] = "admin"
+    response = client.get("/metrics")
+    assert response.status_code == 200 and b"paluto_request_seconds_bucket" in response.data
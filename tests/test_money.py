@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from money import allocate, line_amount, percent_of, senior_pwd_deduction, to_centavos, to_pesos, vat_breakdown
+from totals import get_totals
+
+
+def test_allocate_always_sums_to_the_total():
+    rng = random.Random(20)
+    for _ in range(500):
+        weights = [rng.randint(0, 50000) for _ in range(rng.randint(1, 12))]
+        total = rng.randint(0, 100000)
+        parts = allocate(total, weights)
+        assert sum(parts) == total
+        weight_sum = sum(weights) or len(weights)
+        for part, weight in zip(parts, weights if sum(weights) else [1] * len(weights)):
+            assert abs(part - total * weight / weight_sum) < 1
+
+
+def test_allocate_gives_leftover_centavos_to_the_largest_remainders():
+    assert allocate(1000, [1, 1, 1]) == [334, 333, 333]
+    assert allocate(100, [1, 2, 2]) == [20, 40, 40]
+    assert allocate(101, [10, 30, 60]) == [10, 30, 61]
+    assert allocate(5, [0, 0]) == [3, 2]
+    assert allocate(5, []) == []
+
+
+@pytest.mark.parametrize("gross, expected", [
+    (11200, (10000, 1200)),
+    (100, (89, 11)),       # 89.2857 rounds down
+    (1400, (1250, 150)),   # 1250.0 exactly
+    (14, (13, 1)),         # 12.5 rounds half up
+    (1, (1, 0)),
+    (0, (0, 0)),
+])
+def test_vat_breakdown_rounds_half_up_and_adds_back_to_gross(gross, expected):
+    assert vat_breakdown(gross) == expected
+    assert sum(vat_breakdown(gross)) == gross
+
+
+def test_senior_pwd_deduction_on_a_shared_bill():
+    # ₱1,120 for four diners, one senior: 20% of a quarter of ₱1,000 + a quarter of the ₱120 VAT
+    assert senior_pwd_deduction(112000, 4, 1) == 5000 + 3000
+    assert senior_pwd_deduction(112000, 1, 1) == 20000 + 12000
+    assert senior_pwd_deduction(112000, 3, 0) == 0
+    # ₱100 for three diners, one senior: 89 vatable, 11 VAT → 5.93 + 3.67, rounded per part
+    assert senior_pwd_deduction(10000, 3, 1) == 595 + 357
+
+
+@pytest.mark.parametrize("amount, centavos", [
+    ("1,234.50", 123450),
+    ("₱ 10", 1000),
+    (12.3, 1230),
+    (0.005, 1),
+    (1.005, 101),       # a float 1.005 * 100 would truncate to 100
+    (2.675, 268),
+    (-0.005, -1),       # half away from zero
+    (None, 0),
+    ("", 0),
+])
+def test_to_centavos_rounds_half_up(amount, centavos):
+    assert to_centavos(amount) == centavos
+
+
+@pytest.mark.parametrize("amount", ["abc", "1.2.3", "nan", "inf"])
+def test_to_centavos_rejects_non_amounts(amount):
+    with pytest.raises(ValueError):
+        to_centavos(amount)
+
+
+def test_line_amount_and_percent_round_once():
+    assert line_amount("99.99", 3) == 29997
+    assert line_amount(850, weight_kg=0.335) == 28475   # 284.75 exactly
+    assert line_amount(333.33, weight_kg=0.5) == 16667  # 166.665 → half up
+    assert percent_of(12345, "12.5") == 1543
+    assert to_pesos(123450) == 1234.5
+
+
+def test_balance_settles_to_exactly_zero(db):
+    subtotals, payments = [0.3, 33.33, 33.33, 33.34], [0.1, 0.2, 100.0]
+    assert 0.3 - (0.1 + 0.2) != 0   # the residue float math used to leave on the balance
+    db.executemany("INSERT INTO sales (transaction_id, product_id, quantity, subtotal, discount, total, status)"
+                   " VALUES ('T1', 1, 1, ?, 0, ?, 'ACTIVE')", [(s, s) for s in subtotals])
+    db.executemany("INSERT INTO payments (transaction_id, amount, method) VALUES ('T1', ?, 'CASH')",
+                   [(p,) for p in payments])
+    db.commit()
+    totals = get_totals(db.cursor(), "T1")
+    assert totals["remaining_centavos"] == 0
+    assert totals["remaining"] == 0
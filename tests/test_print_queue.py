@@ -0,0 +1,28 @@
+import threading
+import time
+
+import print_queue
+from print_queue import PrintQueue
+
+
+def test_jobs_enqueued_back_to_back_print_without_waiting_for_the_poll(pool, monkeypatch):
+    monkeypatch.setattr(print_queue, "POLL_SECONDS", 30)
+    printed = []
+    done = threading.Event()
+
+    def handler(job):
+        printed.append(job["transaction_id"])
+        if len(printed) == 20:
+            done.set()
+        return "ok"
+
+    jobs = PrintQueue(pool.connect, handler)
+    try:
+        for n in range(20):
+            jobs.enqueue(f"T{n:03d}")
+            time.sleep(0.005 * (n % 3))   # land some wakeups mid-scan
+        assert done.wait(10)
+    finally:
+        jobs.stop()
+    assert sorted(printed) == [f"T{n:03d}" for n in range(20)]
+    assert {job["status"] for n in range(20) for job in jobs.jobs_for(f"T{n:03d}")} == {"DONE"}
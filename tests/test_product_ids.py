@@ -0,0 +1,75 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import migrations
+from migrations import migrate, product_join_problems
+
+BASELINE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paluto.db")
+INTEGER_IDS = 16   # migration that retypes sales.product_id
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    """A copy of the shipped, never-migrated paluto.db (sales.product_id TEXT)."""
+    path = tmp_path / "baseline.db"
+    shutil.copyfile(BASELINE_DB, path)
+    conn = sqlite3.connect(path)
+    declared = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(sales)")}
+    if declared["product_id"] != "TEXT":
+        pytest.skip("paluto.db is already migrated")
+    yield conn
+    conn.close()
+
+
+def snapshot(conn):
+    return {
+        "sales": conn.execute("SELECT id, CAST(product_id AS INTEGER) FROM sales ORDER BY id").fetchall(),
+        "payments": conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0],
+        "products": conn.execute("SELECT COUNT(*) FROM products").fetchone()[0],
+    }
+
+
+def test_migrated_joins_are_integer_lookups(baseline):
+    unmigrated = product_join_problems(baseline, {"noop": ("SELECT 1", ())})
+    assert "sales.product_id" in unmigrated   # declared TEXT before migration 16
+    before = snapshot(baseline)
+    migrate(baseline)
+    assert product_join_problems(baseline) == {}
+    assert snapshot(baseline) == before
+    types = {t for (t,) in baseline.execute("SELECT DISTINCT typeof(product_id) FROM sales")}
+    assert types <= {"integer", "null"}
+
+
+def test_rebuild_keeps_indexes_triggers_and_ids(baseline):
+    migrate(baseline)
+    indexes = {name for (name,) in baseline.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'sales'")}
+    assert {"idx_sales_txn_status", "idx_sales_status_datetime", "idx_sales_table_status"} <= indexes
+    last_id = baseline.execute("SELECT MAX(id) FROM sales").fetchone()[0]
+    baseline.execute("""
+        INSERT INTO sales (transaction_id, table_id, product_id, quantity, subtotal, discount, total, status)
+        VALUES ('AFTER16', 3, 1, 1, 99.5, 0, 99.5, 'ACTIVE')
+    """)
+    new_id, = baseline.execute("SELECT id FROM sales WHERE transaction_id = 'AFTER16'").fetchone()
+    assert new_id > last_id
+    totals = baseline.execute(
+        "SELECT subtotal_centavos, item_count FROM transaction_totals WHERE transaction_id = 'AFTER16'").fetchone()
+    assert totals == (9950, 1)
+    assert baseline.execute("SELECT transaction_id FROM table_state WHERE table_id = 3").fetchone() == ("AFTER16",)
+
+
+def test_sku_product_ids_become_products_ids(baseline, monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:INTEGER_IDS - 1])
+    migrate(baseline)
+    pid = baseline.execute("SELECT id FROM products ORDER BY id LIMIT 1").fetchone()[0]
+    baseline.execute("UPDATE products SET sku = 'FSH-001' WHERE id = ?", (pid,))
+    baseline.execute("INSERT INTO sales (transaction_id, product_id, status) VALUES ('SKU1', ' FSH-001 ', 'PAID')")
+    baseline.commit()
+
+    monkeypatch.undo()
+    migrate(baseline)
+    assert baseline.execute("SELECT product_id FROM sales WHERE transaction_id = 'SKU1'").fetchone() == (pid,)
+    assert product_join_problems(baseline) == {}
@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+import app as pos_app
+import migrations
+import queries
+from migrations import hot_queries, migrate, product_join_problems, query_plan_scans
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "fresh.db")
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def test_hot_queries_never_scan_a_table(conn):
+    assert query_plan_scans(conn) == {}
+
+
+def test_product_joins_are_rowid_lookups(conn):
+    assert product_join_problems(conn) == {}
+
+
+def test_a_table_scan_is_reported(conn):
+    slow = {"by_luto": ("SELECT * FROM sales s WHERE s.datetime LIKE ?", ("2025%",))}
+    assert list(query_plan_scans(conn, slow)) == ["by_luto"]
+
+
+def test_cte_and_subquery_scans_are_not_reported(conn):
+    grouped = {"grouped": (
+        "WITH t AS (SELECT transaction_id FROM sales WHERE transaction_id = ?) "
+        "SELECT x.transaction_id FROM (SELECT transaction_id FROM t) x", ("T",))}
+    assert query_plan_scans(conn, grouped) == {}
+
+
+def test_routes_run_the_checked_sql():
+    """The plan check must explain what app.py executes, not a copy of it."""
+    for name in ("RECEIPT_LINES_SQL", "PRINT_LINES_SQL", "PAYMENT_LINES_SQL", "PAYMENTS_SQL",
+                 "KITCHEN_ORDERS_SQL", "KITCHEN_TICKET_SQL", "UPDATE_ORDER_STATUS_SQL"):
+        assert getattr(pos_app, name) is getattr(queries, name)
+    checked = {sql for sql, _ in hot_queries().values()}
+    assert queries.RECEIPT_LINES_SQL in checked
+    assert queries.KITCHEN_TICKET_SQL in checked
+
+
+def test_every_hot_query_runs(conn):
+    for name, (sql, params) in hot_queries().items():
+        conn.execute(sql, params).fetchall()
+    conn.rollback()
+    assert migrations.current_version(conn) == migrations.MIGRATIONS[-1][0]
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+from write_queue import AddItemWriter, WriteTicket, prune_idempotency_keys
+
+
+def tap(txn="T1", product=1, qty=1, key=None, price=100.0, uom="SERVE", grams=0.0):
+    return {"transaction_id": txn, "table_id": 7, "product_id": product, "uom": uom, "price": price,
+            "qty": qty, "grams": grams, "order_type": "regular", "idempotency_key": key}
+
+
+@pytest.fixture
+def writer(pool):
+    flushed = []
+    writer = AddItemWriter(pool.connect, on_flushed=flushed.extend)
+    writer.flushed = flushed
+
+    def flush(*mutations):
+        batch = [WriteTicket(m) for m in mutations]
+        writer.flush(batch)
+        return batch
+
+    writer.flush_taps = flush
+    return writer
+
+
+def lines(db, txn="T1"):
+    return db.execute("""
+        SELECT product_id, quantity, subtotal FROM sales WHERE transaction_id = ? ORDER BY product_id
+    """, (txn,)).fetchall()
+
+
+def outcome(ticket):
+    try:
+        return ticket.wait(0)
+    except Exception as e:
+        return e
+
+
+def test_taps_on_the_same_line_coalesce(writer, db):
+    batch = writer.flush_taps(tap(qty=1), tap(product=2), tap(qty=2))
+    assert [tuple(row) for row in lines(db)] == [(1, 3, 300.0), (2, 1, 100.0)]
+    assert [t.wait(0) for t in batch] == [1, 2, 3]
+    assert writer.flushed == [("T1", "new")]
+
+    writer.flush_taps(tap(qty=1))
+    assert [tuple(row) for row in lines(db)][0] == (1, 4, 400.0)
+    assert writer.flushed[-1] == ("T1", "items_added")
+
+
+def test_a_failing_line_rolls_back_alone(writer, db):
+    db.execute("""
+        CREATE TRIGGER reject_999 BEFORE INSERT ON sales WHEN NEW.product_id = 999
+        BEGIN SELECT RAISE(ABORT, 'no such product'); END
+    """)
+    batch = writer.flush_taps(tap(product=1), tap(product=999, key="bad"), tap(product=999), tap(product=2))
+    results = [outcome(t) for t in batch]
+    assert results[0] == 1 and results[3] == 2   # the failed line consumes no seq
+    assert all(isinstance(r, sqlite3.IntegrityError) for r in results[1:3])
+    assert [row["product_id"] for row in lines(db)] == [1, 2]
+    assert db.execute("SELECT COUNT(*) FROM add_item_requests").fetchone()[0] == 0
+
+
+def test_seqs_follow_batch_order_and_never_repeat(writer, db):
+    first = writer.flush_taps(tap("A", 1), tap("B", 1), tap("A", 2), tap("A", 1), tap("C", 3))
+    second = writer.flush_taps(tap("B", 2), tap("A", 1))
+    seqs = [t.wait(0) for t in first + second]
+    assert seqs == list(range(1, 8))
+    assert db.execute("SELECT seq FROM write_sequence WHERE id = 1").fetchone()[0] == 7
+
+
+def test_a_retried_key_replays_its_seq(writer, db):
+    seq = writer.flush_taps(tap(qty=2, key="k1"))[0].wait(0)
+    again = writer.flush_taps(tap(qty=2, key="k1"), tap(product=2))
+    assert [t.wait(0) for t in again] == [seq, seq + 1]
+    assert [tuple(row) for row in lines(db)] == [(1, 2, 200.0), (2, 1, 100.0)]
+    assert db.execute("SELECT seq FROM add_item_requests WHERE idempotency_key = 'k1'").fetchone()[0] == seq
+
+
+def test_a_key_twice_in_one_batch_is_written_once(writer, db):
+    batch = writer.flush_taps(tap(key="k1"), tap(product=2), tap(key="k1"))
+    assert [t.wait(0) for t in batch] == [1, 2, 1]
+    assert [tuple(row) for row in lines(db)] == [(1, 1, 100.0), (2, 1, 100.0)]
+    assert db.execute("SELECT COUNT(*) FROM add_item_requests").fetchone()[0] == 1
+
+
+def test_taps_without_a_key_store_nothing(writer, db):
+    writer.flush_taps(tap(), tap(product=2))
+    assert db.execute("SELECT COUNT(*) FROM add_item_requests").fetchone()[0] == 0
+
+
+def test_closed_days_keys_are_pruned(writer, db):
+    writer.flush_taps(tap(key="old"), tap(key="new", product=2))
+    db.execute("UPDATE add_item_requests SET created_at = datetime('now', '-3 days') WHERE idempotency_key = 'old'")
+    db.commit()
+    day = db.execute("SELECT date('now', '-2 days', 'localtime')").fetchone()[0]
+    assert prune_idempotency_keys(db, day) == 1
+    assert [row[0] for row in db.execute("SELECT idempotency_key FROM add_item_requests")] == ["new"]
@@ -0,0 +1,110 @@
+import pytest
+
+from analytics import backfill
+from zreport import DayClosed, close_day, compute_z_report, record_cash_count, z_report
+
+DAY = "2025-03-14"
+
+
+def add_paid(db, txn_id, cashier, lines, payments, day=DAY):
+    """lines: [(subtotal, discount, discount_type)], payments: [(method, amount)], local time on day."""
+    for n, (subtotal, discount, discount_type) in enumerate(lines):
+        db.execute("""
+            INSERT INTO sales (transaction_id, table_id, product_id, quantity, subtotal, discount, total,
+                               datetime, status, cashier, discount_type)
+            VALUES (?, 3, 1, 1, ?, ?, ?, datetime(?, 'utc'), 'PAID', ?, ?)
+        """, (txn_id, subtotal, discount, subtotal - discount, f"{day} 12:{n:02d}:00", cashier, discount_type))
+    db.executemany("""
+        INSERT INTO payments (transaction_id, amount, method, timestamp) VALUES (?, ?, ?, datetime(?, 'utc'))
+    """, [(txn_id, amount, method, f"{day} 13:00:00") for method, amount in payments])
+
+
+@pytest.fixture
+def day(db):
+    db.executemany("INSERT INTO user_credentials (username, password, name, role) VALUES (?, '', ?, 'cashier')",
+                   [("ana", "Ana"), ("ben", "Ben")])
+    db.executemany("""
+        INSERT INTO daily_opening_cash (username, opening_amount, date_opened, timestamp)
+        VALUES (?, ?, ?, datetime(?, 'utc'))
+    """, [("ana", 1000, DAY, f"{DAY} 08:00:00"), ("ben", 500, DAY, f"{DAY} 09:00:00"),
+          ("ben", 700, "2025-03-15", "2025-03-15 08:00:00")])
+    add_paid(db, "T1", "Ana", [(500, 0, None), (300, 0, None)], [("CASH", 800)])
+    add_paid(db, "T2", "Ana", [(1000, 200, "senior")], [("gcash", 800)])
+    add_paid(db, "T3", "Ben", [(250, 50, "pwd"), (250, 50, "pwd")], [("CASH", 300), ("CARD", 100)])
+    add_paid(db, "T4", "Ben", [(120, 0, None)], [("CASH", 120)])
+    add_paid(db, "NEXT", "Ben", [(999, 0, None)], [("CASH", 999)], day="2025-03-15")
+    db.execute("""
+        INSERT INTO sales (transaction_id, table_id, product_id, quantity, subtotal, discount, total, datetime,
+                           status, cashier)
+        VALUES ('OPEN', 4, 1, 1, 400, 0, 400, datetime(?, 'utc'), 'ACTIVE', 'Ana')
+    """, (f"{DAY} 20:00:00",))
+    db.commit()
+    backfill(db)
+    return db
+
+
+def by_cashier(report):
+    return {c["cashier"]: c for c in report["cashiers"]}
+
+
+def test_report_sums_sales_discounts_and_payments_of_the_day(day):
+    report = compute_z_report(day.cursor(), DAY)
+    assert report["transactions"] == 4
+    assert (report["gross_sales"], report["discount"], report["net_sales"]) == (2420, 300, 2120)
+    assert (report["vatable_sales"], report["vat_amount"]) == (1892.86, 227.14)
+    assert report["discounts"] == [
+        {"discount_type": "senior", "transactions": 1, "amount": 200},
+        {"discount_type": "pwd", "transactions": 1, "amount": 100},
+    ]
+    assert report["payments"] == [
+        {"method": "CASH", "count": 3, "amount": 1220},
+        {"method": "GCASH", "count": 1, "amount": 800},
+        {"method": "CARD", "count": 1, "amount": 100},
+    ]
+    ana, ben = by_cashier(report)["Ana"], by_cashier(report)["Ben"]
+    assert (ana["username"], ana["transactions"], ana["net_sales"]) == ("ana", 2, 1600)
+    assert (ana["opening_cash"], ana["cash_payments"], ana["other_payments"], ana["expected_cash"]) == (1000, 800, 800, 1800)
+    assert (ben["opening_cash"], ben["cash_payments"], ben["other_payments"], ben["expected_cash"]) == (500, 420, 100, 920)
+    assert ana["counted_cash"] is None and report["counted_cash"] is None and report["over_short"] is None
+    assert report["expected_cash"] == 2720
+
+
+def test_cash_counts_reconcile_against_expected_cash(day):
+    assert record_cash_count(day, DAY, "ana", {"d1000": 1, "d500": 1, "d100": 2}) == 170000
+    assert record_cash_count(day, DAY, "ana", {"d1000": 1, "d500": 1, "d100": 3}, counted_by="mgr") == 180000
+    assert record_cash_count(day, DAY, "ben", {"d500": 1, "d200": 2}) == 90000
+    with pytest.raises(ValueError):
+        record_cash_count(day, DAY, "ben", {"d20": -1})
+    with pytest.raises(ValueError):
+        record_cash_count(day, DAY, "", {"d20": 1})
+
+    report = z_report(day, DAY)
+    ana, ben = by_cashier(report)["Ana"], by_cashier(report)["Ben"]
+    assert (ana["expected_cash"], ana["counted_cash"], ana["over_short"]) == (1800, 1800, 0)
+    assert (ben["expected_cash"], ben["counted_cash"], ben["over_short"]) == (920, 900, -20)
+    assert (report["expected_cash"], report["counted_cash"], report["over_short"]) == (2720, 2700, -20)
+    assert day.execute("SELECT COUNT(*) FROM cash_counts").fetchone()[0] == 2
+
+
+def test_a_closed_day_is_frozen_and_cannot_close_twice(day):
+    record_cash_count(day, DAY, "ana", {"d1000": 1, "d500": 1, "d100": 3})
+    day.execute("INSERT INTO add_item_requests (idempotency_key, transaction_id, seq, created_at)"
+                " VALUES ('k1', 'T1', 1, datetime(?, 'utc'))", (f"{DAY} 12:00:00",))
+    day.commit()
+
+    closed = close_day(day, DAY, closed_by="mgr")
+    assert closed["closed"] and closed["closed_by"] == "mgr" and closed["net_sales"] == 2120
+    assert day.execute("SELECT COUNT(*) FROM add_item_requests").fetchone()[0] == 0
+
+    add_paid(day, "LATE", "Ana", [(50, 0, None)], [("CASH", 50)])
+    day.commit()
+    backfill(day)
+    assert z_report(day, DAY) == closed
+    assert compute_z_report(day.cursor(), DAY)["net_sales"] == 2170
+
+    with pytest.raises(DayClosed):
+        close_day(day, DAY, closed_by="mgr")
+    with pytest.raises(DayClosed):
+        record_cash_count(day, DAY, "ben", {"d500": 1})
+    assert day.execute("SELECT COUNT(*) FROM z_reports").fetchone()[0] == 1
+    assert not day.in_transaction
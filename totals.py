@@ -0,0 +1,38 @@
+# ============================================================
+# PALUTO POS — RUNNING TRANSACTION TOTALS
+# ============================================================
+# transaction_totals (migration 5, in integer centavos since migration 15)
+# holds subtotal, discount, paid and item count per transaction_id.
+# Triggers on sales and payments keep it current inside the same write
+# transaction as the change, so balance checks are a single primary-key
+# read instead of SUM() over sales and payments.
+# ============================================================
+
+from money import to_pesos
+
+TOTALS_SQL = """
+    SELECT subtotal_centavos, discount_centavos, paid_centavos, item_count
+    FROM transaction_totals WHERE transaction_id = ?
+"""
+
+
+def get_totals(cur, txn_id):
+    """Returns the running totals of a transaction (all zero if it has none yet).
+
+    Amounts are pesos; the "*_centavos" keys hold the exact integers to
+    compare and compute with.
+    """
+    cur.execute(TOTALS_SQL, (txn_id,))
+    row = cur.fetchone()
+    subtotal, discount, paid, item_count = (row[0], row[1], row[2], row[3]) if row else (0, 0, 0, 0)
+
+    cents = {
+        "subtotal_centavos": subtotal,
+        "discount_centavos": discount,
+        "total_centavos": subtotal - discount,
+        "paid_centavos": paid,
+        "remaining_centavos": subtotal - discount - paid,
+    }
+    totals = {key[:-len("_centavos")]: to_pesos(value) for key, value in cents.items()}
+    totals.update(cents, item_count=item_count)
+    return totals
@@ -0,0 +1,222 @@
+# ============================================================
+# PALUTO POS — TIME-ORDERED TRANSACTION IDS
+# ============================================================
+# start_order used to pick 8 random letters/digits: nothing stopped two
+# orders from getting the same one, and new ids landed all over the
+# index. Transaction ids are now ULID-style, 12 Crockford base32 chars:
+#
+#   1MM1DD822MKN
+#   └──────┘└──┘
+#   ms since 2025-01-01 UTC (8 chars, good until 2059) + 4 random chars
+#
+# They sort by creation time (ids made in the same millisecond count up),
+# and are still short enough to read off a receipt. Each id is reserved
+# in transaction_ids (migration 18, WITHOUT ROWID, primary key = id)
+# before it is handed out, so a duplicate is retried instead of merging
+# two orders. Because the key is time-ordered, new rows append at the end
+# of the B-tree and both lookups are a range scan on the primary key:
+#
+#   lookup_prefix(conn, "1MM1DD")            → ids starting with it
+#   lookup_range(conn, "2025-10-01", "2025-10-31")  → ids created those days
+#
+# Pre-existing 8-char ids are registered by the migration too, so they
+# resolve by prefix, but only the new ids carry a time. Totals come from
+# transaction_totals; for transactions archived without one they are
+# summed from the monthly archives (given archive_dir).
+# ============================================================
+
+import os, sqlite3, threading, time
+from datetime import date, datetime, timedelta
+
+from money import to_pesos
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"   # Crockford: no I, L, O, U; sorts like its values
+EPOCH_MS = 1735689600000                        # 2025-01-01T00:00:00Z
+TIME_CHARS, RANDOM_CHARS = 8, 4
+ID_LENGTH = TIME_CHARS + RANDOM_CHARS
+RESERVE_ATTEMPTS = 5
+LOOKUP_LIMIT = 50
+
+_READ_AS = str.maketrans({"I": "1", "L": "1", "O": "0"})   # what people mistype when reading a receipt
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def _decode(text):
+    value = 0
+    for ch in text:
+        value = value * 32 + ALPHABET.index(ch)
+    return value
+
+
+def normalize(text):
+    """Upper-cases a typed (partial) id and maps I/L → 1, O → 0."""
+    return str(text or "").strip().upper().translate(_READ_AS)
+
+
+def is_time_ordered(txn_id):
+    return len(txn_id) == ID_LENGTH and all(ch in ALPHABET for ch in txn_id)
+
+
+def id_time(txn_id):
+    """UTC datetime an id was made at (None for legacy ids)."""
+    if not is_time_ordered(txn_id):
+        return None
+    return datetime.utcfromtimestamp((EPOCH_MS + _decode(txn_id[:TIME_CHARS])) / 1000)
+
+
+def _time_prefix(ms):
+    return _encode(max(ms - EPOCH_MS, 0), TIME_CHARS)
+
+
+class IdGenerator:
+    """Monotonic id source: later calls never return a smaller id, even within one millisecond."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_random = 0
+
+    def next_id(self):
+        with self._lock:
+            ms = int(time.time() * 1000)
+            if ms <= self._last_ms:
+                ms = self._last_ms
+                self._last_random += 1
+                if self._last_random >= 32 ** RANDOM_CHARS:   # 1M ids in one ms: borrow the next one
+                    ms += 1
+                    self._last_random = int.from_bytes(os.urandom(4), "big") % (32 ** RANDOM_CHARS // 2)
+            else:
+                # random start in the lower half leaves room to count up within the millisecond
+                self._last_random = int.from_bytes(os.urandom(4), "big") % (32 ** RANDOM_CHARS // 2)
+            self._last_ms = ms
+            return _time_prefix(ms) + _encode(self._last_random, RANDOM_CHARS)
+
+
+generator = IdGenerator()
+
+
+# ============================================================
+# 🔹 RESERVING
+# ============================================================
+def reserve_transaction_id(conn, table_id=None, order_mode=None, cashier=None):
+    """Inserts a fresh id into transaction_ids and returns it; retries on a duplicate."""
+    for _ in range(RESERVE_ATTEMPTS):
+        txn_id = generator.next_id()
+        try:
+            conn.execute("""
+                INSERT INTO transaction_ids (id, table_id, order_mode, cashier) VALUES (?, ?, ?, ?)
+            """, (txn_id, table_id, order_mode, cashier))
+            conn.commit()
+            return txn_id
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            print(f"⚠️ Transaction id {txn_id} already taken, retrying")
+    raise RuntimeError(f"Could not reserve a unique transaction id after {RESERVE_ATTEMPTS} attempts")
+
+
+# ============================================================
+# 🔹 LOOKUPS (primary-key range scans)
+# ============================================================
+LOOKUP_SQL = """
+    SELECT t.id AS transaction_id, t.created_at, t.table_id, t.order_mode, t.cashier,
+           tt.subtotal_centavos - tt.discount_centavos AS total_centavos,
+           tt.paid_centavos, tt.item_count
+    FROM transaction_ids t LEFT JOIN transaction_totals tt ON tt.transaction_id = t.id
+    WHERE t.id >= ? AND t.id < ? {where}
+    ORDER BY t.id {order} LIMIT ?
+"""
+
+# totals of transactions archived before transaction_totals kept their rows
+ARCHIVED_TOTALS_SQL = """
+    SELECT s.transaction_id,
+           SUM({sub}) - SUM({disc}) AS total_centavos, COUNT(*) AS item_count,
+           (SELECT COALESCE(SUM({amount}), 0) FROM {payments} p WHERE p.transaction_id = s.transaction_id)
+               AS paid_centavos
+    FROM {sales} s WHERE s.transaction_id IN ({marks})
+    GROUP BY s.transaction_id
+"""
+
+
+def _centavos(column):
+    return f"CAST(ROUND(COALESCE({column}, 0) * 100) AS INTEGER)"
+
+
+def _next_prefix(prefix):
+    """Smallest string greater than every string starting with prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _archived_totals(conn, rows, archive_dir):
+    """Fills in rows with no transaction_totals row from the monthly archives (archive.py).
+
+    A row whose totals cannot be read (too many months to attach) keeps None
+    rather than a made-up 0.
+    """
+    from archive import attach_history, detach_history
+
+    missing = [row for row in rows if row["total_centavos"] is None]
+    if not missing:
+        return
+    days = [str(row["created_at"])[:10] for row in missing if row["created_at"]]
+    start, end = (min(days), max(days)) if len(days) == len(missing) else (None, None)
+    ids = [row["transaction_id"] for row in missing]
+    try:
+        sales, payments = attach_history(conn, archive_dir, start, end) if archive_dir else ("sales", "payments")
+        found = {r["transaction_id"]: r for r in conn.execute(ARCHIVED_TOTALS_SQL.format(
+            sub=_centavos("s.subtotal"), disc=_centavos("s.discount"), amount=_centavos("p.amount"),
+            sales=sales, payments=payments, marks=", ".join("?" * len(ids))), ids)}
+    except ValueError:
+        return
+    finally:
+        if archive_dir:
+            detach_history(conn)
+    for row in missing:
+        totals = found.get(row["transaction_id"])
+        if totals is not None:
+            row.update(total_centavos=totals["total_centavos"], paid_centavos=totals["paid_centavos"],
+                       item_count=totals["item_count"])
+        else:   # reserved but never ordered: nothing to total
+            row.update(total_centavos=0, paid_centavos=0, item_count=0)
+
+
+def _lookup(conn, low, high, limit, newest_first=False, where="", archive_dir=None):
+    rows = [dict(row) for row in conn.execute(
+        LOOKUP_SQL.format(order="DESC" if newest_first else "ASC", where=where),
+        (low, high, min(int(limit), LOOKUP_LIMIT))).fetchall()]
+    _archived_totals(conn, rows, archive_dir)
+    for row in rows:
+        row.update(total=None if row["total_centavos"] is None else to_pesos(row["total_centavos"]),
+                   paid=None if row["paid_centavos"] is None else to_pesos(row["paid_centavos"]))
+    return rows
+
+
+def lookup_prefix(conn, partial, limit=LOOKUP_LIMIT, archive_dir=None):
+    """Transactions whose id starts with partial (at least 2 chars; ValueError otherwise)."""
+    typed = str(partial or "").strip().upper()
+    if len(typed) < 2 or not typed.isalnum():
+        raise ValueError("Type at least 2 letters or digits of the transaction id.")
+    # legacy ids use the whole alphabet, so the text as typed is searched too
+    found = {}
+    for prefix in dict.fromkeys([normalize(typed), typed]):
+        for row in _lookup(conn, prefix, _next_prefix(prefix), limit, archive_dir=archive_dir):
+            found[row["transaction_id"]] = row
+    return [found[k] for k in sorted(found)][:limit]
+
+
+def lookup_range(conn, start, end, limit=LOOKUP_LIMIT, archive_dir=None):
+    """Time-ordered ids created from local day start through end (YYYY-MM-DD), newest first."""
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    if first > last:
+        raise ValueError("start must not be after end")
+    low_ms = int(datetime.combine(first, datetime.min.time()).timestamp() * 1000)
+    high_ms = int(datetime.combine(last + timedelta(days=1), datetime.min.time()).timestamp() * 1000)
+    return _lookup(conn, _time_prefix(low_ms), _time_prefix(high_ms), limit, newest_first=True,
+                   where=f"AND length(t.id) = {ID_LENGTH}",   # legacy 8-char ids carry no time
+                   archive_dir=archive_dir)
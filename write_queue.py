@@ -0,0 +1,260 @@
+# ============================================================
+# PALUTO POS — WRITE-BEHIND QUEUE FOR /add_item
+# ============================================================
+# Every tap on an item used to be its own SELECT + UPDATE/INSERT + commit
+# (one fsync per tap), with concurrent cashiers fighting for the lock.
+# Now /add_item only validates the tap and hands it to a single writer
+# thread:
+#
+#   tap → queue → (wait FLUSH_MS for more) → coalesce → one transaction
+#
+# Taps on the same (transaction_id, product_id) inside a flush are merged
+# into one line change. Each tap gets a sequence number from the
+# write_sequence table (migration 12), bumped in the same transaction, so
+# the number /add_item returns is only handed out once it is committed.
+#
+# A tap may carry a client-supplied idempotency key (migration 19): the
+# key and its seq are stored with the write, so a retried tap returns the
+# first seq instead of adding the item twice. Taps without a key skip the
+# lookup and store nothing. Closing a day (zreport.close_day) drops the
+# keys of that day and earlier.
+# ============================================================
+
+import collections, threading, time, traceback
+
+from money import line_amount, to_pesos
+from queries import KITCHEN_TICKET_SQL
+
+EXISTING_LINE_SQL = """
+    SELECT id, quantity, weight_in_kg
+    FROM sales
+    WHERE transaction_id = ? AND product_id = ? AND status = 'ACTIVE'
+"""
+
+FLUSH_MS = 5          # how long the writer waits for more taps before committing
+MAX_BATCH = 500       # taps per transaction at most
+
+
+def prune_idempotency_keys(conn, day):
+    """Deletes the add_item keys recorded up to the end of business day (local); returns how many."""
+    return conn.execute("""
+        DELETE FROM add_item_requests WHERE created_at < datetime(?, '+1 day', 'utc')
+    """, (day,)).rowcount
+
+
+class WriteTicket:
+    """Handle for one queued mutation; wait() returns its durable sequence number."""
+
+    __slots__ = ("mutation", "seq", "error", "_done")
+
+    def __init__(self, mutation):
+        self.mutation = mutation
+        self.seq = None
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("write not committed in time")
+        if self.error is not None:
+            raise self.error
+        return self.seq
+
+    def _finish(self, seq=None, error=None):
+        self.seq, self.error = seq, error
+        self._done.set()
+
+
+class AddItemWriter:
+    """Single writer thread that applies coalesced add_item taps in batches."""
+
+    def __init__(self, get_db, on_flushed=None, flush_ms=FLUSH_MS, max_batch=MAX_BATCH):
+        self.get_db = get_db            # callable → pooled sqlite3 connection
+        self.on_flushed = on_flushed    # callable([(txn_id, kind)]) after each commit
+        self.flush_seconds = flush_ms / 1000
+        self.max_batch = max_batch
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+
+    # ------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------
+    def submit(self, mutation):
+        """Queues one tap: dict(transaction_id, table_id, product_id, uom, price, qty, grams, order_type,
+        idempotency_key)."""
+        ticket = WriteTicket(mutation)
+        with self._cond:
+            self._pending.append(ticket)
+            self._cond.notify()
+        self.start()
+        return ticket
+
+    # ------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="add-item-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stop)
+                if self._stop and not self._pending:
+                    return
+            time.sleep(self.flush_seconds)  # let a burst of taps pile up
+            with self._cond:
+                batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch))]
+            self.flush(batch)
+
+    def flush(self, batch):
+        """Applies a batch of tickets in one transaction and resolves them.
+
+        A tap that cannot be written fails only its own ticket (and any tap
+        coalesced into the same line); the rest of the batch still commits.
+        """
+        if not batch:
+            return
+        conn = self.get_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            seqs, errors, kinds = self._apply(conn, batch)
+            conn.commit()
+        except Exception as e:
+            traceback.print_exc()
+            conn.rollback()
+            for ticket in batch:
+                ticket._finish(error=e)
+            return
+        finally:
+            conn.close()
+
+        for ticket in batch:
+            ticket._finish(seq=seqs.get(id(ticket)), error=errors.get(id(ticket)))
+        if self.on_flushed is not None and kinds:
+            try:
+                self.on_flushed(list(kinds.items()))
+            except Exception:
+                traceback.print_exc()
+
+    @staticmethod
+    def _apply(conn, batch):
+        """Coalesces the taps per (transaction, product) and writes one change per line.
+
+        Returns ({id(ticket): seq}, {id(ticket): error}, {txn_id: kitchen event kind}).
+        """
+        seqs, errors = {}, {}
+
+        # retried taps: an idempotency key already committed replays its seq
+        fresh, owners = [], {}
+        for ticket in batch:
+            key = ticket.mutation.get("idempotency_key")
+            if key is None:
+                fresh.append(ticket)
+                continue
+            if key in owners:
+                continue  # same key twice in one batch: follows the first tap
+            row = conn.execute("SELECT seq FROM add_item_requests WHERE idempotency_key = ?", (key,)).fetchone()
+            if row:
+                seqs[id(ticket)] = row[0]
+            else:
+                fresh.append(ticket)
+            owners[key] = ticket
+
+        merged = {}
+        for ticket in fresh:
+            m = ticket.mutation
+            key = (m["transaction_id"], m["product_id"])
+            if key in merged:
+                line, tickets = merged[key]
+                line["qty"] += m["qty"]
+                line["grams"] += m["grams"]
+                line.update(price=m["price"], uom=m["uom"])
+                tickets.append(ticket)
+            else:
+                merged[key] = (dict(m), [ticket])
+
+        # kitchen event per transaction: was it already on the board before this batch?
+        on_board = {}
+        for txn_id, _ in merged:
+            if txn_id not in on_board:
+                on_board[txn_id] = conn.execute(KITCHEN_TICKET_SQL, (txn_id,)).fetchone() is not None
+
+        written, kinds = [], {}
+        for (txn_id, product_id), (m, tickets) in merged.items():
+            conn.execute("SAVEPOINT add_item_line")
+            try:
+                AddItemWriter._write_line(conn, txn_id, product_id, m)
+            except Exception as e:
+                traceback.print_exc()
+                conn.execute("ROLLBACK TO add_item_line")
+                conn.execute("RELEASE add_item_line")
+                for ticket in tickets:
+                    errors[id(ticket)] = e
+                continue
+            conn.execute("RELEASE add_item_line")
+            written.extend(tickets)
+            kinds[txn_id] = "items_added" if on_board[txn_id] else "new"
+
+        if written:
+            row = conn.execute("""
+                UPDATE write_sequence SET seq = seq + ? WHERE id = 1 RETURNING seq
+            """, (len(written),)).fetchone()
+            first_seq = row[0] - len(written) + 1
+            position = {id(ticket): n for n, ticket in enumerate(batch)}
+            for n, ticket in enumerate(sorted(written, key=lambda t: position[id(t)])):
+                seqs[id(ticket)] = first_seq + n
+            conn.executemany("""
+                INSERT INTO add_item_requests (idempotency_key, transaction_id, seq) VALUES (?, ?, ?)
+            """, [(t.mutation["idempotency_key"], t.mutation["transaction_id"], seqs[id(t)])
+                  for t in written if t.mutation.get("idempotency_key") is not None])
+
+        # duplicates of a key inside the batch share the first tap's outcome
+        for ticket in batch:
+            key = ticket.mutation.get("idempotency_key")
+            owner = owners.get(key)
+            if key is not None and owner is not ticket:
+                if id(owner) in seqs:
+                    seqs[id(ticket)] = seqs[id(owner)]
+                else:
+                    errors[id(ticket)] = errors.get(id(owner))
+        return seqs, errors, kinds
+
+    @staticmethod
+    def _write_line(conn, txn_id, product_id, m):
+        serve = m["uom"].upper() == "SERVE"
+        existing = conn.execute(EXISTING_LINE_SQL, (txn_id, product_id)).fetchone()
+        if existing:
+            new_qty = existing["quantity"] + m["qty"]
+            new_weight = (existing["weight_in_kg"] or 0) + m["grams"] / 1000
+            new_subtotal = to_pesos(line_amount(m["price"], new_qty) if serve
+                                    else line_amount(m["price"], weight_kg=new_weight))
+            conn.execute("""
+                UPDATE sales SET quantity = ?, weight_in_kg = ?, subtotal = ?, total = ?
+                WHERE id = ?
+            """, (new_qty, new_weight, new_subtotal, new_subtotal, existing["id"]))
+        else:
+            subtotal = to_pesos(line_amount(m["price"], m["qty"]) if serve
+                                else line_amount(m["price"], weight_kg=m["grams"] / 1000))
+            conn.execute("""
+                INSERT INTO sales (
+                    transaction_id, table_id, product_id, weight_in_kg, quantity, subtotal, discount, total,
+                    datetime, status, order_mode
+                )
+                VALUES (?, ?, ?, ?, ?, ?, 0, ?, datetime('now'), 'ACTIVE', ?)
+            """, (txn_id, m["table_id"], product_id, m["grams"] / 1000, m["qty"], subtotal, subtotal,
+                  m["order_type"]))
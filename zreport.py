@@ -0,0 +1,278 @@
+# ============================================================
+# PALUTO POS — END-OF-SHIFT Z-REPORT + CASH RECONCILIATION
+# ============================================================
+# The manager used to rebuild the closing position by hand from
+# export_csv. The Z-report for a business day (local time, the day the
+# transactions were paid) comes out of one aggregated SQL statement:
+#
+#   analytics_rollup_log (day index) → PAID sales lines + their payments
+#                                    + daily_opening_cash + cash_counts
+#
+#   * gross sales, discounts by discount_type, net sales and VAT
+#   * payments by method
+#   * per cashier: opening cash + CASH payments = expected cash, against
+#     the closing count entered per denomination (cash_counts)
+#
+# Amounts are summed as integer centavos (money.py). Closing the day
+# stores the finished report in z_reports (migration 17); from then on it
+# is served from there and the counts can no longer change. Days already
+# moved into the monthly archives are read through attach_history().
+#
+#   python zreport.py --day 2025-10-31           → print the report
+#   python zreport.py --day 2025-10-31 --close   → close the day
+# ============================================================
+
+import argparse, json, os, sqlite3, sys
+from datetime import date, datetime
+
+from money import to_pesos, vat_breakdown
+from write_queue import prune_idempotency_keys
+
+DENOMINATIONS = (1000, 500, 200, 100, 50, 20, 10, 5, 1)
+Z_REPORT_JOB_PREFIX = "Z-"   # print_jobs.transaction_id of a Z-report print
+
+
+def _centavos(column):
+    return f"CAST(ROUND(COALESCE({column}, 0) * 100) AS INTEGER)"
+
+
+# kind, cashier, key, count, amount (centavos), discount (centavos)
+REPORT_SQL = """
+    WITH txn AS (
+        SELECT transaction_id FROM analytics_rollup_log WHERE day = :day
+    ), line AS (
+        SELECT s.transaction_id, COALESCE(s.cashier, '') AS cashier, s.discount_type,
+               {subtotal} AS gross, {discount} AS discount
+        FROM txn JOIN {sales} s ON s.transaction_id = txn.transaction_id AND s.status = 'PAID'
+    ), txn_cashier AS (
+        SELECT transaction_id, MAX(cashier) AS cashier FROM line GROUP BY transaction_id
+    )
+    SELECT 'sales', cashier, NULL, COUNT(DISTINCT transaction_id), SUM(gross), SUM(discount)
+    FROM line GROUP BY cashier
+    UNION ALL
+    SELECT 'discount', cashier, COALESCE(discount_type, 'other'), COUNT(DISTINCT transaction_id), 0, SUM(discount)
+    FROM line WHERE discount != 0 GROUP BY cashier, 3
+    UNION ALL
+    SELECT 'payment', t.cashier, UPPER(COALESCE(p.method, 'CASH')), COUNT(*), SUM({amount}), 0
+    FROM txn_cashier t JOIN {payments} p ON p.transaction_id = t.transaction_id GROUP BY t.cashier, 3
+    UNION ALL
+    SELECT 'opening', COALESCE(u.name, o.username), o.username, COUNT(*), SUM({opening}), 0
+    FROM daily_opening_cash o LEFT JOIN user_credentials u ON u.username = o.username
+    WHERE o.timestamp >= datetime(:day, 'utc') AND o.timestamp < datetime(:day, '+1 day', 'utc')
+    GROUP BY o.username
+    UNION ALL
+    SELECT 'count', COALESCE(u.name, c.username), c.username, 1, c.counted_centavos, 0
+    FROM cash_counts c LEFT JOIN user_credentials u ON u.username = c.username
+    WHERE c.day = :day
+""".format(subtotal=_centavos("s.subtotal"), discount=_centavos("s.discount"), amount=_centavos("p.amount"),
+           opening=_centavos("o.opening_amount"), sales="{sales}", payments="{payments}")
+
+
+def parse_day(value):
+    """YYYY-MM-DD → ISO date string; ValueError otherwise."""
+    return date.fromisoformat(str(value)).isoformat()
+
+
+def counted_centavos(counts):
+    """{"d1000": 2, "d500": 1, …} → centavos; ValueError on a negative or non-integer count."""
+    total = 0
+    for d in DENOMINATIONS:
+        n = int(counts.get(f"d{d}") or 0)
+        if n < 0:
+            raise ValueError(f"d{d} must not be negative")
+        total += n * d * 100
+    return total
+
+
+# ============================================================
+# 🔹 COMPUTING THE REPORT
+# ============================================================
+def compute_z_report(cur, day, sales="sales", payments="payments"):
+    """The Z-report of a business day, computed from the live (or history) tables."""
+    rows = cur.execute(REPORT_SQL.format(sales=sales, payments=payments), {"day": day}).fetchall()
+
+    cashiers, discounts, methods = {}, {}, {}
+
+    def cashier(name):
+        return cashiers.setdefault(name, {
+            "cashier": name, "username": None, "transactions": 0, "gross": 0, "discount": 0,
+            "cash": 0, "other": 0, "opening": 0, "counted": None,
+        })
+
+    for kind, name, key, count, amount, discount in rows:
+        if kind == "sales":
+            c = cashier(name)
+            c["transactions"], c["gross"], c["discount"] = count, amount, discount
+        elif kind == "discount":
+            d = discounts.setdefault(key, [0, 0])
+            d[0] += count
+            d[1] += discount
+        elif kind == "payment":
+            m = methods.setdefault(key, [0, 0])
+            m[0] += count
+            m[1] += amount
+            cashier(name)["cash" if key == "CASH" else "other"] += amount
+        elif kind == "opening":
+            c = cashier(name)
+            c["username"], c["opening"] = key, amount
+        elif kind == "count":
+            c = cashier(name)
+            c["username"], c["counted"] = key, amount
+
+    gross = sum(c["gross"] for c in cashiers.values())
+    discount = sum(c["discount"] for c in cashiers.values())
+    vatable, vat = vat_breakdown(gross - discount)
+
+    sections = []
+    for c in sorted(cashiers.values(), key=lambda c: c["cashier"]):
+        expected = c["opening"] + c["cash"]
+        sections.append({
+            "cashier": c["cashier"] or "(none)",
+            "username": c["username"],
+            "transactions": c["transactions"],
+            "gross_sales": to_pesos(c["gross"]),
+            "discount": to_pesos(c["discount"]),
+            "net_sales": to_pesos(c["gross"] - c["discount"]),
+            "opening_cash": to_pesos(c["opening"]),
+            "cash_payments": to_pesos(c["cash"]),
+            "other_payments": to_pesos(c["other"]),
+            "expected_cash": to_pesos(expected),
+            "counted_cash": None if c["counted"] is None else to_pesos(c["counted"]),
+            "over_short": None if c["counted"] is None else to_pesos(c["counted"] - expected),
+        })
+
+    # over/short only over the drawers counted so far
+    counted = [c for c in cashiers.values() if c["counted"] is not None]
+    expected_total = sum(c["opening"] + c["cash"] for c in cashiers.values())
+    return {
+        "day": day,
+        "closed": False,
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "transactions": sum(c["transactions"] for c in cashiers.values()),
+        "gross_sales": to_pesos(gross),
+        "discount": to_pesos(discount),
+        "net_sales": to_pesos(gross - discount),
+        "vatable_sales": to_pesos(vatable),
+        "vat_amount": to_pesos(vat),
+        "discounts": [{"discount_type": k, "transactions": n, "amount": to_pesos(a)}
+                      for k, (n, a) in sorted(discounts.items(), key=lambda kv: -kv[1][1])],
+        "payments": [{"method": k, "count": n, "amount": to_pesos(a)}
+                     for k, (n, a) in sorted(methods.items(), key=lambda kv: -kv[1][1])],
+        "expected_cash": to_pesos(expected_total),
+        "counted_cash": to_pesos(sum(c["counted"] for c in counted)) if counted else None,
+        "over_short": to_pesos(sum(c["counted"] - c["opening"] - c["cash"] for c in counted)) if counted else None,
+        "cashiers": sections,
+    }
+
+
+def z_report(conn, day, archive_dir=None):
+    """The stored report of a closed day, or the report computed now for an open one."""
+    from archive import attach_history, detach_history
+
+    row = conn.execute("SELECT body FROM z_reports WHERE day = ?", (day,)).fetchone()
+    if row is not None:
+        return json.loads(row[0])
+    if day >= date.today().isoformat() or not archive_dir:
+        return compute_z_report(conn.cursor(), day)
+    # earlier days may already sit in the monthly archives
+    try:
+        sales, payments = attach_history(conn, archive_dir, day, day)
+        return compute_z_report(conn.cursor(), day, sales, payments)
+    finally:
+        detach_history(conn)
+
+
+# ============================================================
+# 🔹 CLOSING
+# ============================================================
+class DayClosed(Exception):
+    """The day's Z-report is already closed; its counts are final."""
+
+
+def record_cash_count(conn, day, username, counts, counted_by=None):
+    """Saves (or replaces) a cashier's closing count; returns the counted centavos."""
+    if not username:
+        raise ValueError("username is required")
+    total = counted_centavos(counts)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM z_reports WHERE day = ?", (day,)).fetchone():
+            raise DayClosed(f"Z-report for {day} is already closed.")
+        cols = [f"d{d}" for d in DENOMINATIONS]
+        conn.execute(f"""
+            INSERT INTO cash_counts (day, username, {', '.join(cols)}, counted_centavos, counted_by)
+            VALUES (?, ?, {', '.join('?' * len(cols))}, ?, ?)
+            ON CONFLICT(day, username) DO UPDATE SET
+                {', '.join(f'{c} = excluded.{c}' for c in cols)},
+                counted_centavos = excluded.counted_centavos, counted_by = excluded.counted_by,
+                counted_at = datetime('now')
+        """, [day, username] + [int(counts.get(c) or 0) for c in cols] + [total, counted_by])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return total
+
+
+def close_day(conn, day, closed_by=None, archive_dir=None):
+    """Computes the final report, stores it in z_reports and returns it.
+
+    The add_item idempotency keys of the day and earlier are dropped with it.
+    """
+    report = z_report(conn, day, archive_dir)
+    if report["closed"]:
+        raise DayClosed(f"Z-report for {day} is already closed.")
+    report.update(closed=True, closed_by=closed_by, closed_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT INTO z_reports (day, body, closed_by) VALUES (?, ?, ?)",
+                     (day, json.dumps(report), closed_by))
+        prune_idempotency_keys(conn, day)  # no tap of a closed day is retried any more
+        conn.commit()
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        raise DayClosed(f"Z-report for {day} is already closed.")
+    except Exception:
+        conn.rollback()
+        raise
+    return report
+
+
+def main(argv=None):
+    from migrations import migrate
+    from archive import default_archive_dir
+    from receipts import get_z_template, z_report_body
+
+    parser = argparse.ArgumentParser(description="Paluto POS end-of-day Z-report")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "paluto.db"))
+    parser.add_argument("--day", default=date.today().isoformat(), help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--archive-dir", help="default: archive/ next to the database")
+    parser.add_argument("--close", action="store_true", help="close the day and store the report")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of receipt lines")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        migrate(conn)
+        day = parse_day(args.day)
+        archive_dir = args.archive_dir or default_archive_dir(args.db)
+        try:
+            report = close_day(conn, day, "cli", archive_dir) if args.close else z_report(conn, day, archive_dir)
+        except DayClosed as e:
+            print(f"❌ {e}")
+            return 1
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        template = get_z_template()
+        for line in template.header + z_report_body(template, report):
+            print(line[3:].strip().center(template.char_width) if line.startswith("<C>") else line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())